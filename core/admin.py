@@ -2,7 +2,9 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
-from .models import Asset, Portfolio, Transaction, PriceHistory
+from .models import Asset, Portfolio, Transaction, PriceHistory, TaxYearResult, FxRate, CorporateAction, NewsItem
+from .services.corporate_actions import apply_corporate_actions, bump_actions_version
+from .services.snapshot import bump_portfolio_version
 
 @admin.register(Asset)
 class AssetAdmin(admin.ModelAdmin):
@@ -11,9 +13,67 @@ class AssetAdmin(admin.ModelAdmin):
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
+    """
+    Cache widoków (snapshot, podatki, loty, dywidendy, projekcja, household) jest kluczowany data_version
+    portfela - każdy zapis z admina podbija wersję, jak import i ręczna transakcja.
+    """
     list_display = ('date', 'type', 'asset', 'amount', 'quantity', 'portfolio')
     list_filter = ('type', 'asset')
     search_fields = ('xtb_id', 'comment')
 
+    def save_model(self, request, obj, form, change):
+        # Przeniesienie do innego portfela zmienia dane obu portfeli
+        previous = Transaction.objects.filter(pk=obj.pk).values_list('portfolio_id', flat=True).first() if change else None
+        super().save_model(request, obj, form, change)
+        _bump_portfolios({obj.portfolio_id, previous})
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        _bump_portfolios({obj.portfolio_id})
+
+    def delete_queryset(self, request, queryset):
+        portfolio_ids = set(queryset.values_list('portfolio_id', flat=True))
+        super().delete_queryset(request, queryset)
+        _bump_portfolios(portfolio_ids)
+
+@admin.register(CorporateAction)
+class CorporateActionAdmin(admin.ModelAdmin):
+    """
+    Zmieniony split / zmiana tickera wraca do nienaniesionych i jest od razu nanoszony na transakcje
+    (apply_corporate_actions podbija wersje przeliczonych portfeli). Usunięty split jest zdejmowany
+    przez apply_splits_to_transactions (split_factor różny od iloczynu pozostałych splitów).
+    """
+    list_display = ('asset', 'action_type', 'date', 'value', 'new_symbol', 'applied')
+    list_filter = ('action_type', 'applied')
+    search_fields = ('asset__symbol',)
+
+    def save_model(self, request, obj, form, change):
+        obj.applied = False
+        super().save_model(request, obj, form, change)
+        _reapply_actions({obj.asset_id})
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        _reapply_actions({obj.asset_id})
+
+    def delete_queryset(self, request, queryset):
+        asset_ids = set(queryset.values_list('asset_id', flat=True))
+        super().delete_queryset(request, queryset)
+        _reapply_actions(asset_ids)
+
+
+def _bump_portfolios(portfolio_ids):
+    for portfolio in Portfolio.objects.filter(id__in=[pk for pk in portfolio_ids if pk]):
+        bump_portfolio_version(portfolio)
+
+
+def _reapply_actions(asset_ids):
+    apply_corporate_actions(list(asset_ids))
+    bump_actions_version()
+
+
 admin.site.register(Portfolio)
-admin.site.register(PriceHistory)
\ No newline at end of file
+admin.site.register(PriceHistory)
+admin.site.register(TaxYearResult)
+admin.site.register(FxRate)
+admin.site.register(NewsItem)
@@ -27,6 +27,12 @@ CURRENCY_TICKERS = {
     'CZK': 'CZKPLN=X'
 }
 
+# Portfolio reporting (display) currencies - computations run in PLN, results are converted via FX cross rates
+REPORTING_CURRENCIES = ['PLN', 'EUR', 'USD']
+
+# Currencies quoted per N units in the market summary carousel (rates are always per 1 unit)
+CURRENCY_QUOTE_UNITS = {'JPY': 100}
+
 # Standard list of currencies to track in market summary
 SUMMARY_CURRENCIES = ["USDPLN=X", "EURPLN=X", "GBPPLN=X", "JPYPLN=X", "AUDPLN=X"]
 
@@ -44,6 +50,18 @@ SUMMARY_INDICES = {
 INFLATION_RATE_YEARLY = 1.06  # 6% assumed inflation
 DAILY_INFLATION_RATE = INFLATION_RATE_YEARLY ** (1 / 365)
 
+# --- IKE / IKZE ---
+# Roczne limity wpłat (PLN). Kolejne lata: ostatni znany limit * LIMIT_GROWTH_YEARLY
+# (limity idą za prognozowanym przeciętnym wynagrodzeniem).
+DEPOSIT_LIMITS = {
+    'IKE': {2024: 23472.00, 2025: 26019.00, 2026: 28260.00},
+    'IKZE': {2024: 9388.80, 2025: 10407.60, 2026: 11304.00},
+}
+LIMIT_GROWTH_YEARLY = 1.05
+
+# Podatek przy wypłacie: IKE po spełnieniu warunków 0%, IKZE ryczałt 10% od całości
+EXIT_TAX_RATE = {'IKE': 0.0, 'IKZE': 0.10}
+
 
 # --- FORMATTING HELPERS ---
 def fmt_4(val):
@@ -2,9 +2,28 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from .models import Portfolio, Transaction, Asset
+from core.config import REPORTING_CURRENCIES
+
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleFileField(forms.FileField):
+    """Pole przyjmujące kilka plików naraz (np. raporty z kilku lat lub archiwum ZIP)."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("widget", MultipleFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single_file_clean = super().clean
+        if isinstance(data, (list, tuple)):
+            return [single_file_clean(d, initial) for d in data]
+        return [single_file_clean(data, initial)]
+
 
 class UploadFileForm(forms.Form):
-    file = forms.FileField(label="Wybierz raport XTB (.xlsx)")
+    file = MultipleFileField(label="Wybierz raporty XTB (.xlsx / .csv / .zip)")
 class CustomUserCreationForm(UserCreationForm):
     class Meta:
         model = User
@@ -29,5 +48,13 @@ class PortfolioSettingsForm(forms.ModelForm):
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control bg-dark text-white border-secondary'}),
             'portfolio_type': forms.Select(attrs={'class': 'form-select bg-dark text-white border-secondary'}),
-            'currency': forms.TextInput(attrs={'class': 'form-control bg-dark text-white border-secondary', 'readonly': 'readonly'}),
-        }
\ No newline at end of file
+            # Waluta raportowa - obliczenia zostają w PLN, zmiana nie wymaga przeliczania portfela
+            'currency': forms.Select(choices=[(c, c) for c in REPORTING_CURRENCIES],
+                                     attrs={'class': 'form-select bg-dark text-white border-secondary'}),
+        }
+
+    def clean_currency(self):
+        currency = self.cleaned_data['currency'].upper()
+        if currency not in REPORTING_CURRENCIES:
+            raise forms.ValidationError(f"Supported reporting currencies: {', '.join(REPORTING_CURRENCIES)}.")
+        return currency
\ No newline at end of file
@@ -0,0 +1,105 @@
+# core/management/commands/bench_import.py
+
+import json
+import sys
+import time
+import tracemalloc
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from core.models import Portfolio, Asset
+from core.services.importer import process_xtb_file
+from core.services.synthetic import (
+    FILE_FORMATS, generate_xtb_cash_operations, synthetic_xtb_file, synthetic_symbols, synthetic_assets
+)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCH_USERNAME = 'bench_import'
+
+
+def peak_rss_mb():
+    """Szczytowe RSS procesu (high-water mark, nie maleje między pomiarami). Linux: KB, macOS: bajty."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark importu: wiersze/s i szczytowa pamięć process_xtb_file dla syntetycznych raportów XTB'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument('--symbols', type=int, default=50)
+        parser.add_argument('--format', choices=FILE_FORMATS, default='csv-utf16-tab')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--tracemalloc', action='store_true',
+                            help='Mierz też szczyt alokacji Pythona (spowalnia import ~2x)')
+        parser.add_argument('--json', dest='json_path', default=None, help='Zapisz wyniki do pliku JSON')
+
+    def handle(self, *args, **opts):
+        user, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+        symbols = synthetic_symbols(opts['symbols'], seed=opts['seed'])
+
+        # Aktywa zakładamy z góry - import nie może pytać Yahoo o metadane w trakcie pomiaru
+        known = set(Asset.objects.filter(symbol__in=symbols).values_list('symbol', flat=True))
+        created_assets = [Asset(**a) for a in synthetic_assets(symbols) if a['symbol'] not in known]
+        Asset.objects.bulk_create(created_assets)
+
+        self.stdout.write(f"Baza: {connection.vendor}, format: {opts['format']}, symbole: {opts['symbols']}")
+        results = []
+        try:
+            # Rosnąco - RSS to high-water mark procesu, więc mniejszy przebieg nie zafałszuje większego
+            for rows in sorted(opts['rows']):
+                results.append(self._run(user, rows, opts))
+        finally:
+            Portfolio.objects.filter(user=user).delete()
+            Asset.objects.filter(symbol__in=[a.symbol for a in created_assets], transaction__isnull=True).delete()
+            user.delete()
+
+        if opts['json_path']:
+            with open(opts['json_path'], 'w') as fh:
+                json.dump({'db': connection.vendor, 'format': opts['format'], 'results': results}, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wyniki zapisane do {opts['json_path']}"))
+
+    def _run(self, user, rows, opts):
+        df = generate_xtb_cash_operations(rows=rows, symbols=opts['symbols'], seed=opts['seed'])
+        upload = synthetic_xtb_file(df, opts['format'])
+        portfolio = Portfolio.objects.create(user=user, name=f"Bench {rows}", portfolio_type='STANDARD')
+
+        if opts['tracemalloc']:
+            tracemalloc.start()
+        start = time.perf_counter()
+        stats = process_xtb_file(upload, portfolio, recompute=False)
+        elapsed = time.perf_counter() - start
+        py_peak = None
+        if opts['tracemalloc']:
+            py_peak = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+            tracemalloc.stop()
+
+        # Ponowny import tego samego pliku - ścieżka "nic się nie zmieniło" (porównanie skrótów)
+        start = time.perf_counter()
+        process_xtb_file(upload, portfolio, recompute=False)
+        reimport = time.perf_counter() - start
+
+        result = {
+            'rows': rows,
+            'added': stats['added'],
+            'seconds': round(elapsed, 3),
+            'rows_per_sec': round(rows / elapsed) if elapsed else None,
+            'reimport_seconds': round(reimport, 3),
+            'reimport_rows_per_sec': round(rows / reimport) if reimport else None,
+            'peak_rss_mb': peak_rss_mb(),
+            'tracemalloc_peak_mb': py_peak,
+        }
+        self.stdout.write(
+            f"{rows:>8} wierszy: {result['seconds']:>8.3f}s ({result['rows_per_sec']} w/s) | "
+            f"reimport {result['reimport_seconds']:.3f}s ({result['reimport_rows_per_sec']} w/s) | "
+            f"RSS {result['peak_rss_mb']} MB" + (f" | py {py_peak} MB" if py_peak is not None else "")
+        )
+        portfolio.delete()
+        return result
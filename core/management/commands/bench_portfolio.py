@@ -0,0 +1,233 @@
+# core/management/commands/bench_portfolio.py
+
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import date
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from core.models import Transaction
+from core.services.analytics import analyze_holdings, analyze_history
+from core.services.calculator import PortfolioCalculator
+from core.services.dividends import get_dividend_context
+from core.services.market import get_current_currency_rates
+from core.services.performance import PerformanceCalculator
+from core.services.providers import FixtureProvider, set_market_provider
+from core.services.synthetic import seed_synthetic_portfolio, suffixes_for_currencies
+from core.services.taxes import _calculate_standard_tax_report
+from core.management.commands.bench_import import peak_rss_mb
+
+BENCH_USERNAME = 'bench_portfolio'
+
+# Widoki mierzone przez klienta testowego (pełny request: middleware, obliczenia, szablon)
+BENCH_VIEWS = ['dashboard', 'assets_list', 'taxes', 'dividends', 'asset_details']
+
+
+def service_benchmarks(user, portfolio):
+    """Funkcje z gorącej ścieżki, każda na tych samych danych portfela (nazwa -> callable)."""
+    transactions = Transaction.objects.filter(portfolio=portfolio).select_related('asset').order_by('date')
+    rates = get_current_currency_rates()
+    timeline = analyze_history(transactions, rates)
+    total_value = analyze_holdings(transactions, rates)['total_value']
+
+    def performance():
+        perf = PerformanceCalculator(transactions)
+        perf.calculate_metrics(timeline_data=timeline, current_total_value=total_value)
+        perf.calculate_twr(timeline)
+
+    return {
+        'calculator': lambda: PortfolioCalculator(transactions).process(),
+        'analyze_holdings': lambda: analyze_holdings(transactions, rates),
+        'analyze_history': lambda: analyze_history(transactions, rates),
+        'performance': performance,
+        'tax_report': lambda: _calculate_standard_tax_report([portfolio]),
+        'dividends': lambda: get_dividend_context(user, portfolio_id=portfolio.id),
+    }
+
+
+def portfolio_client(user, portfolio):
+    """Klient testowy zalogowany jako user, z portfelem aktywnym w sesji (jak po przełączeniu w UI)."""
+    client = Client()
+    client.force_login(user)
+    session = client.session
+    session['active_portfolio_id'] = portfolio.id
+    session.save()
+    return client
+
+
+class Command(BaseCommand):
+    help = ('Benchmark obliczeń portfela na syntetycznych danych (offline, FixtureProvider): czasy, zapytania SQL '
+            'i pamięć funkcji z gorącej ścieżki oraz pełnych widoków; progi regresji dla CI')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trades', type=int, nargs='+', default=[1000, 10000],
+                            help='Skale portfela - liczba operacji w syntetycznym raporcie XTB')
+        parser.add_argument('--tickers', type=int, default=50)
+        parser.add_argument('--years', type=int, default=5)
+        parser.add_argument('--currencies', nargs='+', default=['PLN', 'USD', 'EUR'],
+                            help='Waluty notowań (po jednej giełdzie z SUFFIX_MAP na walutę)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--repeat', type=int, default=3, help='Przebiegi na ciepło (mediana); przebieg 1 to zimny')
+        parser.add_argument('--fixtures-dir', default=None, help='Katalog z plikami <ticker>.csv (domyślnie notowania syntetyczne)')
+        parser.add_argument('--only', nargs='+', default=None, help='Tylko wybrane benchmarki (np. calculator view:dashboard)')
+        parser.add_argument('--json', dest='json_path', default=None, help='Zapisz wyniki do pliku JSON')
+        # Progi regresji - naruszenie kończy komendę błędem (kod != 0)
+        parser.add_argument('--max-queries', type=int, default=None, help='Limit zapytań SQL na benchmark (przebieg ciepły)')
+        parser.add_argument('--max-py-mb', type=float, default=None, help='Limit szczytu alokacji Pythona (tracemalloc) na benchmark')
+        parser.add_argument('--baseline', default=None, help='JSON z poprzedniego uruchomienia - SQL i pamięć nie mogą wzrosnąć')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Dopuszczalny wzrost pamięci i czasu względem --baseline (0.2 = 20%%); czas tylko ostrzega')
+
+    def handle(self, *args, **opts):
+        try:
+            suffixes = suffixes_for_currencies(opts['currencies'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        previous = set_market_provider(FixtureProvider(opts['fixtures_dir']))
+        self.stdout.write(f"Baza: {connection.vendor}, tickery: {opts['tickers']}, lata: {opts['years']}, "
+                          f"waluty: {' '.join(opts['currencies'])}, przebiegi: 1 zimny + {opts['repeat']} ciepłe")
+        scenarios = []
+        try:
+            # Bez wątków w tle (nic nie liczy obok pomiaru) i bez zrzutu metryk do METRICS_DB
+            with override_settings(BACKGROUND_TASKS_ENABLED=False, METRICS_ENABLED=False):
+                # Rosnąco - RSS to high-water mark procesu, więc mniejszy przebieg nie zafałszuje większego
+                for trades in sorted(opts['trades']):
+                    scenarios.append(self._scenario(trades, suffixes, opts))
+        finally:
+            set_market_provider(previous)
+
+        report = {
+            'db': connection.vendor, 'date': date.today().isoformat(),
+            'params': {k: opts[k] for k in ('tickers', 'years', 'currencies', 'seed', 'repeat')},
+            'peak_rss_mb': peak_rss_mb(), 'scenarios': scenarios,
+        }
+        if opts['json_path']:
+            with open(opts['json_path'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wyniki zapisane do {opts['json_path']}"))
+
+        failures, warnings = self._check_guards(report, opts)
+        for w in warnings:
+            self.stdout.write(self.style.WARNING(f"UWAGA: {w}"))
+        if failures:
+            raise CommandError("Regresja:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("Progi regresji: OK"))
+
+    # --- Scenariusz: jeden portfel danej skali, po wszystkim rollback ---
+
+    def _scenario(self, trades, suffixes, opts):
+        cache.clear()
+        with transaction.atomic():
+            user = User.objects.create_user(username=BENCH_USERNAME)
+            portfolio, import_seconds = seed_synthetic_portfolio(
+                user, trades, tickers=opts['tickers'], years=opts['years'], suffixes=suffixes, seed=opts['seed'])
+            tx_count = Transaction.objects.filter(portfolio=portfolio).count()
+
+            self.stdout.write(f"\n{trades} operacji -> {tx_count} transakcji (import {import_seconds:.2f}s)")
+            self.stdout.write(f"{'benchmark':<24} {'zimny ms':>10} {'ciepły ms':>10} {'SQL z/c':>9} {'py MB':>7}")
+
+            results = {}
+            for name, func in self._benchmarks(user, portfolio, opts):
+                results[name] = row = self._measure(func, opts['repeat'])
+                self.stdout.write(f"{name:<24} {row['cold_ms']:>10.1f} {row['warm_ms']:>10.1f} "
+                                  f"{row['cold_queries']:>4}/{row['warm_queries']:<4} {row['py_peak_mb']:>7.1f}")
+            transaction.set_rollback(True)
+
+        return {'trades': trades, 'transactions': tx_count, 'import_seconds': round(import_seconds, 3),
+                'peak_rss_mb': peak_rss_mb(), 'results': results}
+
+    def _benchmarks(self, user, portfolio, opts):
+        """Pary (nazwa, callable) w kolejności pomiaru: najpierw serwisy, potem widoki przez klienta testowego."""
+        client = portfolio_client(user, portfolio)
+
+        held = (Transaction.objects.filter(portfolio=portfolio, type='BUY', asset__isnull=False)
+                .values_list('asset__symbol', flat=True).first())
+        urls = {name: reverse(name, args=[held] if name == 'asset_details' else None) for name in BENCH_VIEWS}
+
+        def view(url):
+            def request():
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise CommandError(f"{url}: HTTP {response.status_code}")
+            return request
+
+        benchmarks = [(name, func) for name, func in service_benchmarks(user, portfolio).items()]
+        benchmarks += [(f"view:{name}", view(url)) for name, url in urls.items()]
+        if opts['only']:
+            benchmarks = [(name, func) for name, func in benchmarks if name in opts['only']]
+        return benchmarks
+
+    def _measure(self, func, repeat):
+        """
+        Przebieg 1 na pustym cache (zimny), potem `repeat` ciepłych (mediana czasu).
+        Pamięć mierzona osobnym przebiegiem pod tracemalloc - żeby nie spowalniał pomiaru czasu.
+        """
+        cache.clear()
+        runs = []
+        for _ in range(1 + max(repeat, 1)):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                func()
+                runs.append((time.perf_counter() - start, len(queries.captured_queries)))
+
+        tracemalloc.start()
+        func()
+        py_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        warm = runs[1:]
+        return {
+            'cold_ms': round(runs[0][0] * 1000, 1),
+            'warm_ms': round(statistics.median(t for t, _ in warm) * 1000, 1),
+            'warm_min_ms': round(min(t for t, _ in warm) * 1000, 1),
+            'cold_queries': runs[0][1],
+            'warm_queries': max(q for _, q in warm),
+            'py_peak_mb': round(py_peak / (1024 * 1024), 2),
+        }
+
+    # --- Progi regresji ---
+
+    def _check_guards(self, report, opts):
+        failures, warnings = [], []
+        scenarios = report['scenarios']
+        for scenario in scenarios:
+            for name, row in scenario['results'].items():
+                where = f"{name} @ {scenario['trades']}"
+                if opts['max_queries'] is not None and row['warm_queries'] > opts['max_queries']:
+                    failures.append(f"{where}: {row['warm_queries']} zapytań SQL > limit {opts['max_queries']}")
+                if opts['max_py_mb'] is not None and row['py_peak_mb'] > opts['max_py_mb']:
+                    failures.append(f"{where}: {row['py_peak_mb']} MB > limit {opts['max_py_mb']} MB")
+
+        # N+1: liczba zapytań na ciepło nie może rosnąć z wielkością portfela
+        if len(scenarios) > 1:
+            smallest, largest = scenarios[0], scenarios[-1]
+            for name, row in largest['results'].items():
+                base = smallest['results'].get(name)
+                if base and row['warm_queries'] > base['warm_queries']:
+                    failures.append(f"{name}: zapytania SQL rosną ze skalą ({base['warm_queries']} przy "
+                                    f"{smallest['trades']} -> {row['warm_queries']} przy {largest['trades']})")
+
+        if opts['baseline']:
+            with open(opts['baseline']) as fh:
+                baseline = {s['trades']: s['results'] for s in json.load(fh)['scenarios']}
+            limit = 1 + opts['tolerance']
+            for scenario in scenarios:
+                for name, row in scenario['results'].items():
+                    base = baseline.get(scenario['trades'], {}).get(name)
+                    if not base:
+                        continue
+                    where = f"{name} @ {scenario['trades']}"
+                    if row['warm_queries'] > base['warm_queries']:
+                        failures.append(f"{where}: SQL {base['warm_queries']} -> {row['warm_queries']}")
+                    if row['py_peak_mb'] > base['py_peak_mb'] * limit + 0.5:
+                        failures.append(f"{where}: pamięć {base['py_peak_mb']} -> {row['py_peak_mb']} MB")
+                    if row['warm_ms'] > base['warm_ms'] * limit + 5:
+                        warnings.append(f"{where}: czas {base['warm_ms']} -> {row['warm_ms']} ms")
+        return failures, warnings
@@ -0,0 +1,89 @@
+# core/management/commands/explain_hot_queries.py
+
+import re
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from core.models import Asset, Portfolio, Transaction
+
+
+def browser_page(portfolio_id, filters):
+    """Strona przeglądarki transakcji za kursorem (jak services.transactions.browse_transactions)."""
+    last = timezone.now()
+    return (Transaction.objects.filter(portfolio_id=portfolio_id, **filters)
+            .filter(Q(date__lt=last) | Q(date=last, id__lt=10 ** 9), date__lte=last)
+            .order_by('-date', '-id')[:51])
+
+
+# Zapytania z gorącej ścieżki i indeks, którego powinny użyć (nazwy z Meta.indexes / Meta.constraints)
+HOT_QUERIES = [
+    ('transakcje portfela po dacie', 'tx_portfolio_date_idx',
+     lambda p: Transaction.objects.filter(portfolio_id=p).order_by('date')),
+    ('ostatnie transakcje (dashboard)', 'tx_portfolio_date_idx',
+     lambda p: Transaction.objects.filter(portfolio_id=p).order_by('-date')[:20]),
+    ('dywidendy i podatek u źródła', 'tx_portfolio_type_date_idx',
+     lambda p: Transaction.objects.filter(portfolio_id__in=[p], type__in=['DIVIDEND', 'TAX'])),
+    ('sprzedaże (PIT-38)', 'tx_portfolio_type_date_idx',
+     lambda p: Transaction.objects.filter(portfolio_id__in=[p], type='SELL').order_by('date')),
+    ('przeglądarka: strona po kursorze', 'tx_portfolio_date_idx',
+     lambda p: browser_page(p, {})),
+    ('przeglądarka: filtr typu', 'tx_portfolio_type_date_idx',
+     lambda p: browser_page(p, {'type': 'DIVIDEND'})),
+    ('przeglądarka: filtr aktywa', 'tx_portfolio_asset_date_idx',
+     lambda p: browser_page(p, {'asset_id': 1})),
+    ('upsert importu (wszystkie xtb_id)', 'tx_portfolio_xtb_id_uniq',
+     lambda p: Transaction.objects.filter(portfolio_id=p, xtb_id__isnull=False).values_list('id', 'xtb_id')),
+    ('wiersz importu po xtb_id', 'tx_portfolio_xtb_id_uniq',
+     lambda p: Transaction.objects.filter(portfolio_id=p, xtb_id='500000001')),
+    ('aktywa po tickerze Yahoo', 'asset_yahoo_ticker_idx',
+     lambda p: Asset.objects.filter(yahoo_ticker__in=['AAPL', 'CDR.WA'])),
+]
+
+# Pełny odczyt tabeli w planie: SQLite "SCAN core_x" (bez indeksu), PostgreSQL "Seq Scan on core_x"
+FULL_SCAN = {
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(core_\w+)(?! USING)'),
+    'postgresql': re.compile(r'Seq Scan on (core_\w+)'),
+}
+
+
+class Command(BaseCommand):
+    help = ('Plany zapytań (EXPLAIN) gorących zapytań Transaction/Asset na bieżącej bazie (SQLite / PostgreSQL): '
+            'błąd, gdy zapytanie czyta całą tabelę zamiast indeksu')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--portfolio', type=int, default=None, help='Id portfela w zapytaniach (domyślnie pierwszy)')
+        parser.add_argument('--verbose-plan', action='store_true', help='Wypisz pełne plany')
+
+    def handle(self, *args, **opts):
+        vendor = connection.vendor
+        if vendor not in FULL_SCAN:
+            raise CommandError(f"Nieobsługiwana baza: {vendor} (SQLite lub PostgreSQL)")
+        portfolio_id = opts['portfolio'] or Portfolio.objects.order_by('id').values_list('id', flat=True).first() or 0
+        self.stdout.write(f"Baza: {vendor}, portfel: {portfolio_id}")
+
+        failures = []
+        with transaction.atomic():
+            if vendor == 'postgresql':
+                # Na małej tabeli planista i tak wybierze Seq Scan - sprawdzamy, czy indeks w ogóle pasuje
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for label, expected, build in HOT_QUERIES:
+                plan = build(portfolio_id).explain()
+                scanned = FULL_SCAN[vendor].findall(plan)
+                if scanned:
+                    status = self.style.ERROR('PEŁNY ODCZYT')
+                    failures.append(f"{label}: pełny odczyt {', '.join(sorted(set(scanned)))}")
+                elif expected in plan:
+                    status = self.style.SUCCESS('OK')
+                else:
+                    status = self.style.WARNING('INNY INDEKS')
+                self.stdout.write(f"{status:<12} {label:<36} oczekiwany: {expected}")
+                if opts['verbose_plan'] or scanned or expected not in plan:
+                    for line in plan.splitlines():
+                        self.stdout.write(f"    {line}")
+
+        if failures:
+            raise CommandError("Zapytania bez indeksu:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("Wszystkie gorące zapytania korzystają z indeksów."))
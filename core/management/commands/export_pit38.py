@@ -0,0 +1,39 @@
+# core/management/commands/export_pit38.py
+
+import io
+import time
+from django.core.management.base import BaseCommand
+from core.models import Portfolio
+from core.services.tax_engine import build_tax_reports, pit38_rows, write_pit38
+
+
+class Command(BaseCommand):
+    help = 'Eksport PIT-38 (CSV/JSON) dla wszystkich portfeli STANDARD - jeden przebieg silnika podatkowego'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, default=None, help='Tylko wybrany rok podatkowy')
+        parser.add_argument('--portfolio', type=int, nargs='+', default=None, help='ID portfeli (domyślnie wszystkie STANDARD)')
+        parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+        parser.add_argument('--output', default=None, help='Ścieżka pliku (domyślnie stdout)')
+
+    def handle(self, *args, **opts):
+        portfolios = Portfolio.objects.filter(portfolio_type='STANDARD').select_related('user').order_by('id')
+        if opts['portfolio']:
+            portfolios = portfolios.filter(id__in=opts['portfolio'])
+        portfolios = list(portfolios)
+
+        start = time.perf_counter()
+        reports = build_tax_reports(portfolios)
+        rows = pit38_rows(portfolios, reports, year=opts['year'])
+        elapsed = time.perf_counter() - start
+
+        if opts['output']:
+            with open(opts['output'], 'w', newline='', encoding='utf-8') as fh:
+                write_pit38(fh, rows, opts['format'])
+        else:
+            # OutputWrapper dokleja znak nowej linii do każdego write() - zapis w całości
+            buf = io.StringIO()
+            write_pit38(buf, rows, opts['format'])
+            self.stdout.write(buf.getvalue())
+
+        self.stderr.write(f"PIT-38: {len(portfolios)} portfeli, {len(rows)} wierszy w {elapsed:.2f}s")
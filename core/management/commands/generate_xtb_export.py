@@ -0,0 +1,38 @@
+# core/management/commands/generate_xtb_export.py
+
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from core.config import SUFFIX_MAP
+from core.services.synthetic import FILE_FORMATS, generate_xtb_cash_operations, synthetic_xtb_file
+
+
+class Command(BaseCommand):
+    help = 'Generuje syntetyczny raport XTB Cash Operations (CSV/XLSX) do testów i benchmarków importu'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Ścieżka pliku wynikowego')
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--symbols', type=int, default=20)
+        parser.add_argument('--format', choices=FILE_FORMATS, default='csv-utf16-tab')
+        parser.add_argument('--suffixes', nargs='+', default=None,
+                            help=f"Sufiksy giełd z SUFFIX_MAP (domyślnie wszystkie: {' '.join(SUFFIX_MAP)})")
+        parser.add_argument('--start', type=date.fromisoformat, default=None, help='RRRR-MM-DD')
+        parser.add_argument('--end', type=date.fromisoformat, default=None, help='RRRR-MM-DD')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **opts):
+        unknown = [s for s in (opts['suffixes'] or []) if s not in SUFFIX_MAP]
+        if unknown:
+            raise CommandError(f"Nieznane sufiksy: {', '.join(unknown)}")
+
+        df = generate_xtb_cash_operations(
+            rows=opts['rows'], symbols=opts['symbols'], suffixes=opts['suffixes'],
+            start=opts['start'], end=opts['end'], seed=opts['seed'],
+        )
+        f = synthetic_xtb_file(df, opts['format'])
+        with open(opts['output'], 'wb') as fh:
+            fh.write(f.getvalue())
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Zapisano {len(df)} operacji ({opts['format']}) do {opts['output']}"
+        ))
@@ -0,0 +1,30 @@
+# core/management/commands/prefetch_news.py
+
+import time
+from django.core.management.base import BaseCommand
+from core.models import Asset
+from core.services.news import prefetch_news, LocalFeed, NEWS_WORKERS
+from core.services.selectors import get_held_assets
+
+
+class Command(BaseCommand):
+    help = 'Pobiera i ocenia newsy wszystkich trzymanych aktywów (wszystkie portfele) - do uruchamiania z crona'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbols', nargs='+', help='Tylko wybrane symbole (domyślnie: wszystkie trzymane)')
+        parser.add_argument('--workers', type=int, default=NEWS_WORKERS, help='Ile zapytań RSS naraz')
+        parser.add_argument('--feed-dir', help='Katalog z plikami RSS (<symbol>.xml / default.xml) zamiast Google News')
+        parser.add_argument('--force', action='store_true', help='Także aktywa z aktualnym rankingiem')
+
+    def handle(self, *args, **opts):
+        assets = Asset.objects.filter(symbol__in=opts['symbols']) if opts['symbols'] else get_held_assets()
+        source = LocalFeed(opts['feed_dir']) if opts['feed_dir'] else None
+
+        start = time.perf_counter()
+        stats = prefetch_news(assets, workers=opts['workers'], source=source, force=opts['force'])
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Aktywa: {stats['assets']} (pominięte aktualne: {stats['skipped']}), newsy: {stats['items']}, "
+            f"błędy: {stats['failed']}, czas: {elapsed:.2f}s"
+        ))
@@ -0,0 +1,170 @@
+# core/management/commands/profile_portfolio.py
+
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from core.models import Portfolio
+from core.services.dashboard import get_dashboard_stats_context, get_holdings_view_context
+from core.services.dividends import get_dividend_context, get_dividend_forecast
+from core.services.instrumentation import start_request, end_request
+from core.services.portfolio import get_dashboard_context
+from core.services.providers import FixtureProvider, YahooProvider, set_market_provider
+from core.services.taxes import get_taxes_context
+from core.management.commands.bench_import import peak_rss_mb
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:
+    PyinstrumentProfiler = None
+
+# Etapy w tabeli obok czasu całkowitego (z timed() w services)
+DETAIL_STAGES = ['yahoo', 'history', 'holdings', 'calculator', 'performance', 'taxes']
+
+
+def portfolio_stages(portfolio):
+    """Obliczenia stron portfela w kolejności jak przy przeglądaniu: dashboard, holdings, taxes, dividends."""
+    user = portfolio.user
+    return [
+        ('dashboard', lambda: (get_dashboard_context(user, portfolio_id=portfolio.id),
+                               get_dashboard_stats_context(portfolio, 'all'))),
+        ('holdings', lambda: get_holdings_view_context(user, portfolio, 'all')),
+        ('taxes', lambda: get_taxes_context(user, portfolio_id=portfolio.id)),
+        ('dividends', lambda: (get_dividend_context(user, portfolio_id=portfolio.id),
+                               get_dividend_forecast(user, portfolio_id=portfolio.id))),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Profil obliczeń portfela (dashboard, holdings, taxes, dividends): czasy etapów, zapytania SQL, '
+            'pamięć i raport profilera - przebieg 1 na zimnym cache, kolejne na ciepłym')
+
+    def add_arguments(self, parser):
+        parser.add_argument('portfolio_id', type=int)
+        parser.add_argument('--provider', choices=['yahoo', 'fixtures'], default='fixtures',
+                            help='Notowania: Yahoo albo offline (domyślnie fixtures - powtarzalnie, bez sieci)')
+        parser.add_argument('--fixtures-dir', default=None, help='Katalog z plikami <ticker>.csv dla --provider fixtures')
+        parser.add_argument('--repeat', type=int, default=2, help='Liczba przebiegów (1 = tylko zimny cache)')
+        parser.add_argument('--profiler', choices=['cprofile', 'pyinstrument', 'none'], default='cprofile')
+        parser.add_argument('--profile-run', type=int, default=1, help='Który przebieg profilować (1 = zimny)')
+        parser.add_argument('--limit', type=int, default=25, help='Liczba funkcji w raporcie cProfile')
+        parser.add_argument('--profile-output', default=None, help='Zapis .prof (cProfile) do obejrzenia np. w snakeviz')
+        parser.add_argument('--json', dest='json_path', default=None, help='Zapisz wyniki do pliku JSON')
+        parser.add_argument('--commit', action='store_true',
+                            help='Zachowaj zapisy z przebiegu (kursy, ceny, księga lotów); domyślnie rollback')
+
+    def handle(self, *args, **opts):
+        portfolio = Portfolio.objects.select_related('user').filter(id=opts['portfolio_id']).first()
+        if not portfolio:
+            raise CommandError(f"Portfel {opts['portfolio_id']} nie istnieje.")
+        if opts['profiler'] == 'pyinstrument' and PyinstrumentProfiler is None:
+            raise CommandError("pyinstrument nie jest zainstalowany (pip install pyinstrument).")
+
+        provider = FixtureProvider(opts['fixtures_dir']) if opts['provider'] == 'fixtures' else YahooProvider()
+        previous = set_market_provider(provider)
+        self.stdout.write(f"Portfel {portfolio.id} ({portfolio.name}, {portfolio.portfolio_type}), "
+                          f"dostawca: {provider.name}, baza: {connection.vendor}")
+
+        results = []
+        try:
+            # Zadania w tle wyłączone - nic nie liczy (ani nie pisze) obok mierzonego przebiegu
+            with override_settings(BACKGROUND_TASKS_ENABLED=False), transaction.atomic():
+                tracemalloc.start()
+                for run in range(1, max(1, opts['repeat']) + 1):
+                    results.extend(self._run(portfolio, run, opts))
+                tracemalloc.stop()
+                if not opts['commit']:
+                    transaction.set_rollback(True)
+        finally:
+            set_market_provider(previous)
+
+        self._print_summary(results)
+        if opts['json_path']:
+            with open(opts['json_path'], 'w') as fh:
+                json.dump({'portfolio': portfolio.id, 'provider': provider.name, 'db': connection.vendor,
+                           'peak_rss_mb': peak_rss_mb(), 'results': results}, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wyniki zapisane do {opts['json_path']}"))
+
+    def _run(self, portfolio, run, opts):
+        cold = run == 1
+        if cold:
+            cache.clear()
+        profiler = self._start_profiler(opts) if run == opts['profile_run'] else None
+
+        self.stdout.write(f"\nPrzebieg {run} ({'zimny' if cold else 'ciepły'} cache)")
+        self.stdout.write(f"{'etap':<10} {'ms':>9} {'SQL':>5} {'SQL ms':>8} {'py MB':>7}  " +
+                          ' '.join(f"{s:>11}" for s in DETAIL_STAGES))
+        rows = []
+        for name, compute in portfolio_stages(portfolio):
+            tracemalloc.reset_peak()
+            stats, token = start_request()
+            try:
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    compute()
+                    elapsed = time.perf_counter() - start
+            finally:
+                end_request(token)
+
+            sql_ms = sum(float(q['time']) for q in queries.captured_queries) * 1000
+            stages = {s: round(total * 1000, 1) for s, (total, _) in stats.stages.items()}
+            row = {'run': run, 'cold': cold, 'stage': name, 'ms': round(elapsed * 1000, 1),
+                   'sql_queries': len(queries.captured_queries), 'sql_ms': round(sql_ms, 1),
+                   'py_peak_mb': round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1),
+                   'yahoo_calls': stats.stages.get('yahoo', (0.0, 0))[1], 'stages': stages}
+            rows.append(row)
+            self.stdout.write(
+                f"{name:<10} {row['ms']:>9.1f} {row['sql_queries']:>5} {row['sql_ms']:>8.1f} {row['py_peak_mb']:>7.1f}  " +
+                ' '.join(f"{stages.get(s, 0.0):>11.1f}" for s in DETAIL_STAGES)
+            )
+
+        if profiler:
+            self._report_profiler(profiler, opts)
+        return rows
+
+    def _start_profiler(self, opts):
+        if opts['profiler'] == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        if opts['profiler'] == 'pyinstrument':
+            profiler = PyinstrumentProfiler()
+            profiler.start()
+            return profiler
+        return None
+
+    def _report_profiler(self, profiler, opts):
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+            if opts['profile_output']:
+                profiler.dump_stats(opts['profile_output'])
+            buf = io.StringIO()
+            pstats.Stats(profiler, stream=buf).strip_dirs().sort_stats('cumulative').print_stats(opts['limit'])
+            self.stdout.write(buf.getvalue())
+        else:
+            profiler.stop()
+            self.stdout.write(profiler.output_text(unicode=True, color=False))
+
+    def _print_summary(self, results):
+        cold = {r['stage']: r for r in results if r['cold']}
+        warm = {}
+        for r in results:
+            if not r['cold']:
+                warm.setdefault(r['stage'], []).append(r)
+
+        self.stdout.write(f"\n{'etap':<10} {'zimny ms':>10} {'ciepły ms':>10} {'SQL zimny':>10} {'SQL ciepły':>11} {'Yahoo':>6}")
+        for stage, row in cold.items():
+            runs = warm.get(stage, [])
+            warm_ms = sum(r['ms'] for r in runs) / len(runs) if runs else None
+            warm_sql = sum(r['sql_queries'] for r in runs) / len(runs) if runs else None
+            self.stdout.write(
+                f"{stage:<10} {row['ms']:>10.1f} {warm_ms if warm_ms is not None else '-':>10} "
+                f"{row['sql_queries']:>10} {warm_sql if warm_sql is not None else '-':>11} {row['yahoo_calls']:>6}"
+            )
+        self.stdout.write(f"RSS (szczyt procesu): {peak_rss_mb()} MB")
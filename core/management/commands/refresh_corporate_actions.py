@@ -0,0 +1,24 @@
+# core/management/commands/refresh_corporate_actions.py
+
+from django.core.management.base import BaseCommand
+from core.models import Asset
+from core.services.corporate_actions import refresh_corporate_actions, stale_asset_ids, apply_corporate_actions
+
+
+class Command(BaseCommand):
+    help = 'Pobiera zdarzenia korporacyjne (dywidendy, splity) aktywów z transakcjami i nanosi splity / zmiany tickera - do uruchamiania z crona'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Także aktywa odświeżone w ostatnim tygodniu')
+
+    def handle(self, *args, **opts):
+        all_ids = list(Asset.objects.filter(transaction__isnull=False).distinct().values_list('id', flat=True))
+        asset_ids = all_ids if opts['force'] else stale_asset_ids(all_ids)
+
+        saved = refresh_corporate_actions(asset_ids) if asset_ids else 0
+        # Zdarzenia dopisane ręcznie w adminie (np. zmiana tickera) też nanosimy
+        applied = apply_corporate_actions(all_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"Aktywa: {len(asset_ids)}, nowe zdarzenia: {saved}, "
+            f"naniesione: {applied['actions']}, przeliczone portfele: {applied['portfolios']}"
+        ))
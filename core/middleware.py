@@ -0,0 +1,65 @@
+# core/middleware.py
+
+import json
+import logging
+import time
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from .services.instrumentation import start_request, end_request, sql_timer, server_timing_header
+from .services.metrics import observe, inc, maybe_flush
+
+# Osobny logger - linię na request można wyciszyć bez wyciszania reszty 'core'
+logger = logging.getLogger('core.requests')
+
+
+class ServerTimingMiddleware:
+    """
+    Pomiar requestu: etapy z timed() w services, zapytania SQL, wywołania Yahoo i trafienia cache.
+    Wynik w nagłówku Server-Timing (DevTools -> Network -> Timing), w jednej linii logu (JSON)
+    i w histogramach /metrics/ (czas per widok, czas etapów).
+    INSTRUMENTATION_ENABLED=False wyłącza pomiar etapów i Server-Timing - czas i liczba requestów per widok
+    trafiają do /metrics/ dalej, dopóki METRICS_ENABLED=True. Oba wyłączone - middleware nieużywany.
+    """
+
+    def __init__(self, get_response):
+        self.timing = getattr(settings, 'INSTRUMENTATION_ENABLED', True)
+        if not self.timing and not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.timing:
+            start = time.perf_counter()
+            response = self.get_response(request)
+            self._record(request, response, time.perf_counter() - start)
+            maybe_flush()
+            return response
+
+        stats, token = start_request()
+        try:
+            with connection.execute_wrapper(sql_timer(stats)):
+                response = self.get_response(request)
+        finally:
+            end_request(token)
+
+        response['Server-Timing'] = server_timing_header(stats)
+        # Linia na każdy request tylko na poziomie DEBUG (REQUEST_LOG_LEVEL=DEBUG) - nie zalewa logów produkcji
+        if logger.isEnabledFor(logging.DEBUG):
+            record = stats.summary()
+            record.update(method=request.method, path=request.path, status=response.status_code)
+            logger.debug(f"REQUEST {json.dumps(record)}")
+
+        self._record(request, response, stats.elapsed())
+        for stage, (total, _) in stats.stages.items():
+            observe('ike_stage_duration_seconds', total, stage=stage)
+        maybe_flush()
+        return response
+
+    def _record(self, request, response, seconds):
+        """Czas i licznik requestów per widok (/metrics/)."""
+        # Nazwa widoku zamiast ścieżki - stała liczba serii (symbole w URL nie mnożą etykiet)
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        observe('ike_request_duration_seconds', seconds, view=view)
+        inc('ike_requests_total', view=view, status=f"{response.status_code // 100}xx")
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_alter_transaction_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=40, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_transaction_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfolio',
+            name='data_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
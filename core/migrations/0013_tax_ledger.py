@@ -0,0 +1,65 @@
+# Generated by Django 6.0 on 2026-10-19 12:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_portfolio_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaxLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField()),
+                ('quantity', models.DecimalField(decimal_places=4, max_digits=15)),
+                ('cost', models.DecimalField(decimal_places=4, help_text='Purchase cost of the whole lot', max_digits=15)),
+                ('remaining_quantity', models.DecimalField(decimal_places=4, max_digits=15)),
+                ('asset', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.asset')),
+                ('buy_transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tax_lots', to='core.transaction')),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tax_lots', to='core.portfolio')),
+            ],
+            options={
+                'ordering': ['date', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LotAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField()),
+                ('quantity', models.DecimalField(decimal_places=4, max_digits=15)),
+                ('cost_basis', models.DecimalField(decimal_places=4, max_digits=15)),
+                ('proceeds', models.DecimalField(decimal_places=4, max_digits=15)),
+                ('sell_transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lot_allocations', to='core.transaction')),
+                ('lot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='core.taxlot')),
+            ],
+            options={
+                'ordering': ['date', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TaxYearResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('income', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('div_gross', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('div_tax_paid', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('fingerprint', models.CharField(max_length=200)),
+                ('is_frozen', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tax_years', to='core.portfolio')),
+            ],
+            options={
+                'ordering': ['-year'],
+                'unique_together': {('portfolio', 'year')},
+            },
+        ),
+    ]
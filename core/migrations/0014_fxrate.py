@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-19 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_tax_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FxRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=6, max_digits=14)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('currency', 'date')},
+            },
+        ),
+    ]
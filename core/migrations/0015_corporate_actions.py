@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-19 13:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_fxrate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='actions_updated',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='CorporateAction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action_type', models.CharField(choices=[('DIVIDEND', 'Dividend')], default='DIVIDEND', max_length=20)),
+                ('date', models.DateField(help_text='Ex-date')),
+                ('value', models.DecimalField(decimal_places=6, help_text='Dividend per share (asset currency)', max_digits=15)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='corporate_actions', to='core.asset')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('asset', 'action_type', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-19 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_corporate_actions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='corporateaction',
+            name='applied',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='corporateaction',
+            name='new_symbol',
+            field=models.CharField(blank=True, help_text='New Yahoo ticker (ticker change)', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='split_factor',
+            field=models.DecimalField(decimal_places=8, default=1, max_digits=18),
+        ),
+        migrations.AlterField(
+            model_name='corporateaction',
+            name='action_type',
+            field=models.CharField(choices=[('DIVIDEND', 'Dividend'), ('SPLIT', 'Split / Reverse split'), ('TICKER_CHANGE', 'Ticker change')], default='DIVIDEND', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='corporateaction',
+            name='value',
+            field=models.DecimalField(decimal_places=6, default=0, help_text='Dividend per share (asset currency) / split ratio (new shares per old share)', max_digits=15),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-19 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_split_adjustments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('title', models.CharField(max_length=500)),
+                ('link', models.URLField(max_length=1000)),
+                ('source', models.CharField(max_length=100)),
+                ('published', models.DateField(blank=True, null=True)),
+                ('tags', models.JSONField(blank=True, default=list)),
+                ('priority', models.SmallIntegerField(default=0)),
+                ('fetched_at', models.DateTimeField()),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='news_items', to='core.asset')),
+            ],
+            options={
+                'ordering': ['asset', 'rank'],
+                'unique_together': {('asset', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-19 16:10
+
+from django.db import migrations
+from django.db.models import Count, F, Min
+
+
+def dedupe_transactions(apps, schema_editor):
+    """
+    Usuwa zdublowane transakcje (ten sam portfel i xtb_id) przed założeniem ograniczenia unikalności.
+    Zostaje najstarszy wiersz (najniższe id). Księga podatkowa dotkniętych portfeli jest kasowana
+    (przeliczy się przy następnym wejściu), a data_version podbijany - cache danych pochodnych wygasa.
+    """
+    Transaction = apps.get_model('core', 'Transaction')
+    Portfolio = apps.get_model('core', 'Portfolio')
+    TaxLot = apps.get_model('core', 'TaxLot')
+    TaxYearResult = apps.get_model('core', 'TaxYearResult')
+
+    groups = (Transaction.objects.filter(xtb_id__isnull=False)
+              .values('portfolio_id', 'xtb_id')
+              .annotate(n=Count('id'), keep=Min('id'))
+              .filter(n__gt=1)
+              .order_by())
+    duplicate_ids, portfolio_ids = [], set()
+    for g in groups.iterator():
+        duplicate_ids += (Transaction.objects.filter(portfolio_id=g['portfolio_id'], xtb_id=g['xtb_id'])
+                          .exclude(id=g['keep']).values_list('id', flat=True))
+        portfolio_ids.add(g['portfolio_id'])
+    if not duplicate_ids:
+        return
+
+    TaxLot.objects.filter(portfolio_id__in=portfolio_ids).delete()
+    TaxYearResult.objects.filter(portfolio_id__in=portfolio_ids).delete()
+    for start in range(0, len(duplicate_ids), 500):
+        Transaction.objects.filter(id__in=duplicate_ids[start:start + 500]).delete()
+    Portfolio.objects.filter(id__in=portfolio_ids).update(data_version=F('data_version') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_newsitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_transactions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-19 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_dedupe_transactions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['yahoo_ticker'], name='asset_yahoo_ticker_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['portfolio', 'date'], name='tx_portfolio_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['portfolio', 'type', 'date'], name='tx_portfolio_type_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('xtb_id__isnull', False)), fields=('portfolio', 'xtb_id'), name='tx_portfolio_xtb_id_uniq'),
+        ),
+    ]
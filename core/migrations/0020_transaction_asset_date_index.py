@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_transaction_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['portfolio', 'asset', 'date'], name='tx_portfolio_asset_date_idx'),
+        ),
+    ]
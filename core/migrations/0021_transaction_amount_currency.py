@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_transaction_asset_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='amount_currency',
+            field=models.CharField(blank=True, max_length=3, null=True),
+        ),
+    ]
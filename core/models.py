@@ -51,6 +51,12 @@ class TransactionType(models.TextChoices):
     OTHER = 'OTHER', 'Other'
 
 
+class CorporateActionType(models.TextChoices):
+    DIVIDEND = 'DIVIDEND', 'Dividend'
+    SPLIT = 'SPLIT', 'Split / Reverse split'
+    TICKER_CHANGE = 'TICKER_CHANGE', 'Ticker change'
+
+
 # --- MODELE ---
 
 class Portfolio(models.Model):
@@ -66,6 +72,9 @@ class Portfolio(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Licznik zmian transakcji - część kluczy cache dla danych pochodnych (holdings, timeline, metryki)
+    data_version = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         return f"{self.name} ({self.get_portfolio_type_display()})"
 
@@ -93,6 +102,14 @@ class Asset(models.Model):
     last_price = models.DecimalField(max_digits=12, decimal_places=4, default=0.0, null=True, blank=True)
     previous_close = models.DecimalField(max_digits=12, decimal_places=4, default=0.0)  # <--- ZACHOWANO
     last_updated = models.DateTimeField(null=True, blank=True)
+    # Ostatnie pobranie zdarzeń korporacyjnych (CorporateAction) od dostawcy danych
+    actions_updated = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Wyszukiwanie po tickerze Yahoo (yahoo_ticker__in przy cenach i zdarzeniach korporacyjnych)
+            models.Index(fields=['yahoo_ticker'], name='asset_yahoo_ticker_idx'),
+        ]
 
     def __str__(self):
         return self.symbol
@@ -136,10 +153,30 @@ class Transaction(models.Model):
 
     comment = models.TextField(blank=True, null=True)
 
+    # Skrót znormalizowanej treści wiersza z importu (sha1) - pozwala pominąć niezmienione wiersze przy re-imporcie
+    content_hash = models.CharField(max_length=40, blank=True, null=True)
+
+    # Iloczyn splitów już naniesionych na quantity/price (1 = wartości jak z brokera)
+    split_factor = models.DecimalField(max_digits=18, decimal_places=8, default=1)
+
+    # Waluta, w której zapisano amount (Revolut: już przeliczone na PLN przy imporcie).
+    # Puste = konwencja XTB: dywidendy / podatki w walucie aktywa, przeliczane dopiero w raportach
+    amount_currency = models.CharField(max_length=3, blank=True, null=True)
+
     class Meta:
         ordering = ['-date']
-        # Dodano unikalność, żeby nie dublować przy imporcie (chyba że xtb_id jest puste)
-        # unique_together = ('portfolio', 'xtb_id') # Commented out to avoid migration issues if duplicates exist
+        indexes = [
+            # Każdy widok: transakcje portfela po dacie; dywidendy / podatki / loty dodatkowo po typie
+            models.Index(fields=['portfolio', 'date'], name='tx_portfolio_date_idx'),
+            models.Index(fields=['portfolio', 'type', 'date'], name='tx_portfolio_type_date_idx'),
+            # Przeglądarka transakcji z filtrem aktywa (i historia jednego aktywa w portfelu)
+            models.Index(fields=['portfolio', 'asset', 'date'], name='tx_portfolio_asset_date_idx'),
+        ]
+        constraints = [
+            # Import nie dubluje wierszy brokera; to samo ograniczenie jest indeksem dla upsertu po (portfel, xtb_id)
+            models.UniqueConstraint(fields=['portfolio', 'xtb_id'], condition=models.Q(xtb_id__isnull=False),
+                                    name='tx_portfolio_xtb_id_uniq'),
+        ]
 
     def __str__(self):
         asset_sym = self.asset.symbol if self.asset else 'CASH'
@@ -156,4 +193,125 @@ class PriceHistory(models.Model):
 
     class Meta:
         unique_together = ('asset', 'date')
-        ordering = ['-date']
\ No newline at end of file
+        ordering = ['-date']
+
+class TaxLot(models.Model):
+    """
+    Lot zakupowy (jedna transakcja BUY) w księdze FIFO.
+    remaining_quantity = ilość jeszcze niesprzedana (po wszystkich alokacjach).
+    """
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='tax_lots')
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, null=True, blank=True)
+    buy_transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='tax_lots')
+    date = models.DateTimeField()
+    quantity = models.DecimalField(max_digits=15, decimal_places=4)
+    cost = models.DecimalField(max_digits=15, decimal_places=4, help_text="Purchase cost of the whole lot")
+    remaining_quantity = models.DecimalField(max_digits=15, decimal_places=4)
+
+    class Meta:
+        ordering = ['date', 'id']
+
+    def __str__(self):
+        return f"Lot {self.asset} {self.quantity} @ {self.date.date()}"
+
+
+class LotAllocation(models.Model):
+    """Część lotu zdjęta przez sprzedaż (SELL) - koszt uzyskania przychodu wg FIFO."""
+    lot = models.ForeignKey(TaxLot, on_delete=models.CASCADE, related_name='allocations')
+    sell_transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='lot_allocations')
+    date = models.DateTimeField()
+    quantity = models.DecimalField(max_digits=15, decimal_places=4)
+    cost_basis = models.DecimalField(max_digits=15, decimal_places=4)
+    proceeds = models.DecimalField(max_digits=15, decimal_places=4)
+
+    class Meta:
+        ordering = ['date', 'id']
+
+
+class TaxYearResult(models.Model):
+    """
+    Wynik podatkowy roku (przed odliczeniem strat). Lata zamknięte są zamrożone:
+    przeliczamy je tylko, gdy zmieni się ich odcisk (np. dopisana wsteczna transakcja).
+    """
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='tax_years')
+    year = models.PositiveIntegerField()
+    revenue = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    cost = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    income = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    div_gross = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    div_tax_paid = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+    # Odcisk transakcji roku (liczba, sumy, max id/data) - zmiana = rok do przeliczenia
+    fingerprint = models.CharField(max_length=200)
+    is_frozen = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('portfolio', 'year')
+        ordering = ['-year']
+
+    def __str__(self):
+        return f"{self.portfolio} {self.year}: {self.income}"
+
+
+class FxRate(models.Model):
+    """
+    Dzienny kurs waluty (1 jednostka waluty = rate PLN). Lokalny magazyn kursów historycznych -
+    przeliczenia po dacie zdarzenia bez pytania Yahoo przy każdym renderze.
+    """
+    currency = models.CharField(max_length=3)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=14, decimal_places=6)
+
+    class Meta:
+        unique_together = ('currency', 'date')
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.currency}/PLN {self.date}: {self.rate}"
+
+
+class CorporateAction(models.Model):
+    """
+    Zdarzenie korporacyjne aktywa (dywidendy, splity, zmiany tickera) - lokalna kopia danych od dostawcy,
+    odświeżana w tle. Prognozy i kalendarz liczymy z tej tabeli, bez Yahoo przy renderze.
+    Splity nanosimy raz, przy zapisie (services/corporate_actions.py) - applied oznacza zdarzenie już
+    uwzględnione w historii cen / tickerze aktywa.
+    """
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='corporate_actions')
+    action_type = models.CharField(max_length=20, choices=CorporateActionType.choices, default=CorporateActionType.DIVIDEND)
+    date = models.DateField(help_text="Ex-date")
+    value = models.DecimalField(max_digits=15, decimal_places=6, default=0,
+                                help_text="Dividend per share (asset currency) / split ratio (new shares per old share)")
+    new_symbol = models.CharField(max_length=20, blank=True, help_text="New Yahoo ticker (ticker change)")
+    applied = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('asset', 'action_type', 'date')
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.asset} {self.action_type} {self.date}: {self.value}"
+
+
+class NewsItem(models.Model):
+    """
+    Oceniony news aktywa (ranking z services/news.py). Wspólny dla wszystkich użytkowników - popularne
+    tickery pobieramy raz na interwał (prefetch_news / odświeżanie w tle), a nie przy każdym wejściu na stronę.
+    """
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='news_items')
+    rank = models.PositiveSmallIntegerField()
+    title = models.CharField(max_length=500)
+    link = models.URLField(max_length=1000)
+    source = models.CharField(max_length=100)
+    published = models.DateField(null=True, blank=True)
+    tags = models.JSONField(default=list, blank=True)
+    priority = models.SmallIntegerField(default=0)
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('asset', 'rank')
+        ordering = ['asset', 'rank']
+
+    def __str__(self):
+        return f"{self.asset} #{self.rank}: {self.title}"
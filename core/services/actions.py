@@ -1,7 +1,7 @@
 # core/services/actions.py
 
 import os
-import random
+import uuid
 from datetime import timedelta
 from django.utils import timezone
 from ..models import Asset, Transaction
@@ -9,6 +9,8 @@ from core.config import SUFFIX_MAP
 from .market import validate_ticker_and_price
 from .calculator import PortfolioCalculator
 from .market import fetch_asset_metadata
+from .snapshot import bump_portfolio_version
+from .corporate_actions import apply_splits_to_transactions
 
 def add_manual_transaction(portfolio, data):
     t_type = data.get('type')
@@ -79,7 +81,7 @@ def add_manual_transaction(portfolio, data):
 
     # 2. AUTO DEPOSIT LOGIC
     if t_type == 'BUY' and auto_deposit:
-        all_trans = Transaction.objects.filter(portfolio=portfolio)
+        all_trans = Transaction.objects.filter(portfolio=portfolio).select_related('asset')
         calc = PortfolioCalculator(all_trans).process()
         current_cash, _ = calc.get_cash_balance()
 
@@ -87,7 +89,7 @@ def add_manual_transaction(portfolio, data):
         if current_cash < cost:
             missing = cost - current_cash
             dep_date = date_obj - timedelta(seconds=1)
-            dep_id = f"MAN-DEP-{dep_date.strftime('%Y%m%d%H%M%S')}-{random.randint(100, 999)}"
+            dep_id = f"MAN-DEP-{dep_date.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
 
             Transaction.objects.create(
                 portfolio=portfolio,
@@ -99,7 +101,8 @@ def add_manual_transaction(portfolio, data):
             )
 
     # 3. SAVE TRANSACTION
-    man_id = f"MAN-{date_obj.strftime('%Y%m%d%H%M')}-{t_type}-{random.randint(1000, 9999)}"
+    # Losowy sufiks z uuid - (portfel, xtb_id) jest unikalne, krótki randint potrafił się powtórzyć
+    man_id = f"MAN-{date_obj.strftime('%Y%m%d%H%M')}-{t_type}-{uuid.uuid4().hex[:8]}"
     final_amount = abs(amount)
     if t_type in ['BUY', 'WITHDRAWAL', 'TAX']:
         final_amount = -final_amount
@@ -114,6 +117,10 @@ def add_manual_transaction(portfolio, data):
         quantity=qty,
         comment="Manual Entry"
     )
+    if asset_obj and t_type in ['BUY', 'SELL']:
+        # Ilość z daty transakcji (przed ewentualnym splitem) - przeliczamy jak przy imporcie
+        apply_splits_to_transactions([asset_obj.id])
+    bump_portfolio_version(portfolio)
 
     return f"Transaction {t_type} {symbol} added."
 
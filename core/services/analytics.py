@@ -1,17 +1,21 @@
 # core/services/analytics.py
 
 import math
+import numpy as np
 import pandas as pd
 from datetime import date, timedelta, datetime
 from .calculator import PortfolioCalculator
 from .market import get_cached_price, fetch_historical_data_for_timeline, update_prices_bulk
 from django.core.cache import cache
 import logging
-from core.config import BENCHMARKS, CURRENCY_TICKERS, DAILY_INFLATION_RATE
+from core.config import BENCHMARKS, DAILY_INFLATION_RATE
+from .fx import ensure_fx_history, load_fx_series, rate_multipliers
+from .instrumentation import timed
 
 logger = logging.getLogger('core')
 
 
+@timed('holdings')
 def analyze_holdings(transactions, currency_rates, start_date=None):
     """
     Analizuje stan posiadania.
@@ -107,6 +111,10 @@ def analyze_holdings(transactions, currency_rates, start_date=None):
     assets_to_update = [h['asset'] for h in holdings_data.values()]
     update_prices_bulk(assets_to_update)
 
+    # Bieżące kursy walut wszystkich aktywów jednym przeliczeniem (fx.convert)
+    currencies = sorted({a.currency for a in assets_to_update})
+    fx_multipliers = dict(zip(currencies, rate_multipliers(currencies, rates=currency_rates)))
+
     # --- 3. GŁÓWNA PĘTLA PO AKTYWACH ---
     for sym, data in holdings_data.items():
         qty = data['qty']
@@ -179,8 +187,7 @@ def analyze_holdings(transactions, currency_rates, start_date=None):
         is_foreign = False
         if asset.currency != 'PLN':
             is_foreign = True
-            multiplier = currency_rates.get(asset.currency, 1.0)
-            if multiplier == 0: multiplier = 1.0
+            multiplier = fx_multipliers[asset.currency]
         if is_fallback_price: multiplier = 1.0
 
         # Wycena bieżąca
@@ -288,15 +295,17 @@ def analyze_holdings(transactions, currency_rates, start_date=None):
     }
 
 
+@timed('history')
 def analyze_history(transactions, currency_rates):
     """
     Generuje dane do wykresu historycznego.
     """
-    # (Ta funkcja pozostaje bez zmian, wklejam skrótowo żeby plik był kompletny)
-    if not transactions.exists():
+    # Jedno zapytanie: bez osobnych exists()/last()/count() i bez dociągania walut aktywów
+    tx_data = list(transactions.values('id', 'date', 'type', 'amount', 'quantity',
+                                       'asset__yahoo_ticker', 'asset__currency'))
+    if not tx_data:
         return {'dates': [], 'val_user': [], 'val_inv': [], 'last_date': 'N/A'}
 
-    tx_data = list(transactions.values('date', 'type', 'amount', 'quantity', 'asset__yahoo_ticker'))
     df_tx = pd.DataFrame(tx_data)
     df_tx['date'] = pd.to_datetime(df_tx['date']).dt.date
     df_tx['amount'] = df_tx['amount'].astype(float)
@@ -307,22 +316,18 @@ def analyze_history(transactions, currency_rates):
     end_date = date.today()
     if df_tx['date'].max() > end_date: end_date = df_tx['date'].max()
 
-    last_tx_id = transactions.last().id
-    count_tx = transactions.count()
-    cache_key = f"history_v21_{last_tx_id}_{count_tx}_{start_date}_{end_date}"
+    last_tx_id = int(df_tx['id'].max())
+    count_tx = len(df_tx)
+    # Suma ilości w kluczu - przeliczenie splitu zmienia ilości bez zmiany liczby transakcji
+    qty_sum = round(float(df_tx['quantity'].sum()), 4)
+    cache_key = f"history_v24_{last_tx_id}_{count_tx}_{qty_sum}_{start_date}_{end_date}"
     cached = cache.get(cache_key)
     if cached: return cached
 
     user_tickers = df_tx['asset__yahoo_ticker'].dropna().unique().tolist()
 
-    CURRENCY_MAP = {
-        'USD': CURRENCY_TICKERS['USD'], 'EUR': CURRENCY_TICKERS['EUR'], 'GBP': CURRENCY_TICKERS['GBP'],
-        'CHF': CURRENCY_TICKERS['CHF'], 'NOK': CURRENCY_TICKERS['NOK'], 'SEK': CURRENCY_TICKERS['SEK'],
-        'DKK': CURRENCY_TICKERS['DKK'], 'CZK': CURRENCY_TICKERS['CZK'], 'PLN': None
-    }
-    needed_currencies = [v for v in CURRENCY_TICKERS.values() if v]
     benchmarks = [BENCHMARKS['SP500'], BENCHMARKS['WIG'], BENCHMARKS['ACWI']]
-    full_ticker_list = list(set(user_tickers + needed_currencies + benchmarks))
+    full_ticker_list = list(set(user_tickers + benchmarks))
 
     hist_data = fetch_historical_data_for_timeline(full_ticker_list, start_date)
 
@@ -383,19 +388,19 @@ def analyze_history(transactions, currency_rates):
         s = get_series(col)
         price_df[col] = smart_fill(s, full_dates)
 
-    from ..models import Asset
-    assets_in_chart = Asset.objects.filter(yahoo_ticker__in=daily_qty.columns)
-    ticker_currency_map = {a.yahoo_ticker: a.currency for a in assets_in_chart}
+    ticker_currency_map = (df_tx.dropna(subset=['asset__yahoo_ticker'])
+                           .drop_duplicates('asset__yahoo_ticker')
+                           .set_index('asset__yahoo_ticker')['asset__currency'].to_dict())
 
-    mult_df = pd.DataFrame(1.0, index=full_dates, columns=price_df.columns)
-    for t_col in mult_df.columns:
-        c_code = ticker_currency_map.get(t_col, 'PLN')
-        c_ticker = CURRENCY_MAP.get(c_code)
-        if c_ticker:
-            s = get_series(c_ticker)
-            filled = smart_fill(s, full_dates)
-            fallback = currency_rates.get(c_code, 1.0)
-            mult_df[t_col] = filled.replace(0.0, fallback)
+    # Kursy walut z magazynu FxRate (as-of dzień) - jedno fx.convert() dla całej siatki dni x tickery
+    columns = list(price_df.columns)
+    col_currencies = [ticker_currency_map.get(t, 'PLN') for t in columns]
+    ensure_fx_history(col_currencies + ['USD'], start_date)
+    fx_series = load_fx_series(col_currencies + ['USD'])
+    grid_dates = np.array(full_dates, dtype='datetime64[D]')
+    mult = rate_multipliers(np.repeat(col_currencies, len(grid_dates)), np.tile(grid_dates, len(columns)),
+                            series=fx_series, rates=currency_rates)
+    mult_df = pd.DataFrame(mult.reshape(len(columns), len(grid_dates)).T, index=full_dates, columns=columns)
 
     common = daily_qty.columns.intersection(price_df.columns)
     stock_val = daily_qty[common] * price_df[common] * mult_df[common]
@@ -405,7 +410,7 @@ def analyze_history(transactions, currency_rates):
 
     daily_deposits = df_tx[df_tx['type'] == 'DEPOSIT'].groupby('date')['amount'].sum().reindex(full_dates, fill_value=0)
 
-    usd_bm = smart_fill(get_series(CURRENCY_TICKERS['USD']), full_dates).replace(0.0, currency_rates.get('USD', 4.0))
+    usd_bm = pd.Series(rate_multipliers('USD', grid_dates, series=fx_series, rates=currency_rates), index=full_dates)
     sp500_price = smart_fill(get_series(BENCHMARKS['SP500']), full_dates)
     denom_sp = usd_bm * sp500_price
     units_sp = daily_deposits / denom_sp
@@ -0,0 +1,38 @@
+# core/services/background.py
+
+import logging
+import threading
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+logger = logging.getLogger('core')
+
+# Jak długo blokada trzyma zadanie (gdyby wątek padł bez sprzątania)
+BACKGROUND_LOCK_TTL = 600
+
+
+def run_in_background(key, func, *args, **kwargs):
+    """
+    Uruchamia func w wątku w tle - bez kolejki zadań, request nie czeka na wynik.
+    Jedno zadanie o danym kluczu naraz (blokada w cache). Zwraca False, gdy zadanie już trwa
+    (lub zadania w tle są wyłączone - BACKGROUND_TASKS_ENABLED).
+    """
+    if not getattr(settings, 'BACKGROUND_TASKS_ENABLED', True):
+        return False
+    lock = f"bg_lock_{key}"
+    if not cache.add(lock, True, BACKGROUND_LOCK_TTL):
+        return False
+
+    def runner():
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"BACKGROUND {key}: {e}")
+        finally:
+            cache.delete(lock)
+            # Wątek ma własne połączenie z bazą - zamykamy, żeby nie wisiało
+            connection.close()
+
+    threading.Thread(target=runner, name=f"bg-{key}", daemon=True).start()
+    return True
@@ -2,6 +2,8 @@
 
 from decimal import Decimal
 from collections import defaultdict
+from .lots import FifoLotMatcher
+from .instrumentation import timed
 
 
 class PortfolioCalculator:
@@ -12,6 +14,7 @@ class PortfolioCalculator:
         # To śledzi tylko WPŁATY/WYPŁATY netto od użytkownika (Twój kapitał)
         self.total_invested_net = Decimal('0.00')
 
+    @timed('calculator')
     def process(self):
         asset_groups = defaultdict(list)
 
@@ -67,7 +70,8 @@ class PortfolioCalculator:
         total_qty = Decimal('0.0000')
         total_cost = Decimal('0.00')
         realized_pln = Decimal('0.00')
-        buy_queue = []
+        # Kolejka FIFO wspólna z księgą podatkową (services/lots.py)
+        matcher = FifoLotMatcher()
 
         trades.sort(key=lambda x: x['date'])
         asset_obj = trades[0]['asset_obj']
@@ -90,28 +94,12 @@ class PortfolioCalculator:
                 total_qty += qty
                 cost_of_trade = abs(amt)
                 total_cost += cost_of_trade
-                price_per_unit = cost_of_trade / qty
-                buy_queue.append([price_per_unit, qty])
+                matcher.add_lot(symbol, qty, cost_of_trade)
 
             elif t['type'] == 'SELL':
                 total_qty -= qty
                 revenue = amt
-                cost_basis_for_sale = Decimal('0.00')
-                shares_to_sell = qty
-
-                while shares_to_sell > 0 and buy_queue:
-                    batch = buy_queue[0]
-                    batch_price = batch[0]
-                    batch_qty = batch[1]
-
-                    if batch_qty <= shares_to_sell:
-                        cost_basis_for_sale += batch_qty * batch_price
-                        shares_to_sell -= batch_qty
-                        buy_queue.pop(0)
-                    else:
-                        cost_basis_for_sale += shares_to_sell * batch_price
-                        batch[1] -= shares_to_sell
-                        shares_to_sell = 0
+                cost_basis_for_sale, _ = matcher.consume(symbol, qty)
 
                 total_cost -= cost_basis_for_sale
                 trade_profit = revenue - cost_basis_for_sale
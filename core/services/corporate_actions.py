@@ -0,0 +1,242 @@
+# core/services/corporate_actions.py
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.db.models import Q
+from django.utils import timezone
+from ..models import Asset, CorporateAction, CorporateActionType, PriceHistory, Portfolio, Transaction
+from .background import run_in_background
+from .market import yahoo_download
+from .snapshot import bump_portfolio_version
+
+logger = logging.getLogger('core')
+
+# Zdarzenia korporacyjne odświeżamy raz na tydzień
+ACTIONS_REFRESH_DAYS = 7
+ACTIONS_HISTORY_PERIOD = '10y'
+
+# Po starcie odświeżania kolejne planujemy najwcześniej po 15 min (także po błędzie sieci)
+ACTIONS_RETRY_TTL = 900
+
+# Licznik zmian tabeli CorporateAction - część kluczy cache prognoz
+ACTIONS_VERSION_KEY = 'corporate_actions_version'
+
+
+def actions_version():
+    return cache.get(ACTIONS_VERSION_KEY, 0)
+
+
+def bump_actions_version():
+    """Unieważnia prognozy dywidend po zmianie tabeli CorporateAction (odświeżenie, edycja w adminie)."""
+    cache.set(ACTIONS_VERSION_KEY, actions_version() + 1, None)
+
+
+def stale_asset_ids(asset_ids):
+    """Aktywa z tickerem Yahoo, których zdarzeń nie pobieraliśmy od ACTIONS_REFRESH_DAYS."""
+    threshold = timezone.now() - timedelta(days=ACTIONS_REFRESH_DAYS)
+    return list(Asset.objects.filter(id__in=asset_ids, yahoo_ticker__isnull=False)
+                .exclude(yahoo_ticker='')
+                .filter(Q(actions_updated__isnull=True) | Q(actions_updated__lt=threshold))
+                .values_list('id', flat=True))
+
+
+def refresh_corporate_actions(asset_ids):
+    """
+    Pobiera historię dywidend i splitów aktywów jednym yf.download(actions=True), zapisuje nowe wpisy
+    i od razu nanosi splity na transakcje / historię cen. Zwraca liczbę zapisanych zdarzeń.
+    """
+    assets = list(Asset.objects.filter(id__in=asset_ids, yahoo_ticker__isnull=False).exclude(yahoo_ticker=''))
+    if not assets:
+        return 0
+    tickers = sorted({a.yahoo_ticker for a in assets})
+
+    data = yahoo_download('corporate_actions', tickers, period=ACTIONS_HISTORY_PERIOD, actions=True,
+                          group_by='ticker', progress=False, threads=False)
+    if data.empty:
+        logger.warning(f"CORPORATE ACTIONS: brak danych dla {len(tickers)} tickerów")
+        return 0
+    if not isinstance(data.columns, pd.MultiIndex):
+        data.columns = pd.MultiIndex.from_product([tickers, data.columns])
+
+    available = set(data.columns.get_level_values(0))
+    rows = []
+    for asset in assets:
+        tk = asset.yahoo_ticker
+        if tk not in available:
+            continue
+        columns = data[tk].columns
+        for column, action_type in (('Dividends', CorporateActionType.DIVIDEND), ('Stock Splits', CorporateActionType.SPLIT)):
+            if column not in columns:
+                continue
+            values = data[tk][column].dropna()
+            # Yahoo: 0 = brak zdarzenia; split 4.0 = 4:1, 0.1 = scalenie 1:10
+            values = values[(values > 0) & (values != 1)] if action_type == CorporateActionType.SPLIT else values[values > 0]
+            rows.extend(
+                CorporateAction(asset=asset, action_type=action_type,
+                                date=pd.Timestamp(d).date(), value=round(float(v), 6))
+                for d, v in values.items()
+            )
+
+    CorporateAction.objects.bulk_create(rows, ignore_conflicts=True, batch_size=1000)
+    # Aktywa bez danych też oznaczamy - inaczej pytalibyśmy o nie przy każdym wejściu
+    Asset.objects.filter(id__in=[a.id for a in assets]).update(actions_updated=timezone.now())
+    apply_corporate_actions([a.id for a in assets])
+    bump_actions_version()
+    logger.info(f"CORPORATE ACTIONS: {len(rows)} zdarzeń dla {len(assets)} aktywów")
+    return len(rows)
+
+
+def schedule_actions_refresh(asset_ids):
+    """Odświeżenie nieaktualnych aktywów w tle (najwyżej raz na ACTIONS_RETRY_TTL). True = zadanie wystartowało."""
+    stale = stale_asset_ids(asset_ids)
+    if not stale or not cache.add('corporate_actions_scheduled', True, ACTIONS_RETRY_TTL):
+        return False
+    run_in_background('corporate_actions', refresh_corporate_actions, stale)
+    return True
+
+
+# =========================================================
+# SPLITY I ZMIANY TICKERA (nanoszone raz, przy zapisie)
+# =========================================================
+
+def split_factors(split_dates, ratios, dates):
+    """
+    Skumulowany współczynnik splitów dla dat: iloczyn ratio wszystkich splitów PÓŹNIEJSZYCH niż data
+    (split działa od dnia ex-date). Wektorowo: iloczyn od końca + searchsorted.
+    split_dates rosnąco (datetime64[D]), dates dowolne.
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    if len(split_dates) == 0:
+        return np.ones(len(dates))
+    suffix = np.append(np.cumprod(np.asarray(ratios, dtype=float)[::-1])[::-1], 1.0)
+    return suffix[np.searchsorted(split_dates, dates, side='right')]
+
+
+def _load_splits(asset_ids):
+    """{asset_id: (daty datetime64[D] rosnąco, ratio)} - jedno zapytanie."""
+    rows = (CorporateAction.objects.filter(asset_id__in=asset_ids, action_type=CorporateActionType.SPLIT, value__gt=0)
+            .order_by('asset_id', 'date').values_list('asset_id', 'date', 'value'))
+    grouped = {}
+    for asset_id, d, ratio in rows:
+        grouped.setdefault(asset_id, ([], []))
+        grouped[asset_id][0].append(d)
+        grouped[asset_id][1].append(float(ratio))
+    return {a: (np.array(d, dtype='datetime64[D]'), np.array(r)) for a, (d, r) in grouped.items()}
+
+
+def apply_splits_to_transactions(asset_ids):
+    """
+    Przelicza BUY/SELL aktywów na ilości po splitach: quantity x współczynnik, price / współczynnik
+    (kwota, czyli koszt, bez zmian). Transaction.split_factor pamięta, co już naniesiono, więc
+    wywołanie jest idempotentne, a re-import wiersza (split_factor=1) przelicza go ponownie.
+    Zwraca id portfeli ze zmienionymi transakcjami.
+    """
+    splits = _load_splits(asset_ids)
+    # Aktywa bez splitów sprawdzamy tylko, gdy coś już naniesiono (np. split usunięty w adminie)
+    txs = list(Transaction.objects.filter(asset_id__in=asset_ids, type__in=['BUY', 'SELL'])
+               .filter(Q(asset_id__in=list(splits)) | ~Q(split_factor=1))
+               .values_list('id', 'portfolio_id', 'asset_id', 'date', 'quantity', 'price', 'split_factor'))
+    if not txs:
+        return set()
+
+    df = pd.DataFrame.from_records(txs, columns=['id', 'portfolio_id', 'asset_id', 'date', 'quantity', 'price', 'applied'])
+    df['day'] = pd.to_datetime(df['date']).dt.tz_localize(None).values.astype('datetime64[D]')
+    df['target'] = 1.0
+    for asset_id, idx in df.groupby('asset_id').groups.items():
+        split_dates, ratios = splits.get(asset_id, ((), ()))
+        df.loc[idx, 'target'] = split_factors(split_dates, ratios, df.loc[idx, 'day'].values)
+
+    df['applied'] = df['applied'].astype(float)
+    df = df[~np.isclose(df['target'], df['applied'])]
+    if df.empty:
+        return set()
+
+    updated = []
+    for r in df.itertuples():
+        # Względem tego, co już w bazie - wartości są już po wcześniej naniesionych splitach
+        step = Decimal(str(r.target / r.applied))
+        updated.append(Transaction(
+            id=r.id,
+            quantity=(r.quantity * step).quantize(Decimal('0.0001')),
+            price=(r.price / step).quantize(Decimal('0.0001')) if r.price is not None else None,
+            split_factor=Decimal(str(round(r.target, 8))),
+        ))
+    Transaction.objects.bulk_update(updated, ['quantity', 'price', 'split_factor'], batch_size=500)
+    logger.info(f"SPLITS: przeliczono {len(updated)} transakcji")
+    return set(df['portfolio_id'].unique().tolist())
+
+
+def _adjust_price_history(pending):
+    """
+    Nanosi nowe splity na zapisaną historię cen. Yahoo zwraca notowania już skorygowane, więc dzielimy
+    tylko wtedy, gdy w bazie widać skok o ratio w dniu splitu (wiersze zapisane przed splitem).
+    """
+    adjusted = 0
+    for asset_id, actions in pending.items():
+        prices = list(PriceHistory.objects.filter(asset_id=asset_id).order_by('date').values_list('id', 'date', 'close_price'))
+        if not prices:
+            continue
+        ids = np.array([p[0] for p in prices])
+        dates = np.array([p[1] for p in prices], dtype='datetime64[D]')
+        closes = np.array([float(p[2]) for p in prices])
+
+        needed = []
+        for action in actions:
+            split_day = np.datetime64(action.date, 'D')
+            pos = np.searchsorted(dates, split_day)
+            if pos == 0:
+                continue
+            ratio = float(action.value)
+            if pos < len(dates) and closes[pos] > 0:
+                jump = np.log(closes[pos - 1] / closes[pos])
+                if abs(jump - np.log(ratio)) >= abs(jump):
+                    continue  # Historia już skorygowana przez dostawcę
+            needed.append((split_day, ratio))
+        if not needed:
+            continue
+
+        factors = split_factors(np.array([d for d, _ in needed], dtype='datetime64[D]'),
+                                [r for _, r in needed], dates)
+        mask = factors != 1.0
+        PriceHistory.objects.bulk_update(
+            [PriceHistory(id=int(pk), close_price=round(float(c), 4)) for pk, c in zip(ids[mask], closes[mask] / factors[mask])],
+            ['close_price'], batch_size=1000)
+        adjusted += int(mask.sum())
+    return adjusted
+
+
+def apply_corporate_actions(asset_ids):
+    """
+    Nanosi nienaniesione zdarzenia aktywów: zmiany tickera (Asset.yahoo_ticker), splity w historii cen
+    i ilościach transakcji. Portfele z przeliczonymi transakcjami dostają nową wersję danych.
+    """
+    pending = list(CorporateAction.objects.filter(
+        asset_id__in=asset_ids, applied=False,
+        action_type__in=[CorporateActionType.SPLIT, CorporateActionType.TICKER_CHANGE],
+    ).order_by('date'))
+
+    with db_transaction.atomic():
+        for action in pending:
+            if action.action_type == CorporateActionType.TICKER_CHANGE and action.new_symbol:
+                Asset.objects.filter(id=action.asset_id).update(yahoo_ticker=action.new_symbol)
+                logger.info(f"CORPORATE ACTIONS: {action.asset} -> {action.new_symbol}")
+
+        splits = {}
+        for action in pending:
+            if action.action_type == CorporateActionType.SPLIT:
+                splits.setdefault(action.asset_id, []).append(action)
+        prices = _adjust_price_history(splits)
+
+        portfolio_ids = apply_splits_to_transactions(asset_ids)
+        CorporateAction.objects.filter(id__in=[a.id for a in pending]).update(applied=True)
+
+    for portfolio in Portfolio.objects.filter(id__in=portfolio_ids):
+        bump_portfolio_version(portfolio)
+    if pending or portfolio_ids:
+        logger.info(f"CORPORATE ACTIONS: naniesiono {len(pending)} zdarzeń, ceny: {prices}, portfele: {len(portfolio_ids)}")
+    return {'actions': len(pending), 'prices': prices, 'portfolios': len(portfolio_ids)}
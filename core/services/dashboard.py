@@ -4,6 +4,8 @@ from ..models import Transaction
 from .market import get_current_currency_rates
 from .analytics import analyze_history, analyze_holdings
 from .performance import PerformanceCalculator
+from .snapshot import get_portfolio_snapshot
+from .reporting import reporting_currency, reporting_rate, stats_in_currency, timeline_in_currency
 from core.config import fmt_2
 from .portfolio import get_dashboard_context as get_base_context
 # FIX: Import musi pasować do nazwy funkcji w utils.py (filter_timeline)
@@ -18,8 +20,9 @@ def get_dashboard_stats_context(active_portfolio, range_mode='all'):
     start_date = calculate_range_dates(range_mode)
     transactions = Transaction.objects.filter(portfolio=active_portfolio)
 
-    # Jeśli brak transakcji, zwracamy puste dane
-    if not transactions.exists():
+    # 1. Dane analityczne ze wspólnego snapshotu (cache per wersja portfela); brak transakcji -> puste dane
+    snapshot = get_portfolio_snapshot(active_portfolio)
+    if snapshot is None:
         return {
             'tile_mwr': "0.00",
             'tile_twr': "0.00",
@@ -32,24 +35,27 @@ def get_dashboard_stats_context(active_portfolio, range_mode='all'):
             'timeline_invested': [],
         }
 
-    # 1. Pobierz kursy i dane analityczne
-    rates = get_current_currency_rates()
-    full_timeline = analyze_history(transactions, rates)
-    stats = analyze_holdings(transactions, rates)  # stats['total_value'] potrzebne do MWR
-    current_val = stats['total_value']
-
-    # 2. Oblicz wskaźniki (Performance)
-    perf = PerformanceCalculator(transactions)
-    metrics = perf.calculate_metrics(
-        timeline_data=full_timeline,
-        start_date=start_date,
-        current_total_value=current_val
-    )
-
-    twr_percent = perf.calculate_twr(full_timeline, start_date_filter=start_date)
-
-    # 3. Filtruj wykres pod zakres
+    full_timeline = snapshot['timeline']
+    current_val = snapshot['stats']['total_value']  # potrzebne do MWR
+
+    # 2. Oblicz wskaźniki (Performance) - zakres 'all' jest już policzony w snapshocie
+    if start_date is None:
+        metrics = snapshot['metrics']
+        twr_percent = metrics['twr']
+    else:
+        perf = PerformanceCalculator(transactions)
+        metrics = perf.calculate_metrics(
+            timeline_data=full_timeline,
+            start_date=start_date,
+            current_total_value=current_val
+        )
+        twr_percent = perf.calculate_twr(full_timeline, start_date_filter=start_date)
+
+    # 3. Filtruj wykres pod zakres i przelicz do waluty raportowej (wskaźniki % liczone w PLN)
     filtered_timeline = filter_timeline(full_timeline, start_date)
+    currency = reporting_currency(active_portfolio)
+    filtered_timeline = timeline_in_currency(filtered_timeline, currency)
+    profit = float(metrics['profit']) * reporting_rate(currency)
 
     # 4. Spakuj wyniki (Bez try-except w widoku!)
     return {
@@ -57,8 +63,9 @@ def get_dashboard_stats_context(active_portfolio, range_mode='all'):
         'tile_twr': fmt_2(twr_percent),
         'tile_return_pct_str': fmt_2(metrics['simple_return']),
         'tile_return_pct_raw': float(metrics['simple_return']),
-        'tile_total_profit_str': fmt_2(metrics['profit']),
-        'tile_total_profit_raw': float(metrics['profit']),
+        'tile_total_profit_str': fmt_2(profit),
+        'tile_total_profit_raw': profit,
+        'currency': currency,
 
         # Wykres
         'timeline_dates': filtered_timeline.get('dates', []),
@@ -89,10 +96,16 @@ def get_holdings_view_context(user, portfolio, range_mode='all'):
 
     # 3. Szczegółowa analiza holdings z uwzględnieniem start_date
     # To nadpisze niektóre pola w assets (np. gain_pln, gain_percent) jeśli start_date jest ustawione
-    transactions = Transaction.objects.filter(portfolio=portfolio)
-    rates = get_current_currency_rates()
-
-    dynamic_stats = analyze_holdings(transactions, rates, start_date=start_date)
+    if start_date is None:
+        snapshot = get_portfolio_snapshot(portfolio)
+        if snapshot is None:  # pusty portfel - kontekst bazowy jest już pusty
+            return context
+        dynamic_stats = snapshot['stats']
+    else:
+        transactions = Transaction.objects.filter(portfolio=portfolio).select_related('asset')
+        rates = get_current_currency_rates()
+        dynamic_stats = analyze_holdings(transactions, rates, start_date=start_date)
+    dynamic_stats = stats_in_currency(dynamic_stats, reporting_currency(portfolio))
 
     # 4. Wzbogacenie listy assetów (formatowanie, kolory) - korzystamy z istniejącego helpera
     from .portfolio import enrich_assets_context
@@ -0,0 +1,179 @@
+# core/services/demo.py
+
+import logging
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from ..models import Portfolio, Transaction, Asset
+from .demo_data import RAW_DATA
+from .market import fetch_historical_data_for_timeline, save_price_history
+from .snapshot import get_portfolio_snapshot, snapshot_cache_key, SNAPSHOT_TTL
+
+logger = logging.getLogger('core')
+
+DEMO_USERNAME = 'demo_user'
+DEMO_PASSWORD = 'demo123'
+DEMO_PORTFOLIO_NAME = "IKE Demo (Real Data 1:1)"
+
+# Właściciel portfela-wzorca - konto techniczne bez hasła (nie da się na nie zalogować)
+TEMPLATE_USERNAME = 'demo_template'
+
+# Pola kopiowane przy klonowaniu transakcji (bez id i portfolio).
+# split_factor razem z quantity/price - inaczej kolejne apply_splits_to_transactions naniesie split drugi raz
+CLONE_FIELDS = ['asset_id', 'xtb_id', 'date', 'type', 'amount', 'quantity', 'price', 'comment', 'content_hash',
+                'amount_currency', 'split_factor']
+
+# Aktywo pominięte w danych demo (NVIDIA)
+SKIPPED_ASSET_PK = 15
+
+
+def load_demo_rows(portfolio):
+    """
+    Ładuje RAW_DATA do portfela: aktywa i transakcje hurtowo (bulk_create zamiast create per wiersz).
+    Zwraca liczbę wgranych transakcji.
+    """
+    asset_rows = {item['pk']: item['fields'] for item in RAW_DATA
+                  if item['model'] == 'core.asset' and item['pk'] != SKIPPED_ASSET_PK}
+
+    # Jedno zapytanie o istniejące aktywa, brakujące jednym insertem
+    existing = {a.symbol: a for a in Asset.objects.filter(symbol__in=[f['symbol'] for f in asset_rows.values()])}
+    Asset.objects.bulk_create([
+        Asset(symbol=f['symbol'], name=f['name'], currency=f['currency'], asset_type=f['asset_type'],
+              sector=f['sector'], yahoo_ticker=f.get('yahoo_ticker', f['symbol']))
+        for f in asset_rows.values() if f['symbol'] not in existing
+    ], ignore_conflicts=True)
+    by_symbol = {a.symbol: a for a in Asset.objects.filter(symbol__in=[f['symbol'] for f in asset_rows.values()])}
+    pk_to_real_asset = {pk: by_symbol.get(f['symbol']) for pk, f in asset_rows.items()}
+
+    new_rows = []
+    for item in RAW_DATA:
+        if item['model'] != 'core.transaction':
+            continue
+        f = item['fields']
+        asset_pk = f.get('asset')
+        if asset_pk == SKIPPED_ASSET_PK:
+            continue
+
+        real_asset = pk_to_real_asset.get(asset_pk)
+        # Zezwalamy na asset=None tylko jesli to operacja gotowkowa (DEPOSIT/WITHDRAWAL)
+        if real_asset is None and f['type'] not in ['DEPOSIT', 'WITHDRAWAL', 'OTHER']:
+            continue
+
+        new_rows.append(Transaction(
+            portfolio=portfolio,
+            asset=real_asset,
+            date=f['date'],
+            type=f['type'],
+            amount=Decimal(f['amount']),
+            quantity=Decimal(f['quantity']),
+            price=Decimal(f['price']) if f['price'] else None,
+            comment=f.get('comment', '')
+        ))
+
+    Transaction.objects.bulk_create(new_rows)
+    return len(new_rows)
+
+
+def ensure_demo_template(rebuild=False):
+    """
+    Zwraca portfel-wzorzec z danymi demo. Tworzy go tylko raz (lub przy rebuild=True)
+    razem z historią cen aktywów (PriceHistory) - kolejne logowania demo tylko go klonują.
+    """
+    template_user, created = User.objects.get_or_create(username=TEMPLATE_USERNAME)
+    if created:
+        template_user.set_unusable_password()
+        template_user.save()
+
+    template = Portfolio.objects.filter(user=template_user).first()
+    if template and not rebuild:
+        return template
+
+    with db_transaction.atomic():
+        Portfolio.objects.filter(user=template_user).delete()
+        template = Portfolio.objects.create(
+            user=template_user, name=DEMO_PORTFOLIO_NAME, portfolio_type='IKE', currency='PLN'
+        )
+        count = load_demo_rows(template)
+    logger.info(f"DEMO: utworzono wzorzec ({count} transakcji)")
+
+    _store_template_prices(template)
+    return template
+
+
+def _store_template_prices(template):
+    """Historia cen aktywów wzorca do PriceHistory (raz, przy budowie wzorca)."""
+    assets = list(Asset.objects.filter(transaction__portfolio=template, yahoo_ticker__isnull=False).distinct())
+    first = Transaction.objects.filter(portfolio=template).order_by('date').first()
+    if not assets or first is None:
+        return
+    try:
+        hist = fetch_historical_data_for_timeline([a.yahoo_ticker for a in assets], first.date.date())
+        saved = save_price_history(hist, assets)
+        logger.info(f"DEMO: zapisano {saved} cen historycznych")
+    except Exception as e:
+        logger.warning(f"DEMO: nie udało się zapisać historii cen: {e}")
+
+
+def template_snapshot(template):
+    """Snapshot wzorca (holdings, timeline, metryki) - liczony raz na TTL, współdzielony przez wszystkie klony."""
+    try:
+        return get_portfolio_snapshot(template)
+    except Exception as e:
+        logger.warning(f"DEMO: snapshot wzorca niedostępny: {e}")
+        return None
+
+
+def clone_demo_portfolio(user, template):
+    """
+    Klon wzorca dla użytkownika: 1 SELECT + 1 INSERT transakcji zamiast ładowania RAW_DATA od nowa.
+    Gotowy snapshot wzorca trafia pod klucz klona, więc dashboard nie liczy niczego od zera.
+    """
+    rows = Transaction.objects.filter(portfolio=template).values_list(*CLONE_FIELDS)
+
+    with db_transaction.atomic():
+        Portfolio.objects.filter(user=user).delete()
+        clone = Portfolio.objects.create(
+            user=user, name=template.name, portfolio_type=template.portfolio_type, currency=template.currency
+        )
+        Transaction.objects.bulk_create([
+            Transaction(portfolio=clone, **dict(zip(CLONE_FIELDS, row))) for row in rows
+        ])
+
+    _share_snapshot(template, clone)
+    return clone
+
+
+def _share_snapshot(template, portfolio):
+    snapshot = template_snapshot(template)
+    if snapshot is not None:
+        cache.set(snapshot_cache_key(portfolio), dict(snapshot, version=portfolio.data_version), SNAPSHOT_TTL)
+
+
+def _is_pristine(portfolios, template):
+    """Copy-on-write: portfel demo nietknięty od klonowania (każdy zapis podbija data_version)."""
+    if len(portfolios) != 1:
+        return False
+    p = portfolios[0]
+    return (p.data_version == 0 and p.name == template.name
+            and p.portfolio_type == template.portfolio_type and p.currency == template.currency)
+
+
+def prepare_demo_user():
+    """
+    Zwraca użytkownika demo z portfelem w stanie wzorcowym.
+    Klonujemy tylko, gdy poprzedni odwiedzający coś zmienił - inaczej logowanie to kilka SELECT-ów.
+    """
+    template = ensure_demo_template()
+    user, created = User.objects.get_or_create(username=DEMO_USERNAME)
+    if created:
+        user.set_password(DEMO_PASSWORD)
+        user.save()
+
+    portfolios = list(Portfolio.objects.filter(user=user))
+    if _is_pristine(portfolios, template):
+        if cache.get(snapshot_cache_key(portfolios[0])) is None:
+            _share_snapshot(template, portfolios[0])
+    else:
+        clone_demo_portfolio(user, template)
+    return user
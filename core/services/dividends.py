@@ -1,71 +1,90 @@
 # core/services/dividends.py
 
-from .market import get_current_currency_rates
+from datetime import date, timedelta
+import pandas as pd
+from django.core.cache import cache
+from django.db.models import Sum, Case, When, F
+from django.db.models.functions import Coalesce, TruncDate
+from ..models import Transaction, CorporateAction, CorporateActionType
 from core.config import fmt_2
-from .selectors import get_transactions  # <--- Używamy warstwy Selectors
+from .selectors import get_portfolio_by_id, get_user_portfolios
+from .fx import BASE_CURRENCY, ensure_fx_history, convert
+from .reporting import reporting_currency
+from .corporate_actions import schedule_actions_refresh, actions_version
 
+DIVIDENDS_TTL = 3600
 
-def get_dividend_context(user, portfolio_id=None):
-    # 1. Pobieramy wszystkie transakcje dla wybranego portfela
-    # (zgodnie z architekturą, nie pytamy tutaj o model Portfolio bezpośrednio)
-    all_txs = get_transactions(user, portfolio_id)
-
-    # Filtrujemy tylko dywidendy i podatki
-    txs = all_txs.filter(type__in=['DIVIDEND', 'TAX'])
-
-    if not txs.exists():
-        return {}
+# Prognoza: wypłaty z ostatnich 12 miesięcy powtórzone rok później
+FORECAST_MONTHS = 12
 
-    # 2. Pobieramy słownik kursów
-    rates = get_current_currency_rates()
 
-    total_received_pln = 0.0
-    total_tax_pln = 0.0
-    yearly_data = {}
-    monthly_data = {}
-    payers = {}
-    available_years = set()
+def dividends_cache_key(portfolios, currency=BASE_CURRENCY):
+    versions = '_'.join(f"{p.id}v{p.data_version}" for p in portfolios)
+    return f"dividends_{versions}_{currency}"
 
-    for t in txs:
-        amt = float(t.amount)
 
-        # 3. Inteligentne przeliczanie walut
-        multiplier = 1.0
-        if t.asset and t.asset.currency != 'PLN':
-            curr = t.asset.currency
-            if curr == 'JPY':
-                multiplier = rates.get('JPY', 1.0) / 100
-            else:
-                multiplier = rates.get(curr, 1.0)
+def get_dividend_context(user, portfolio_id=None):
+    portfolio = get_portfolio_by_id(user, portfolio_id)
+    portfolios = [portfolio] if portfolio else list(get_user_portfolios(user))
+    if not portfolios:
+        return {}
 
-            amt *= multiplier
+    # Strona z cache per wersja portfeli i waluta raportowa - import / ręczna transakcja podbija wersję
+    currency = reporting_currency(portfolio)
+    key = dividends_cache_key(portfolios, currency)
+    context = cache.get(key)
+    if context is None:
+        context = _build_dividend_context(portfolios, currency)
+        cache.set(key, context, DIVIDENDS_TTL)
+    return context
+
+
+def _payments(portfolios):
+    """
+    Dywidendy i podatki zsumowane w bazie per (typ, płatnik, waluta kwoty, dzień wypłaty) - jedno zapytanie
+    z JOIN-em na aktywo. Dzień, nie miesiąc: każda wypłata przeliczana po kursie z dnia płatności.
+    Waluta kwoty: amount_currency wiersza (importer już przeliczył), w jej braku waluta aktywa (XTB).
+    """
+    rows = (Transaction.objects.filter(portfolio__in=portfolios, type__in=['DIVIDEND', 'TAX'])
+            .values('type', 'asset__symbol', source_currency=Coalesce('amount_currency', 'asset__currency'),
+                    day=TruncDate('date'))
+            .annotate(total=Sum('amount'))
+            .order_by())
+    return pd.DataFrame.from_records(list(rows), columns=['type', 'asset__symbol', 'source_currency', 'day', 'total'])
+
+
+def _build_dividend_context(portfolios, currency=BASE_CURRENCY):
+    df = _payments(portfolios)
+    if df.empty:
+        return {}
 
-        net_amount = amt
-        if t.type == 'DIVIDEND':
-            total_received_pln += amt
-        elif t.type == 'TAX':
-            total_tax_pln += abs(amt)
+    df['total'] = df['total'].astype(float)
+    df['day'] = pd.to_datetime(df['day'])
 
-        year = t.date.year
-        month = t.date.month - 1  # 0-11 dla JS
+    # Kursy historyczne z magazynu FxRate (as-of dzień wypłaty) - jedno wektorowe fx.convert()
+    currencies = df['source_currency'].dropna().unique().tolist()
+    ensure_fx_history(currencies + [currency], df['day'].min().date())
+    df['pln'] = convert(df['total'].values, df['source_currency'].values, df['day'].values, target=currency)
 
-        available_years.add(year)
-        yearly_data[year] = yearly_data.get(year, 0.0) + net_amount
+    is_div = df['type'] == 'DIVIDEND'
+    total_received_pln = float(df.loc[is_div, 'pln'].sum())
+    total_tax_pln = float(df.loc[~is_div, 'pln'].abs().sum())
 
-        if year not in monthly_data:
-            monthly_data[year] = [0.0] * 12
-        monthly_data[year][month] += net_amount
+    df['year'] = df['day'].dt.year
+    df['month'] = df['day'].dt.month - 1  # 0-11 dla JS
 
-        if t.type == 'DIVIDEND' and t.asset:
-            sym = t.asset.symbol
-            payers[sym] = payers.get(sym, 0.0) + amt
+    yearly = df.groupby('year')['pln'].sum()
+    sorted_years = [int(y) for y in yearly.index]
+    yearly_values = [round(float(v), 2) for v in yearly.values]
 
-    sorted_years = sorted(list(available_years))
-    yearly_values = [round(yearly_data.get(y, 0), 2) for y in sorted_years]
+    monthly = df.groupby(['year', 'month'])['pln'].sum()
+    monthly_data = {y: [0.0] * 12 for y in sorted_years}
+    for (y, m), v in monthly.items():
+        monthly_data[int(y)][int(m)] = round(float(v), 2)
 
     # Sortowanie płatników
-    sorted_payers = sorted(payers.items(), key=lambda item: item[1], reverse=True)
-    top_payers_list = [{'symbol': k, 'amount': fmt_2(v)} for k, v in sorted_payers]
+    payers = df[is_div & df['asset__symbol'].notna()].groupby('asset__symbol')['pln'].sum().sort_values(ascending=False)
+    top_payers_list = [{'symbol': k, 'amount': fmt_2(float(v))} for k, v in payers.items()]
 
     # Przygotowanie danych miesięcznych dla wykresu (ostatni dostępny rok jako domyślny)
     current_year_monthly = monthly_data.get(sorted_years[-1], [0] * 12) if sorted_years else [0] * 12
@@ -82,4 +101,91 @@ def get_dividend_context(user, portfolio_id=None):
         'years_data': yearly_values,
         'monthly_data': current_year_monthly,
         'all_monthly_data': monthly_data,
-    }
\ No newline at end of file
+        'currency': currency,
+    }
+
+
+# =========================================================
+# PROGNOZA (następne 12 miesięcy)
+# =========================================================
+
+def get_dividend_forecast(user, portfolio_id=None):
+    """
+    Kalendarz i prognoza dywidend na 12 miesięcy: bieżące ilości x wypłaty na akcję z ostatniego roku
+    (tabela CorporateAction). Brakujące / stare dane dociągane w tle - render nie pyta Yahoo.
+    """
+    portfolio = get_portfolio_by_id(user, portfolio_id)
+    portfolios = [portfolio] if portfolio else list(get_user_portfolios(user))
+    if not portfolios:
+        return {}
+
+    holdings = _current_holdings(portfolios)
+    refreshing = schedule_actions_refresh(holdings['asset_id'].tolist()) if not holdings.empty else False
+
+    today = date.today()
+    currency = reporting_currency(portfolio)
+    key = f"div_forecast_{dividends_cache_key(portfolios, currency)}_a{actions_version()}_{today.isoformat()}"
+    forecast = cache.get(key)
+    if forecast is None:
+        forecast = _build_forecast(holdings, today, currency)
+        cache.set(key, forecast, DIVIDENDS_TTL)
+    return dict(forecast, forecast_refreshing=refreshing, currency=currency)
+
+
+def _current_holdings(portfolios):
+    """Bieżące ilości per aktywo (BUY - SELL) policzone w bazie jednym GROUP BY."""
+    rows = (Transaction.objects.filter(portfolio__in=portfolios, type__in=['BUY', 'SELL'], asset__isnull=False)
+            .values('asset_id', 'asset__symbol', 'asset__currency')
+            .annotate(qty=Sum(Case(When(type='SELL', then=-F('quantity')), default=F('quantity'))))
+            .order_by())
+    df = pd.DataFrame.from_records(list(rows), columns=['asset_id', 'asset__symbol', 'asset__currency', 'qty'])
+    df['qty'] = df['qty'].astype(float)
+    return df[df['qty'] > 0.0001]
+
+
+def _build_forecast(holdings, today, currency=BASE_CURRENCY):
+    empty = {'forecast_total': fmt_2(0), 'forecast_labels': [], 'forecast_values': [], 'forecast_calendar': []}
+    if holdings.empty:
+        return empty
+
+    # Wypłaty z ostatnich 12 miesięcy dla trzymanych aktywów - jedno zapytanie, join w pandas
+    since = today - timedelta(days=365)
+    actions = pd.DataFrame.from_records(
+        list(CorporateAction.objects.filter(asset_id__in=holdings['asset_id'].tolist(),
+                                            action_type=CorporateActionType.DIVIDEND, date__gt=since)
+             .values('asset_id', 'date', 'value')),
+        columns=['asset_id', 'date', 'value'])
+    if actions.empty:
+        return empty
+
+    df = actions.merge(holdings, on='asset_id')
+    df['pay_date'] = pd.to_datetime(df['date']) + pd.DateOffset(years=1)
+    df['per_share'] = df['value'].astype(float)
+
+    df['amount'] = convert(df['per_share'] * df['qty'], df['asset__currency'].values, today, target=currency)
+    df = df.sort_values('pay_date')
+
+    months = pd.period_range(pd.Timestamp(today), periods=FORECAST_MONTHS, freq='M')
+    df['month'] = df['pay_date'].dt.to_period('M')
+    df = df[df['month'].isin(months)]
+    per_month = df.groupby('month')['amount'].sum().reindex(months, fill_value=0.0)
+
+    calendar = []
+    for month, group in df.groupby('month', sort=True):
+        calendar.append({
+            'month': month.strftime('%Y-%m'),
+            'total': fmt_2(float(group['amount'].sum())),
+            'payments': [
+                {'date': r.pay_date.strftime('%Y-%m-%d'), 'symbol': r.asset__symbol,
+                 'per_share': round(r.per_share, 4), 'currency': r.asset__currency,
+                 'quantity': round(r.qty, 4), 'amount': fmt_2(r.amount)}
+                for r in group.itertuples()
+            ],
+        })
+
+    return {
+        'forecast_total': fmt_2(float(df['amount'].sum())),
+        'forecast_labels': [m.strftime('%Y-%m') for m in months],
+        'forecast_values': [round(float(v), 2) for v in per_month.values],
+        'forecast_calendar': calendar,
+    }
@@ -0,0 +1,205 @@
+# core/services/fx.py
+
+import logging
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.db.models import Min, Max
+from ..models import FxRate
+from .market import get_current_currency_rates, yahoo_download
+from core.config import CURRENCY_TICKERS
+
+logger = logging.getLogger('core')
+
+BASE_CURRENCY = 'PLN'
+
+# Kursy starsze niż tyle dni uznajemy za nieaktualne (weekendy/święta bez notowań)
+FX_STALE_DAYS = 4
+
+# Po nieudanej/pustej próbie pobrania nie pytamy Yahoo o tę walutę przez 6h
+FX_RETRY_TTL = 6 * 3600
+
+# Klucze (waluta, dzień) w jednej tablicy: dzień liczony od epoki + przesunięcie, waluty co DAY_SPAN
+DAY_OFFSET = 500_000
+DAY_SPAN = 1_000_000
+
+
+def fx_ticker(currency):
+    return CURRENCY_TICKERS.get(currency, f"{currency}{BASE_CURRENCY}=X")
+
+
+def ensure_fx_history(currencies, start_date):
+    """
+    Uzupełnia magazyn FxRate tak, żeby pokrywał okres od start_date do dziś.
+    Pobiera tylko waluty z brakami (jedno yf.download dla wszystkich). Zwraca liczbę zapisanych kursów.
+    """
+    currencies = sorted({c for c in currencies if c and c != BASE_CURRENCY})
+    if not currencies:
+        return 0
+
+    today = date.today()
+    coverage = {r['currency']: r for r in FxRate.objects.filter(currency__in=currencies)
+                .values('currency').annotate(first=Min('date'), last=Max('date'))}
+
+    missing = []
+    for c in currencies:
+        cov = coverage.get(c)
+        if cov and cov['first'] <= start_date + timedelta(days=FX_STALE_DAYS) \
+                and cov['last'] >= today - timedelta(days=FX_STALE_DAYS):
+            continue
+        if cache.get(f"fx_sync_attempt_{c}"):
+            continue
+        missing.append(c)
+    if not missing:
+        return 0
+
+    tickers = {fx_ticker(c): c for c in missing}
+    try:
+        data = yahoo_download('fx_history', list(tickers), start=start_date - timedelta(days=7),
+                              end=today + timedelta(days=1), group_by='ticker', progress=False, threads=False)
+    except Exception as e:
+        logger.warning(f"FX: pobieranie kursów nieudane ({', '.join(missing)}): {e}")
+        data = pd.DataFrame()
+    finally:
+        for c in missing:
+            cache.set(f"fx_sync_attempt_{c}", True, FX_RETRY_TTL)
+
+    if data.empty:
+        return 0
+    if not isinstance(data.columns, pd.MultiIndex):
+        data.columns = pd.MultiIndex.from_product([list(tickers), data.columns])
+
+    rows = []
+    for ticker, currency in tickers.items():
+        if ticker not in data.columns.get_level_values(0):
+            continue
+        closes = data[ticker]['Close'].dropna()
+        rows.extend(FxRate(currency=currency, date=pd.Timestamp(d).date(), rate=round(float(v), 6))
+                    for d, v in closes.items() if v > 0)
+    FxRate.objects.bulk_create(rows, ignore_conflicts=True, batch_size=1000)
+    logger.info(f"FX: zapisano {len(rows)} kursów ({', '.join(missing)})")
+    return len(rows)
+
+
+def load_fx_series(currencies):
+    """{waluta: (daty datetime64[D] rosnąco, kursy float)} z magazynu - jedno zapytanie."""
+    currencies = [c for c in set(currencies) if c and c != BASE_CURRENCY]
+    rows = FxRate.objects.filter(currency__in=currencies).order_by('currency', 'date').values_list('currency', 'date', 'rate')
+    grouped = {}
+    for currency, d, rate in rows:
+        grouped.setdefault(currency, ([], []))
+        grouped[currency][0].append(d)
+        grouped[currency][1].append(float(rate))
+    return {c: (np.array(d, dtype='datetime64[D]'), np.array(r)) for c, (d, r) in grouped.items()}
+
+
+def _normalize_currencies(currencies, size):
+    """Kody walut jako tablica str (None / '' = waluta bazowa); pojedynczy kod rozciągany na wszystkie kwoty."""
+    if currencies is None or isinstance(currencies, str):
+        return np.full(size, currencies or BASE_CURRENCY, dtype=object)
+    codes = pd.Series(currencies, dtype=object)
+    return codes.where(codes.notna() & (codes != ''), BASE_CURRENCY).to_numpy()
+
+
+def _current_rate(currency, rates):
+    """Dzisiejszy kurs z podsumowania rynku (1 jednostka waluty w PLN)."""
+    if currency == BASE_CURRENCY:
+        return 1.0
+    rate = rates.get(currency)
+    if not rate:
+        logger.warning(f"FX: brak kursu {currency}, przyjmuję 1.0")
+        return 1.0
+    return float(rate)
+
+
+def _gather_rates(codes, inverse, days, series, rates):
+    """
+    Kursy do PLN dla każdego elementu: jedna tablica kluczy (waluta, dzień) dla wszystkich walut
+    i jedno searchsorted (as-of: ostatni notowany dzień <= data, przed pierwszym - pierwszy kurs).
+    Waluta spoza magazynu: stały dzisiejszy kurs. days=None - wszystko po kursie dzisiejszym.
+    """
+    if days is None:
+        table = np.array([_current_rate(c, rates()) for c in codes])
+        return table[inverse]
+
+    day_num = days.astype('int64') + DAY_OFFSET
+    keys, values, starts = [], [], []
+    offset = 0
+    for k, code in enumerate(codes):
+        if code == BASE_CURRENCY:
+            known_days, known_rates = np.zeros(1, dtype='int64'), np.ones(1)
+        elif code in series:
+            known_days = series[code][0].astype('int64') + DAY_OFFSET
+            known_rates = series[code][1]
+        else:
+            logger.warning(f"FX: brak kursów historycznych {code}, używam bieżącego")
+            known_days, known_rates = np.zeros(1, dtype='int64'), np.array([_current_rate(code, rates())])
+        keys.append(k * DAY_SPAN + known_days)
+        values.append(known_rates)
+        starts.append(offset)
+        offset += len(known_days)
+
+    keys, values, starts = np.concatenate(keys), np.concatenate(values), np.array(starts)
+    idx = np.searchsorted(keys, inverse * DAY_SPAN + day_num, side='right') - 1
+    return values[np.maximum(idx, starts[inverse])]
+
+
+def convert(amounts, currencies, dates=None, target=BASE_CURRENCY, series=None, rates=None):
+    """
+    Przelicza kwoty z walut źródłowych na walutę docelową - wektorowo, po kursie z dnia (as-of).
+
+    amounts    - tablica kwot
+    currencies - kod waluty per kwota (albo jeden kod dla wszystkich)
+    dates      - daty per kwota (albo jedna data); None = kurs bieżący z podsumowania rynku
+    series     - wynik load_fx_series() (gdy None, jedno zapytanie do magazynu FxRate)
+    rates      - bieżące kursy {kod: PLN} (gdy None, get_current_currency_rates())
+
+    Wszystkie kursy w magazynie i w podsumowaniu rynku są za 1 jednostkę waluty.
+    Historię kursów uzupełnia ensure_fx_history() - convert() nie pyta Yahoo.
+    """
+    amounts = np.asarray(amounts, dtype=float)
+    source = _normalize_currencies(currencies, len(amounts))
+    codes, inverse = np.unique(np.append(source, target).astype(str), return_inverse=True)
+    source_idx, target_idx = inverse[:-1], inverse[-1:]
+
+    days = None
+    if dates is not None:
+        days = np.asarray(dates, dtype='datetime64[D]')
+        if days.ndim == 0:
+            days = np.full(len(amounts), days)
+        if series is None:
+            series = load_fx_series(codes.tolist())
+
+    # Bieżące kursy pobieramy tylko, gdy są potrzebne (brak dat lub waluta spoza magazynu)
+    current_rates = (lambda: rates) if rates is not None else get_current_currency_rates
+
+    factors = _gather_rates(codes, source_idx, days, series, current_rates)
+    if target != BASE_CURRENCY:
+        factors = factors / _gather_rates(codes, np.repeat(target_idx, len(amounts)), days, series, current_rates)
+    return amounts * factors
+
+
+def rate_multipliers(currencies, dates=None, target=BASE_CURRENCY, series=None, rates=None):
+    """Kurs (mnożnik do waluty docelowej) per element - convert() dla jednostkowych kwot."""
+    size = 1 if currencies is None or isinstance(currencies, str) else len(currencies)
+    if dates is not None and np.ndim(dates) > 0:
+        size = len(dates)
+    return convert(np.ones(size), currencies, dates, target, series, rates)
+
+
+def cross_rate_matrix(currencies, dates=None, series=None, rates=None):
+    """
+    Macierz kursów krzyżowych z magazynu: M[..., i, j] = ile jednostek currencies[j] za 1 jednostkę currencies[i].
+    Bez dat - kursy bieżące, kształt (n, n); z datami - (len(dates), n, n). Liczona z kursów do PLN
+    jednym dzieleniem z broadcastingiem.
+    """
+    currencies = list(currencies)
+    if dates is None:
+        to_base = rate_multipliers(currencies, rates=rates)
+        return to_base[:, None] / to_base[None, :]
+
+    days = np.asarray(dates, dtype='datetime64[D]')
+    n, t = len(currencies), len(days)
+    to_base = rate_multipliers(np.repeat(currencies, t), np.tile(days, n), series=series, rates=rates).reshape(n, t).T
+    return to_base[:, :, None] / to_base[:, None, :]
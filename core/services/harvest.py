@@ -0,0 +1,164 @@
+# core/services/harvest.py
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from ..models import Asset, PriceHistory, TaxLot
+from .fx import convert
+from .tax_engine import TAX_RATE, TAX_REPORT_TTL, get_tax_report, loss_capacity
+
+# Ile lotów zwracamy w szczegółach symulowanej sprzedaży
+SIMULATION_LOTS_LIMIT = 50
+
+
+def lot_index_cache_key(portfolio):
+    return f"lot_index_{portfolio.id}_v{portfolio.data_version}"
+
+
+def get_lot_index(portfolio):
+    """
+    Indeks otwartych lotów (TaxLot z remaining_quantity > 0) w kolejności FIFO jako tablice numpy.
+    'prev' = ile sztuk danego aktywa leży w starszych lotach - z tego liczymy zdejmowanie FIFO
+    dla wszystkich aktywów naraz. Cache per wersja portfela (księgę synchronizuje get_tax_report).
+    """
+    key = lot_index_cache_key(portfolio)
+    index = cache.get(key)
+    if index is not None:
+        return index
+
+    rows = list(TaxLot.objects.filter(portfolio=portfolio, remaining_quantity__gt=0, asset__isnull=False)
+                .order_by('asset_id', 'date', 'id')
+                .values_list('asset_id', 'asset__symbol', 'date', 'quantity', 'cost', 'remaining_quantity'))
+    asset_ids, symbols, lot_asset = [], [], []
+    for asset_id, symbol, *_ in rows:
+        if not asset_ids or asset_ids[-1] != asset_id:
+            asset_ids.append(asset_id)
+            symbols.append(symbol)
+        lot_asset.append(len(asset_ids) - 1)
+
+    lot_asset = np.array(lot_asset, dtype=int)
+    qty = np.array([float(r[5]) for r in rows])
+    unit_cost = np.array([float(r[4]) / float(r[3]) if r[3] else 0.0 for r in rows])
+
+    cum = np.cumsum(qty)
+    _, first = np.unique(lot_asset, return_index=True)
+    prev = cum - qty - (cum[first] - qty[first])[lot_asset]
+
+    index = {
+        'asset_ids': asset_ids, 'symbols': symbols, 'lot_asset': lot_asset,
+        'dates': [r[2].strftime('%Y-%m-%d') for r in rows],
+        'qty': qty, 'unit_cost': unit_cost, 'prev': prev,
+        'held': np.bincount(lot_asset, weights=qty, minlength=len(asset_ids)),
+    }
+    cache.set(key, index, TAX_REPORT_TTL)
+    return index
+
+
+def _current_prices_pln(asset_ids):
+    """
+    Ceny bieżące w PLN z bazy (Asset.last_price, a gdy brak - ostatnie zamknięcie z PriceHistory).
+    Bez zapytań do Yahoo - symulator ma odpowiadać od ręki.
+    """
+    latest_close = PriceHistory.objects.filter(asset=OuterRef('pk')).order_by('-date').values('close_price')[:1]
+    rows = {a['id']: a for a in Asset.objects.filter(id__in=asset_ids)
+            .annotate(hist_close=Subquery(latest_close)).values('id', 'currency', 'last_price', 'hist_close')}
+    rows = [rows[asset_id] for asset_id in asset_ids]
+    prices = np.array([float(a['last_price'] or 0) or float(a['hist_close'] or 0) for a in rows])
+    return convert(prices, [a['currency'] for a in rows])
+
+
+def _fifo_cost(index, sell_qty):
+    """Koszt FIFO sprzedaży sell_qty[a] sztuk każdego aktywa naraz. Zwraca (koszt per aktywo, zdjęte per lot)."""
+    take = np.clip(sell_qty[index['lot_asset']] - index['prev'], 0.0, index['qty'])
+    cost = np.bincount(index['lot_asset'], weights=take * index['unit_cost'], minlength=len(index['asset_ids']))
+    return cost, take
+
+
+def _stock_tax(income, capacity):
+    return np.round(np.maximum(income - capacity, 0.0) * TAX_RATE, 2)
+
+
+def simulate_sell(portfolio, symbol=None, quantity=None, price=None):
+    """
+    What-if: sprzedaż `quantity` sztuk `symbol` dziś - zysk/strata wg FIFO i podatek za bieżący rok.
+    Zawsze zwraca też ranking okazji (sprzedaż całej pozycji każdego aktywa) - liczony jednym
+    wektorowym przebiegiem po wszystkich lotach względem dochodu zrealizowanego w tym roku.
+    price - opcjonalna cena w PLN (suwak "a gdyby kurs był ...").
+    """
+    year = timezone.now().year
+    report = get_tax_report([portfolio])
+    row = next((r for r in report['years'] if r['year'] == year), None)
+    income = row['income'] if row else 0.0
+    capacity = loss_capacity(report, year)
+    tax_now = float(_stock_tax(income, capacity))
+
+    index = get_lot_index(portfolio)
+    prices = _current_prices_pln(index['asset_ids'])
+
+    # Ranking: każda pozycja sprzedana w całości
+    held = index['held']
+    cost_all, _ = _fifo_cost(index, held)
+    gain_all = held * prices - cost_all
+    tax_delta = _stock_tax(income + gain_all, capacity) - tax_now
+
+    opportunities = [
+        {
+            'symbol': index['symbols'][i],
+            'quantity': round(float(held[i]), 4),
+            'price': round(float(prices[i]), 4),
+            'value': round(float(held[i] * prices[i]), 2),
+            'cost': round(float(cost_all[i]), 2),
+            'gain': round(float(gain_all[i]), 2),
+            'tax_delta': round(float(tax_delta[i]), 2),
+        }
+        for i in np.lexsort((gain_all, tax_delta)) if prices[i] > 0
+    ]
+
+    result = {
+        'year': year,
+        'realized_income': round(income, 2),
+        'loss_capacity': round(capacity, 2),
+        'tax_now': tax_now,
+        'opportunities': opportunities,
+    }
+
+    if symbol:
+        result['sell'] = _simulate_one(index, prices, symbol, quantity, price, income, capacity, tax_now)
+    return result
+
+
+def _simulate_one(index, prices, symbol, quantity, price, income, capacity, tax_now):
+    if symbol not in index['symbols']:
+        return {'symbol': symbol, 'error': 'No open lots for this symbol.'}
+
+    i = index['symbols'].index(symbol)
+    held = float(index['held'][i])
+    qty = held if quantity is None else min(max(float(quantity), 0.0), held)
+    unit_price = float(prices[i]) if price is None else float(price)
+
+    sell_qty = np.zeros(len(index['asset_ids']))
+    sell_qty[i] = qty
+    cost, take = _fifo_cost(index, sell_qty)
+
+    proceeds = qty * unit_price
+    gain = proceeds - float(cost[i])
+    tax_after = float(_stock_tax(income + gain, capacity))
+
+    lots = [
+        {'date': index['dates'][k], 'quantity': round(float(take[k]), 4),
+         'unit_cost': round(float(index['unit_cost'][k]), 4), 'cost': round(float(take[k] * index['unit_cost'][k]), 2)}
+        for k in np.flatnonzero(take)[:SIMULATION_LOTS_LIMIT]
+    ]
+    return {
+        'symbol': symbol,
+        'quantity': round(qty, 4),
+        'held': round(held, 4),
+        'price': round(unit_price, 4),
+        'proceeds': round(proceeds, 2),
+        'cost': round(float(cost[i]), 2),
+        'gain': round(gain, 2),
+        'tax_after': tax_after,
+        'tax_delta': round(tax_after - tax_now, 2),
+        'lots': lots,
+    }
@@ -0,0 +1,180 @@
+# core/services/household.py
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from django.core.cache import cache
+from django.db import connection
+from ..models import Transaction
+from core.config import fmt_2, fmt_4
+from .market import get_current_currency_rates
+from .performance import PerformanceCalculator
+from .selectors import get_user_portfolios
+from .snapshot import get_portfolio_snapshot, SNAPSHOT_TTL
+
+logger = logging.getLogger('core')
+
+# Ile snapshotów portfeli liczymy naraz (każdy wątek = własne połączenie z bazą)
+HOUSEHOLD_WORKERS = 4
+
+# Serie kwotowe historii sumowane po portfelach (procenty liczymy od nowa z sum)
+TIMELINE_SUM_SERIES = ['val_user', 'val_inv', 'val_sp', 'val_wig', 'val_acwi', 'val_inf']
+BENCHMARK_PCT = {'pct_user': 'val_user', 'pct_sp': 'val_sp', 'pct_wig': 'val_wig',
+                 'pct_acwi': 'val_acwi', 'pct_inf': 'val_inf'}
+
+STATS_SUM_FIELDS = ['total_value', 'invested', 'cash', 'total_profit', 'unrealized_profit', 'day_change_pln']
+HOLDING_SUM_FIELDS = ['quantity', 'value_pln', 'cost_pln', 'gain_pln', 'day_change_pln']
+
+
+def household_cache_key(portfolios):
+    versions = '_'.join(f"{p.id}v{p.data_version}" for p in portfolios)
+    return f"household_{versions}"
+
+
+def get_household_context(user):
+    """
+    Widok zbiorczy wszystkich portfeli użytkownika (IKE, IKZE, STANDARD): snapshoty portfeli liczone
+    równolegle, scalane sumowaniem wyrównanych tablic. Wynik w cache per wersje portfeli.
+    """
+    portfolios = list(get_user_portfolios(user))
+    if not portfolios:
+        return {'error': 'No portfolios found.'}
+
+    key = household_cache_key(portfolios)
+    context = cache.get(key)
+    if context is None:
+        context = _build_household_context(portfolios)
+        cache.set(key, context, SNAPSHOT_TTL)
+    return context
+
+
+def compute_snapshots(portfolios, rates=None):
+    """
+    Snapshoty portfeli w puli wątków - pobieranie cen i zapytania czekają na I/O, więc N portfeli
+    kosztuje mniej więcej tyle co najwolniejszy z nich. Kolejność wyników = kolejność portfeli.
+    """
+    if rates is None:
+        rates = get_current_currency_rates()
+    if len(portfolios) <= 1:
+        return [get_portfolio_snapshot(p, rates) for p in portfolios]
+
+    def worker(portfolio):
+        try:
+            return get_portfolio_snapshot(portfolio, rates)
+        except Exception as e:
+            logger.warning(f"HOUSEHOLD: snapshot portfela {portfolio.id} nieudany: {e}")
+            return None
+        finally:
+            # Wątek puli ma własne połączenie - zamykamy, żeby nie wisiało
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=min(HOUSEHOLD_WORKERS, len(portfolios)), thread_name_prefix='household') as pool:
+        return list(pool.map(worker, portfolios))
+
+
+def merge_timelines(timelines):
+    """
+    Suma historii wielu portfeli: wspólna oś dni (unia), serie kwotowe wstawione pod swoje indeksy
+    i zsumowane jedną macierzą (serie x dni). Przed startem portfela jego wkład to 0.
+    """
+    timelines = [t for t in timelines if t and t.get('dates')]
+    if not timelines:
+        return {'dates': [], 'val_user': [], 'val_inv': [], 'points': [], 'last_market_date': None}
+
+    day_arrays = [np.array(t['dates'], dtype='datetime64[D]') for t in timelines]
+    all_days = np.unique(np.concatenate(day_arrays))
+    totals = np.zeros((len(TIMELINE_SUM_SERIES), len(all_days)))
+    points = np.zeros(len(all_days))
+    for t, days in zip(timelines, day_arrays):
+        idx = np.searchsorted(all_days, days)
+        totals[:, idx] += np.array([t.get(s) or np.zeros(len(days)) for s in TIMELINE_SUM_SERIES], dtype=float)
+        points[idx] = np.maximum(points[idx], np.asarray(t.get('points') or np.zeros(len(days)), dtype=float))
+
+    merged = {'dates': [str(d) for d in all_days], 'points': points.astype(int).tolist()}
+    for name, row in zip(TIMELINE_SUM_SERIES, totals.round(2)):
+        merged[name] = row.tolist()
+
+    invested = totals[TIMELINE_SUM_SERIES.index('val_inv')]
+    safe = np.where(invested > 1.0, invested, 1.0)
+    for pct, series in BENCHMARK_PCT.items():
+        values = totals[TIMELINE_SUM_SERIES.index(series)]
+        merged[pct] = np.where(invested > 1.0, (values - invested) / safe * 100, 0.0).round(2).tolist()
+
+    last_dates = [t['last_market_date'] for t in timelines if t.get('last_market_date')]
+    merged['last_market_date'] = max(last_dates) if last_dates else None
+    return merged
+
+
+def merge_holdings(stats_list, portfolio_names):
+    """Otwarte pozycje zsumowane po symbolu (ilość, wartość, koszt, wynik) z listą portfeli, w których są."""
+    merged = {}
+    for stats, name in zip(stats_list, portfolio_names):
+        for a in stats['assets']:
+            if a['is_closed']:
+                continue
+            item = merged.setdefault(a['symbol'], dict(
+                {f: 0.0 for f in HOLDING_SUM_FIELDS},
+                symbol=a['symbol'], display_name=a.get('display_name', a['symbol']),
+                asset_type=a.get('asset_type'), currency=a.get('currency'), portfolios=[]))
+            for f in HOLDING_SUM_FIELDS:
+                item[f] += a.get(f, 0.0) or 0.0
+            item['portfolios'].append(name)
+    return sorted(merged.values(), key=lambda x: x['value_pln'], reverse=True)
+
+
+def _build_household_context(portfolios):
+    rates = get_current_currency_rates()
+    snapshots = compute_snapshots(portfolios, rates)
+    pairs = [(p, s) for p, s in zip(portfolios, snapshots) if s]
+    if not pairs:
+        return {'error': 'No transactions found.'}
+
+    totals = {f: sum(s['stats'][f] for _, s in pairs) for f in STATS_SUM_FIELDS}
+    timeline = merge_timelines([s['timeline'] for _, s in pairs])
+
+    # Wskaźniki łączne: przepływy wszystkich portfeli + zsumowana historia wartości
+    transactions = Transaction.objects.filter(portfolio__in=[p for p, _ in pairs]).only('date', 'type', 'amount')
+    perf = PerformanceCalculator(transactions)
+    metrics = perf.calculate_metrics(timeline_data=timeline, current_total_value=totals['total_value'])
+    twr = perf.calculate_twr(timeline)
+
+    total_value = totals['total_value']
+    accounts = []
+    for p, s in pairs:
+        st = s['stats']
+        accounts.append({
+            'id': p.id, 'name': p.name, 'type': p.get_portfolio_type_display(), 'portfolio_type': p.portfolio_type,
+            'value': fmt_2(st['total_value']), 'value_raw': round(st['total_value'], 2),
+            'profit': fmt_2(st['total_profit']), 'profit_raw': st['total_profit'],
+            'return_pct': fmt_2((st['total_profit'] / st['invested'] * 100) if st['invested'] > 0 else 0),
+            'twr': fmt_2(s['metrics'].get('twr', 0.0)),
+            'share_pct': fmt_2((st['total_value'] / total_value * 100) if total_value > 0 else 0),
+        })
+
+    holdings = merge_holdings([s['stats'] for _, s in pairs], [p.name for p, _ in pairs])
+    holding_rows = [{
+        'symbol': h['symbol'], 'display_name': h['display_name'], 'asset_type': h['asset_type'],
+        'quantity': fmt_4(h['quantity']), 'value': fmt_2(h['value_pln']), 'gain': fmt_2(h['gain_pln']),
+        'gain_raw': h['gain_pln'],
+        'gain_percent': fmt_2((h['gain_pln'] / h['cost_pln'] * 100) if h['cost_pln'] > 0 else 0),
+        'share_pct': fmt_2((h['value_pln'] / total_value * 100) if total_value > 0 else 0),
+        'portfolios': ', '.join(h['portfolios']),
+    } for h in holdings]
+
+    return {
+        'tile_value_str': fmt_2(total_value),
+        'tile_invested_str': fmt_2(totals['invested']),
+        'tile_cash_str': fmt_2(totals['cash']),
+        'tile_total_profit_str': fmt_2(totals['total_profit']), 'tile_total_profit_raw': totals['total_profit'],
+        'tile_day_pln_str': fmt_2(totals['day_change_pln']), 'tile_day_pln_raw': totals['day_change_pln'],
+        'tile_return_pct_str': fmt_2(metrics['simple_return']),
+        'tile_mwr': fmt_2(metrics['xirr']),
+        'tile_twr': fmt_2(twr),
+        'accounts': accounts,
+        'holdings': holding_rows,
+        'timeline_dates': timeline['dates'],
+        'timeline_total_value': timeline['val_user'],
+        'timeline_invested': timeline['val_inv'],
+        'account_labels': [a['name'] for a in accounts],
+        'account_values': [a['value_raw'] for a in accounts],
+    }
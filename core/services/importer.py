@@ -1,109 +1,404 @@
 # core/services/importer.py
 
-import pandas as pd
+import hashlib
+import io
+import os
 import re
-import yfinance as yf
-from datetime import datetime
+import secrets
+import tempfile
+import time
+import zipfile
+import numpy as np
+import pandas as pd
+from datetime import date, timezone as dt_timezone
 from django.utils import timezone
+from django.db import transaction as db_transaction
 from django.db.models import Q  # <--- KONIECZNY IMPORT
 from ..models import Transaction, Asset
 from core.config import SUFFIX_MAP
 from .market import fetch_asset_metadata
+from .fx import BASE_CURRENCY, ensure_fx_history, convert as fx_convert
+from .snapshot import refresh_portfolio_snapshot
+from .corporate_actions import apply_splits_to_transactions
+from .metrics import inc, observe, maybe_flush, THROUGHPUT_BUCKETS
 import logging
 from abc import ABC, abstractmethod
 
 logger = logging.getLogger('core')
 
-
-class BaseImporter(ABC):
-    """Abstract base class for transaction importers."""
-
-    def __init__(self, file, portfolio):
-        self.file = file
+BULK_BATCH_SIZE = 500
+UPDATE_FIELDS = ['asset', 'date', 'type', 'amount', 'quantity', 'price', 'comment', 'content_hash', 'split_factor',
+                 'amount_currency']
+
+# Kolumny wspólnej (znormalizowanej) ramki, którą produkuje każdy importer
+# amount_currency opcjonalna: importer, który sam przelicza kwoty, podaje ich walutę (zob. Transaction.amount_currency)
+STANDARD_COLUMNS = ['xtb_id', 'date', 'type', 'symbol', 'amount', 'quantity', 'price', 'comment', 'amount_currency']
+
+# Ile bajtów z początku pliku czytamy do rozpoznania formatu
+SNIFF_BYTES = 64 * 1024
+
+# W ilu pierwszych wierszach szukamy nagłówka tabeli
+HEADER_SCAN_ROWS = 40
+
+# Minimalna pewność, żeby uznać format za rozpoznany
+MIN_CONFIDENCE = 0.3
+
+
+def compute_content_hash(date_obj, trans_type, symbol, amount, quantity, price, comment, amount_currency=None):
+    """
+    Skrót znormalizowanej treści transakcji.
+    Liczby zaokrąglamy do precyzji kolumn w bazie, żeby wartości z pliku i z bazy dawały ten sam wynik.
+    Waluta kwoty wchodzi do skrótu tylko, gdy jest ustawiona - skróty wierszy XTB się nie zmieniają.
+    """
+    def num(val, places):
+        if val is None: return ''
+        return f"{float(val):.{places}f}"
+
+    ts = date_obj.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f') if date_obj else ''
+    raw = "|".join([
+        ts, trans_type or '', (symbol or '').strip(), num(amount, 2), num(quantity, 4),
+        num(price, 4), (comment or '').strip()
+    ] + ([amount_currency] if amount_currency else []))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+# =========================================================
+# WSPÓLNY ETAP NORMALIZACJI (WEKTOROWO)
+# =========================================================
+
+def normalize_standard_frame(df):
+    """
+    Wspólny etap dla wszystkich importerów.
+    Wejście: ramka z kolumnami STANDARD_COLUMNS (typy jeszcze surowe).
+    Wyjście: oczyszczona ramka (daty aware, liczby float, bez duplikatów ID) + kolumna content_hash.
+    """
+    df = df.reindex(columns=STANDARD_COLUMNS).copy()
+
+    df['xtb_id'] = df['xtb_id'].map(_format_id)
+    if not pd.api.types.is_datetime64_any_dtype(df['date']):
+        dates = pd.to_datetime(df['date'], errors='coerce', format='mixed')
+    else:
+        dates = pd.to_datetime(df['date'], errors='coerce')
+    if dates.dt.tz is None:
+        dates = dates.dt.tz_localize(timezone.get_current_timezone(), ambiguous='NaT', nonexistent='NaT')
+    df['date'] = dates
+
+    df = df[df['xtb_id'].notna() & df['date'].notna()]
+
+    df['type'] = df['type'].fillna('OTHER').astype(str)
+    df['symbol'] = df['symbol'].fillna('').astype(str).str.strip()
+    df.loc[df['symbol'].str.lower() == 'nan', 'symbol'] = ''
+    df['comment'] = df['comment'].fillna('').astype(str)
+    df['amount'] = _to_float(df['amount']).fillna(0.0)
+    df['quantity'] = _to_float(df['quantity']).fillna(0.0)
+    df['price'] = _to_float(df['price'])
+    currency = df['amount_currency'].fillna('').astype(str).str.strip().str.upper()
+    df['amount_currency'] = currency.astype(object).where(currency != '', None)
+
+    # Ostatni wiersz z danym ID wygrywa (jak przy update_or_create)
+    df = df.drop_duplicates(subset='xtb_id', keep='last')
+
+    prices = df['price'].astype(object).where(df['price'].notna(), None)
+    df['price'] = prices
+    df['content_hash'] = [
+        compute_content_hash(d, t, s, a, q, p, c, cur)
+        for d, t, s, a, q, p, c, cur in zip(df['date'], df['type'], df['symbol'], df['amount'],
+                                            df['quantity'], prices, df['comment'], df['amount_currency'])
+    ]
+    return df.reset_index(drop=True)
+
+
+def _format_id(val):
+    if val is None or (isinstance(val, float) and np.isnan(val)): return None
+    if isinstance(val, (int, float, np.integer, np.floating)): return str(int(val))
+    val = str(val).strip()
+    return val or None
+
+
+def _to_float(series):
+    """Liczby z przecinkiem dziesiętnym i spacjami tysięcy ('1 234,50') -> float."""
+    if not pd.api.types.is_numeric_dtype(series):
+        series = series.astype(str).str.replace(',', '.', regex=False).str.replace(' ', '', regex=False)
+    return pd.to_numeric(series, errors='coerce')
+
+
+def _find_header_index(rows, required):
+    """
+    Jedno przejście: zwraca indeks pierwszego wiersza zawierającego wszystkie wymagane nazwy kolumn.
+    rows: DataFrame (header=None) albo lista linii tekstu.
+    """
+    if isinstance(rows, pd.DataFrame):
+        cells = rows.head(HEADER_SCAN_ROWS).fillna('').astype(str).apply(lambda c: c.str.strip())
+        mask = np.ones(len(cells), dtype=bool)
+        for name in required:
+            mask &= cells.eq(name).any(axis=1).to_numpy()
+        hits = np.flatnonzero(mask)
+        return int(hits[0]) if len(hits) else None
+
+    for idx, line in enumerate(rows[:HEADER_SCAN_ROWS]):
+        tokens = {t.strip().strip('"') for t in re.split(r'[\t;,]', line)}
+        if all(name in tokens for name in required):
+            return idx
+    return None
+
+
+# =========================================================
+# ROZPOZNAWANIE FORMATU (SNIFF)
+# =========================================================
+
+class FileHead:
+    """Tani podgląd pliku dla sniff(): pierwsze bajty, zdekodowany tekst i (dla xlsx) nazwy arkuszy."""
+
+    def __init__(self, file, name):
+        file.seek(0)
+        self.prefix = file.read(SNIFF_BYTES)
+        file.seek(0)
+        self.name = (name or '').lower()
+        self.is_zip = self.prefix.startswith(b'PK\x03\x04')
+        self.sheet_names = _xlsx_sheet_names(file) if self.is_zip else []
+        self.encoding, self.text = (None, '') if self.is_zip else _decode_prefix(self.prefix)
+        self.lines = self.text.splitlines()
+
+    def find_header(self, required):
+        return _find_header_index(self.lines, required)
+
+
+def _decode_prefix(prefix):
+    if prefix.startswith((b'\xff\xfe', b'\xfe\xff')) or prefix[1:200:2].count(b'\x00') > 20:
+        return 'utf-16', prefix.decode('utf-16', errors='ignore')
+    try:
+        # Ucinamy ostatnie bajty - prefiks mógł przeciąć znak wielobajtowy
+        prefix[:-4].decode('utf-8')
+        return 'utf-8-sig', prefix.decode('utf-8-sig', errors='ignore')
+    except UnicodeDecodeError:
+        return 'cp1250', prefix.decode('cp1250', errors='ignore')
+
+
+def _guess_separator(header_line):
+    """Separator z samej linii nagłówka (w danych przecinek bywa separatorem dziesiętnym)."""
+    counts = {sep: header_line.count(sep) for sep in ('\t', ';', ',')}
+    return max(counts, key=counts.get) if any(counts.values()) else ','
+
+
+def _xlsx_sheet_names(file):
+    """Nazwy arkuszy z xl/workbook.xml - bez parsowania całego skoroszytu."""
+    try:
+        file.seek(0)
+        with zipfile.ZipFile(file) as zf:
+            xml = zf.read('xl/workbook.xml').decode('utf-8', errors='ignore')
+        return re.findall(r'<(?:\w+:)?sheet\b[^>]*\bname="([^"]+)"', xml)
+    except Exception:
+        return []
+    finally:
+        file.seek(0)
+
+
+IMPORTER_REGISTRY = []
+
+
+def register_importer(cls):
+    """Dekorator: dopisuje importer do rejestru używanego przez detect_importer()."""
+    IMPORTER_REGISTRY.append(cls)
+    return cls
+
+
+def detect_importer(uploaded_file):
+    """Wybiera importer z najwyższą pewnością dla danego pliku. Rzuca ValueError, gdy żaden nie pasuje."""
+    head = FileHead(uploaded_file, getattr(uploaded_file, 'name', ''))
+    scored = [(cls.sniff(head), cls) for cls in IMPORTER_REGISTRY]
+    confidence, best = max(scored, key=lambda x: x[0], default=(0.0, None))
+    if best is None or confidence < MIN_CONFIDENCE:
+        raise ValueError("Nieobsługiwany format pliku. Użyj raportu XTB (.xlsx/.csv) lub eksportu Revolut (.csv)")
+    logger.info(f"Import: wybrano {best.__name__} (pewność {confidence:.2f})")
+    return best, head
+
+
+# =========================================================
+# IMPORTERY
+# =========================================================
+
+class ImportWriter:
+    """
+    Wspólna ścieżka zapisu dla wszystkich importerów: porównanie skrótów z bazą,
+    zapis hurtowy i jedno przeliczenie danych pochodnych portfela na końcu.
+    """
+
+    # Ile wierszy pokazujemy w podglądzie (dry-run) dla każdej kategorii
+    PREVIEW_LIMIT = 50
+
+    def __init__(self, portfolio):
         self.portfolio = portfolio
         self.stats = {'added': 0, 'updated': 0, 'skipped': 0, 'new_assets': 0}
         self.asset_cache = {}
 
-    @abstractmethod
-    def load_dataframe(self):
-        """Load file content into a standardized DataFrame."""
-        pass
-
-    def process(self):
-        """Main processing loop."""
-        df = self.load_dataframe()
-        if df is None or df.empty:
+    def apply(self, frames, dry_run=False, overwrite_manual=False, recompute=True):
+        """
+        Main processing loop.
+        1. Sklejenie znormalizowanych ramek (jedna na plik) i deduplikacja po xtb_id między plikami.
+        2. Jedno zapytanie o istniejące wiersze portfela i porównanie skrótów (content_hash).
+        3. Aktywa nowych symboli zakładane przed transakcją, potem zapis tylko nowych/zmienionych
+           wierszy (bulk_create / bulk_update) w jednej transakcji.
+        4. Jedno przeliczenie danych pochodnych portfela (snapshot) na końcu.
+        Przy dry_run=True nic nie jest zapisywane - zwracamy podgląd różnic.
+        recompute=False pomija krok 4 (benchmarki importu, zapisy hurtowe przeliczane później).
+        """
+        frames = [f for f in frames if f is not None and not f.empty]
+        if not frames:
             raise ValueError("Empty or invalid file content.")
 
-        # Normalize columns
-        df.columns = [str(c).strip() for c in df.columns]
+        frame = pd.concat(frames, ignore_index=True).drop_duplicates(subset='xtb_id', keep='last')
+        # Zakresy dat per plik - czyszczenie wpisów manualnych nie może objąć luk między plikami
+        date_ranges = [(f['date'].min(), f['date'].max()) for f in frames]
+
+        records = {r['xtb_id']: r for r in frame.to_dict('records')}
+        existing = self._load_existing()
+
+        added, changed, unchanged, backfill = [], [], [], []
+        for xtb_id, rec in records.items():
+            current = existing.get(xtb_id)
+            if current is None:
+                added.append(rec)
+            elif current['hash'] == rec['content_hash']:
+                unchanged.append(rec)
+                if not current['stored_hash']:
+                    # Wiersz sprzed wprowadzenia skrótów - uzupełniamy tylko skrót
+                    backfill.append(current['id'])
+            else:
+                rec['id'] = current['id']
+                changed.append(rec)
 
-        for _, row in df.iterrows():
-            try:
-                self._process_row(row)
-            except Exception as e:
-                logger.warning(f"Skipping row due to error: {e}")
-                continue
+        self.stats['skipped'] = len(unchanged)
 
-        return self.stats
+        if dry_run:
+            self.stats['added'] = len(added)
+            self.stats['updated'] = len(changed)
+            return self._build_preview(records, existing, added, changed)
 
-    def _process_row(self, row):
-        # 1. Walidacja ID
-        if pd.isna(row.get('ID')): return
-        xtb_id = str(int(row['ID'])) if isinstance(row['ID'], (int, float)) else str(row['ID'])
-
-        # 2. Parsowanie danych
-        trans_type = self._parse_transaction_type(str(row.get('Type', '')))
-        comment = str(row.get('Comment', ''))
-
-        # Parsowanie liczb
-        quantity = self._parse_quantity(trans_type, comment)
-        price = self._parse_price(comment)
-        amount = self._parse_amount(row.get('Amount'))
-
-        date_obj = self._parse_date(row.get('Time'))
-        if not date_obj: return
-
-        # 3. Rozwiązywanie Assetu
-        asset_obj = self._resolve_asset(str(row.get('Symbol', '')))
-
-        # 4. UPSERT (Update or Create)
-        # To zapewnia brak duplikatów dla tych samych ID z XTB
-        obj, created = Transaction.objects.update_or_create(
-            portfolio=self.portfolio,
-            xtb_id=xtb_id,
-            defaults={
-                'asset': asset_obj,
-                'date': date_obj,
-                'type': trans_type,
-                'amount': amount,
-                'quantity': quantity,
-                'price': price,
-                'comment': comment
-            }
-        )
+        # Aktywa (z metadanymi z Yahoo dla nowych symboli) przed transakcją - zapytania sieciowe
+        # nie mogą trzymać blokady zapisu (SQLite: "database is locked" w innych workerach)
+        self._resolve_assets({r['symbol'] for r in added + changed})
 
-        if created:
-            self.stats['added'] += 1
-        else:
-            self.stats['updated'] += 1
+        with db_transaction.atomic():
+            deleted = self._clean_manual_entries(date_ranges) if overwrite_manual else 0
+            written = self._write(added, changed, backfill, records)
+            if written:
+                apply_splits_to_transactions([a.id for a in self.asset_cache.values() if a])
 
-    def _parse_date(self, val_time):
-        try:
-            if pd.isna(val_time) or str(val_time).strip() == '': return None
-            dt = pd.to_datetime(val_time)
-            if pd.isna(dt): return None
-            return timezone.make_aware(dt) if dt.tzinfo is None else dt
-        except:
-            return None
+        if recompute and (deleted or written):
+            refresh_portfolio_snapshot(self.portfolio)
+        return self.stats
 
-    def _parse_amount(self, val):
-        try:
-            if isinstance(val, str):
-                val = val.replace(',', '.').replace(' ', '')
-            return float(val)
-        except:
-            return 0.0
+    def _clean_manual_entries(self, date_ranges):
+        """
+        Usuwamy transakcje w zakresie dat każdego pliku, które:
+        1. Są oznaczone jako MANUALNE (xtb_id zaczyna się od 'MAN-')
+        2. LUB nie mają żadnego ID (xtb_id jest NULL) - to są "duchy" demo
+        """
+        in_ranges = Q()
+        for min_date, max_date in date_ranges:
+            max_date_extended = max_date.replace(hour=23, minute=59, second=59, microsecond=999999)
+            in_ranges |= Q(date__range=(min_date, max_date_extended))
+
+        deleted_count, _ = Transaction.objects.filter(portfolio=self.portfolio).filter(in_ranges).filter(
+            Q(xtb_id__startswith='MAN-') | Q(xtb_id__isnull=True)
+        ).delete()
+        logger.info(f"Usunięto {deleted_count} transakcji (MAN lub NULL ID) kolidujących z importem.")
+        return deleted_count
+
+    def _load_existing(self):
+        """
+        Jedno zapytanie: wszystkie wiersze portfela z xtb_id.
+        Dla wierszy bez zapisanego skrótu liczymy go z wartości w bazie (zgodność wstecz).
+        """
+        rows = Transaction.objects.filter(
+            portfolio=self.portfolio, xtb_id__isnull=False
+        ).values_list('id', 'xtb_id', 'content_hash', 'date', 'type', 'asset__symbol',
+                      'amount', 'quantity', 'price', 'comment', 'amount_currency')
+
+        existing = {}
+        for pk, xtb_id, stored, dt, t_type, sym, amt, qty, price, comment, currency in rows:
+            h = stored or compute_content_hash(dt, t_type, sym or '', amt, qty, price, comment or '', currency)
+            existing[xtb_id] = {'id': pk, 'hash': h, 'stored_hash': stored, 'date': dt,
+                                'type': t_type, 'symbol': sym or '', 'amount': amt}
+        return existing
+
+    def _build_preview(self, records, existing, added, changed):
+        """Podgląd różnic (dry-run): dodane, zmienione i wiersze z bazy, których nie ma w pliku."""
+        removed = []
+        if records:
+            dates = [r['date'] for r in records.values()]
+            min_date, max_date = min(dates), max(dates)
+            for xtb_id, row in existing.items():
+                if xtb_id not in records and min_date <= row['date'] <= max_date:
+                    removed.append({'xtb_id': xtb_id, 'date': row['date'], 'type': row['type'],
+                                    'symbol': row['symbol'], 'amount': float(row['amount']),
+                                    'is_manual': xtb_id.startswith('MAN-')})
+        removed.sort(key=lambda r: r['date'])
+
+        def _rows(items):
+            return [{k: r[k] for k in ('xtb_id', 'date', 'type', 'symbol', 'amount', 'quantity')}
+                    for r in sorted(items, key=lambda r: r['date'])[:self.PREVIEW_LIMIT]]
+
+        return {
+            'stats': dict(self.stats, removed=len(removed)),
+            'added': _rows(added),
+            'changed': _rows(changed),
+            'removed': removed[:self.PREVIEW_LIMIT],
+        }
+
+    def _write(self, added, changed, backfill, records):
+        """
+        Zapis hurtowy (wołany wewnątrz transakcji z apply()). Zwraca liczbę zapisanych wierszy.
+        Aktywa są już w asset_cache (_resolve_assets) - tu nie ma zapytań do Yahoo.
+        """
+        new_objs = [Transaction(portfolio=self.portfolio, **self._model_fields(r)) for r in added]
+        upd_objs = [Transaction(id=r['id'], **self._model_fields(r)) for r in changed]
+
+        if new_objs:
+            Transaction.objects.bulk_create(new_objs, batch_size=BULK_BATCH_SIZE)
+        if upd_objs:
+            Transaction.objects.bulk_update(upd_objs, UPDATE_FIELDS, batch_size=BULK_BATCH_SIZE)
+        if backfill:
+            hashes = {r['xtb_id']: r['content_hash'] for r in records.values()}
+            id_to_xtb = Transaction.objects.filter(id__in=backfill).values_list('id', 'xtb_id')
+            Transaction.objects.bulk_update(
+                [Transaction(id=pk, content_hash=hashes[x]) for pk, x in id_to_xtb],
+                ['content_hash'], batch_size=BULK_BATCH_SIZE
+            )
+
+        self.stats['added'] = len(new_objs)
+        self.stats['updated'] = len(upd_objs)
+        return len(new_objs) + len(upd_objs)
+
+    def _model_fields(self, rec):
+        return {
+            'xtb_id': rec['xtb_id'],
+            'asset': self._resolve_asset(rec['symbol']),
+            'date': rec['date'],
+            'type': rec['type'],
+            'amount': rec['amount'],
+            'quantity': rec['quantity'],
+            'price': rec['price'],
+            'comment': rec['comment'],
+            'content_hash': rec['content_hash'],
+            'amount_currency': rec['amount_currency'],
+            # Wartości prosto z pliku - splity nanosi apply_splits_to_transactions()
+            'split_factor': 1,
+        }
+
+    def _prefetch_assets(self, symbols):
+        """Jedno zapytanie o wszystkie znane aktywa z pliku (zamiast filter().first() per symbol)."""
+        missing = [s for s in symbols if s not in self.asset_cache]
+        if missing:
+            for asset in Asset.objects.filter(symbol__in=missing):
+                self.asset_cache[asset.symbol] = asset
+
+    def _resolve_assets(self, symbols):
+        """Znane aktywa jednym zapytaniem, brakujące zakładane (z metadanymi) - poza transakcją zapisu."""
+        symbols = {s.strip() for s in symbols if s and s.strip() and s.strip().lower() != 'nan'}
+        self._prefetch_assets(symbols)
+        for sym in sorted(symbols):
+            self._resolve_asset(sym)
 
     def _resolve_asset(self, sym):
         sym = sym.strip()
@@ -157,156 +452,437 @@ class BaseImporter(ABC):
             sector=sector
         ), True
 
-    def _parse_transaction_type(self, raw_type):
-        raw = raw_type.lower().strip()
-        if 'stock' in raw and 'purchase' in raw: return 'BUY'
-        if 'stock' in raw and 'sale' in raw: return 'SELL'
-        if 'close' in raw or 'profit' in raw: return 'CLOSE'
-        if 'deposit' in raw: return 'DEPOSIT'
-        if 'withdrawal' in raw: return 'WITHDRAWAL'
-        if 'dividend' in raw or 'divident' in raw: return 'DIVIDEND'
-        if 'withholding tax' in raw: return 'TAX'
-        if 'fee' in raw: return 'FEE'
-        return 'OTHER'
-
-    def _parse_quantity(self, trans_type, comment):
-        if trans_type in ['BUY', 'SELL']:
-            match = re.search(r'(BUY|SELL)\s+([0-9./]+)', comment, re.IGNORECASE)
-            if match:
-                try:
-                    val = match.group(2)
-                    if '/' in val: val = val.split('/')[0]
-                    return float(val)
-                except:
-                    pass
-        return 0.0
 
-    def _parse_price(self, comment):
-        if '@' in comment:
-            match = re.search(r'@\s*([0-9.,]+)', comment)
-            if match:
-                try:
-                    val = match.group(1).replace(',', '.')
-                    return float(val)
-                except:
-                    pass
-        return None
+class BaseImporter(ABC):
+    """Abstract base class for transaction importers."""
 
+    def __init__(self, file, portfolio, head=None):
+        self.file = file
+        self.portfolio = portfolio
+        self.head = head or FileHead(file, getattr(file, 'name', ''))
 
-class XtbExcelImporter(BaseImporter):
+    @classmethod
+    def sniff(cls, head):
+        """Zwraca pewność (0.0-1.0), że plik jest w formacie obsługiwanym przez ten importer."""
+        return 0.0
+
+    @abstractmethod
     def load_dataframe(self):
+        """Load file content into a DataFrame (raw broker columns)."""
+        pass
+
+    @abstractmethod
+    def to_standard_frame(self, df):
+        """Map raw broker columns onto STANDARD_COLUMNS (vectorized, no row loops)."""
+        pass
+
+    def build_frame(self):
+        df = self.load_dataframe()
+        if df is None or df.empty:
+            raise ValueError("Empty or invalid file content.")
+
+        # Normalize columns
+        df.columns = [str(c).strip() for c in df.columns]
+        return normalize_standard_frame(self.to_standard_frame(df))
+
+    def process(self, dry_run=False, overwrite_manual=False):
+        """Importuje pojedynczy plik (wspólna ścieżka zapisu: ImportWriter)."""
+        frame = self.build_frame()
+        return ImportWriter(self.portfolio).apply([frame], dry_run=dry_run, overwrite_manual=overwrite_manual)
+
+    # --- Wspólne odczyty (jedno przejście po pliku) ---
+
+    def _read_excel_table(self, sheet, required):
+        """Czyta arkusz raz (header=None) i wycina tabelę od wiersza nagłówka."""
         try:
-            xls = pd.ExcelFile(self.file)
+            raw = pd.read_excel(self.file, sheet_name=sheet, header=None)
         except Exception as e:
             raise ValueError(f"Excel Error: {e}")
+        header_idx = _find_header_index(raw, required)
+        if header_idx is None:
+            raise ValueError(f"Nie znaleziono nagłówka ({', '.join(required)}) w pliku Excel.")
+        df = raw.iloc[header_idx + 1:].reset_index(drop=True)
+        df.columns = raw.iloc[header_idx].tolist()
+        return df.dropna(how='all')
+
+    def _read_csv_table(self, required):
+        """Czyta CSV raz - kodowanie, separator i wiersz nagłówka znamy już z podglądu (FileHead)."""
+        header_idx = self.head.find_header(required)
+        if header_idx is None:
+            raise ValueError("Nie znaleziono nagłówka w pliku CSV.")
+        # UploadedFile Django nie wygląda dla pandas na plik binarny (brak .mode) - bierzemy surowy uchwyt
+        raw = getattr(self.file, 'file', self.file)
+        raw.seek(0)
+        try:
+            return pd.read_csv(raw, encoding=self.head.encoding,
+                               sep=_guess_separator(self.head.lines[header_idx]),
+                               skiprows=header_idx, header=0, dtype=str)
+        except Exception as e:
+            raise ValueError(f"Nie udało się odczytać pliku CSV ({e}).")
 
-        target_sheet = None
-        for sheet in xls.sheet_names:
-            if "CASH" in sheet.upper():
-                target_sheet = sheet
-                break
-        if not target_sheet: target_sheet = xls.sheet_names[0]
 
-        df_preview = pd.read_excel(self.file, sheet_name=target_sheet, header=None, nrows=40)
-        header_idx = self._find_header_row(df_preview)
+# --- XTB: CASH OPERATIONS ---
 
-        if header_idx is None:
-            raise ValueError("Nie znaleziono nagłówka (ID, Type, Comment) w pliku Excel.")
+XTB_CASH_COLUMNS = ('ID', 'Type', 'Comment')
 
-        self.file.seek(0)
-        return pd.read_excel(self.file, sheet_name=target_sheet, header=header_idx)
 
-    def _find_header_row(self, df):
-        for idx, row in df.iterrows():
-            s = " ".join([str(v) for v in row.fillna('').values])
-            if "ID" in s and "Type" in s and "Comment" in s:
-                return idx
-        return None
+class XtbCashOperationsMixin:
+    """Wektorowe mapowanie raportu XTB Cash Operations na kolumny standardowe."""
 
+    def to_standard_frame(self, df):
+        raw_type = df.get('Type', pd.Series('', index=df.index)).fillna('').astype(str).str.lower().str.strip()
+        comment = df.get('Comment', pd.Series('', index=df.index)).fillna('').astype(str)
 
-class XtbCsvImporter(BaseImporter):
-    def load_dataframe(self):
-        attempts = [
-            {'encoding': 'utf-16', 'sep': '\t'},
-            {'encoding': 'utf-16', 'sep': ';'},
-            {'encoding': 'utf-16', 'sep': ','},
-            {'encoding': 'utf-8', 'sep': ';'},
-            {'encoding': 'utf-8', 'sep': ','},
-            {'encoding': 'cp1250', 'sep': ';'}
+        conditions = [
+            raw_type.str.contains('stock') & raw_type.str.contains('purchase'),
+            raw_type.str.contains('stock') & raw_type.str.contains('sale'),
+            raw_type.str.contains('close') | raw_type.str.contains('profit'),
+            raw_type.str.contains('deposit'),
+            raw_type.str.contains('withdrawal'),
+            raw_type.str.contains('dividend') | raw_type.str.contains('divident'),
+            raw_type.str.contains('withholding tax'),
+            raw_type.str.contains('fee'),
         ]
+        choices = ['BUY', 'SELL', 'CLOSE', 'DEPOSIT', 'WITHDRAWAL', 'DIVIDEND', 'TAX', 'FEE']
+        trans_type = pd.Series(np.select(conditions, choices, default='OTHER'), index=df.index)
+
+        # Ilość: "OPEN BUY 2/5 @ 100" -> 2 (tylko BUY/SELL)
+        # fillna(''): gdy nic nie pasuje, extract zwraca kolumnę float (same NaN) bez akcesora .str
+        qty_raw = comment.str.extract(r'(?i)(?:BUY|SELL)\s+([0-9./]+)', expand=False).fillna('').str.split('/').str[0]
+        quantity = pd.to_numeric(qty_raw, errors='coerce').where(trans_type.isin(['BUY', 'SELL']), 0.0)
+
+        price_raw = comment.str.extract(r'@\s*([0-9.,]+)', expand=False).fillna('').str.replace(',', '.', regex=False)
+
+        return pd.DataFrame({
+            'xtb_id': df.get('ID'),
+            'date': df.get('Time'),
+            'type': trans_type,
+            'symbol': df.get('Symbol'),
+            'amount': df.get('Amount'),
+            'quantity': quantity,
+            'price': pd.to_numeric(price_raw, errors='coerce'),
+            'comment': comment,
+        })
+
+
+@register_importer
+class XtbExcelImporter(XtbCashOperationsMixin, BaseImporter):
+    @classmethod
+    def sniff(cls, head):
+        if not head.is_zip: return 0.0
+        if any('CASH' in s.upper() for s in head.sheet_names): return 0.9
+        # Fallback jak wcześniej: pierwszy arkusz dowolnego xlsx
+        return 0.3
 
-        df_raw = None
-        for params in attempts:
-            try:
-                self.file.seek(0)
-                temp = pd.read_csv(self.file, encoding=params['encoding'], sep=params['sep'])
-                if len(temp.columns) > 1:
-                    df_raw = temp
-                    break
-            except:
-                continue
+    def load_dataframe(self):
+        sheets = self.head.sheet_names
+        target_sheet = next((s for s in sheets if "CASH" in s.upper()), sheets[0] if sheets else 0)
+        return self._read_excel_table(target_sheet, XTB_CASH_COLUMNS)
 
-        if df_raw is None:
-            raise ValueError("Nie udało się odczytać pliku CSV (błąd kodowania).")
 
-        header_idx = self._find_header_row(df_raw.head(40))
+@register_importer
+class XtbCsvImporter(XtbCashOperationsMixin, BaseImporter):
+    @classmethod
+    def sniff(cls, head):
+        if head.is_zip or not head.lines: return 0.0
+        if head.find_header(XTB_CASH_COLUMNS) is None: return 0.0
+        return 0.9 if head.find_header(('Time', 'Amount')) is not None else 0.6
 
-        if header_idx is None:
-            s = " ".join([str(c) for c in df_raw.columns])
-            if "ID" in s and "Type" in s:
-                return df_raw
-            else:
-                raise ValueError("Nie znaleziono nagłówka w pliku CSV.")
-
-        new_header = df_raw.iloc[header_idx]
-        df = df_raw[header_idx + 1:].copy()
-        df.columns = new_header
-        return df
-
-    def _find_header_row(self, df):
-        for idx, row in df.iterrows():
-            s = " ".join([str(v) for v in row.fillna('').values])
-            if "ID" in s and "Type" in s and "Comment" in s:
-                return idx
-        return None
+    def load_dataframe(self):
+        return self._read_csv_table(XTB_CASH_COLUMNS)
 
 
-def process_xtb_file(uploaded_file, portfolio_obj, overwrite_manual=False):
-    filename = uploaded_file.name.lower()
+# --- XTB: CLOSED POSITIONS ---
 
-    if filename.endswith(('.xlsx', '.xls')):
-        importer = XtbExcelImporter(uploaded_file, portfolio_obj)
-    elif filename.endswith('.csv'):
-        importer = XtbCsvImporter(uploaded_file, portfolio_obj)
-    else:
-        raise ValueError("Nieobsługiwany format pliku. Użyj .xlsx lub .csv")
-
-    # --- LOGIKA NADPISYWANIA I CZYSZCZENIA ŚMIECI ---
-    if overwrite_manual:
-        df = importer.load_dataframe()
-        if df is not None and not df.empty:
-            if 'Time' in df.columns:
-                try:
-                    dates = pd.to_datetime(df['Time'], errors='coerce').dropna()
-                    if not dates.empty:
-                        min_date = dates.min()
-                        max_date = dates.max()
-                        max_date_extended = max_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-                        # FIX: Usuwamy transakcje w tym okresie, które:
-                        # 1. Są oznaczone jako MANUALNE (xtb_id zaczyna się od 'MAN-')
-                        # 2. LUB nie mają żadnego ID (xtb_id jest NULL) - to są Twoje "duchy" demo
-                        deleted_count, _ = Transaction.objects.filter(
-                            portfolio=portfolio_obj,
-                            date__range=(min_date, max_date_extended)
-                        ).filter(
-                            Q(xtb_id__startswith='MAN-') | Q(xtb_id__isnull=True)
-                        ).delete()
-
-                        logger.info(f"Usunięto {deleted_count} transakcji (MAN lub NULL ID) kolidujących z importem.")
-                except Exception as e:
-                    logger.warning(f"Nie udało się wyczyścić manualnych: {e}")
-
-            uploaded_file.seek(0)
-
-    return importer.process()
\ No newline at end of file
+XTB_CLOSED_COLUMNS = ('Position', 'Symbol', 'Open time', 'Close time')
+
+
+@register_importer
+class XtbClosedPositionsImporter(BaseImporter):
+    """
+    Arkusz 'CLOSED POSITION HISTORY' z XTB.
+    Każda pozycja daje 3 wiersze w konwencji Cash Operations: BUY (otwarcie), SELL (zwrot kosztu) i CLOSE (zysk).
+    Arkusz nie zawiera wpłat/wypłat - do pełnego obrazu konta potrzebny jest raport Cash Operations.
+    """
+
+    @classmethod
+    def sniff(cls, head):
+        has_closed = any('CLOSED' in s.upper() for s in head.sheet_names)
+        if head.is_zip:
+            if not has_closed: return 0.0
+            has_cash = any('CASH' in s.upper() for s in head.sheet_names)
+            return 0.4 if has_cash else 0.9
+        return 0.8 if head.find_header(XTB_CLOSED_COLUMNS) is not None else 0.0
+
+    def load_dataframe(self):
+        if self.head.is_zip:
+            sheet = next(s for s in self.head.sheet_names if 'CLOSED' in s.upper())
+            return self._read_excel_table(sheet, XTB_CLOSED_COLUMNS)
+        return self._read_csv_table(XTB_CLOSED_COLUMNS)
+
+    def to_standard_frame(self, df):
+        df = df[df['Position'].notna()]
+        pos = df['Position'].map(_format_id)
+        side = df.get('Type', pd.Series('BUY', index=df.index)).fillna('BUY').astype(str).str.upper()
+        volume = _to_float(df['Volume'])
+        purchase = _to_float(df.get('Purchase value', pd.Series(np.nan, index=df.index)))
+        open_price = _to_float(df.get('Open price', pd.Series(np.nan, index=df.index)))
+        close_price = _to_float(df.get('Close price', pd.Series(np.nan, index=df.index)))
+        purchase = purchase.fillna(volume * open_price)
+        profit = _to_float(df.get('Gross P/L', pd.Series(0.0, index=df.index))).fillna(0.0)
+
+        opens = pd.DataFrame({
+            'xtb_id': 'POS-' + pos + '-B', 'date': df['Open time'], 'type': 'BUY', 'symbol': df['Symbol'],
+            'amount': -purchase, 'quantity': volume, 'price': open_price,
+            'comment': 'OPEN ' + side + ' ' + volume.astype(str) + ' @ ' + open_price.astype(str),
+        })
+        closes = pd.DataFrame({
+            'xtb_id': 'POS-' + pos + '-S', 'date': df['Close time'], 'type': 'SELL', 'symbol': df['Symbol'],
+            'amount': purchase, 'quantity': volume, 'price': close_price,
+            'comment': 'CLOSE ' + side + ' ' + volume.astype(str) + ' @ ' + close_price.astype(str),
+        })
+        profits = pd.DataFrame({
+            'xtb_id': 'POS-' + pos + '-P', 'date': df['Close time'], 'type': 'CLOSE', 'symbol': df['Symbol'],
+            'amount': profit, 'quantity': 0.0, 'price': np.nan, 'comment': 'Profit of position',
+        })
+        return pd.concat([opens, closes, profits], ignore_index=True)
+
+
+# --- REVOLUT (TRADING ACCOUNT STATEMENT) ---
+
+REVOLUT_COLUMNS = ('Date', 'Ticker', 'Type', 'Total Amount')
+
+REVOLUT_TYPES = {
+    'BUY': 'BUY', 'SELL': 'SELL', 'CASH TOP-UP': 'DEPOSIT', 'CASH WITHDRAWAL': 'WITHDRAWAL',
+    'DIVIDEND': 'DIVIDEND', 'DIVIDEND TAX (CORRECTION)': 'TAX', 'CUSTODY FEE': 'FEE',
+}
+
+
+@register_importer
+class RevolutCsvImporter(BaseImporter):
+    """
+    Eksport CSV z konta inwestycyjnego Revolut.
+    Plik nie ma identyfikatorów operacji - ID budujemy ze skrótu treści wiersza ('REV-...'),
+    z numerem wystąpienia dla identycznych wierszy (dwie takie same transakcje tego samego dnia).
+    Kwoty z waluty operacji (zwykle USD) przeliczane na PLN po kursie z dnia operacji (fx.convert),
+    wszystkie wiersze oznaczone amount_currency='PLN' - raport dywidend nie przelicza ich drugi raz
+    z waluty aktywa. Cena za akcję zostaje w walucie notowania.
+    """
+
+    @classmethod
+    def sniff(cls, head):
+        if head.is_zip: return 0.0
+        return 0.9 if head.find_header(REVOLUT_COLUMNS) is not None else 0.0
+
+    def load_dataframe(self):
+        return self._read_csv_table(REVOLUT_COLUMNS)
+
+    def to_standard_frame(self, df):
+        raw_type = df['Type'].fillna('').astype(str).str.upper().str.strip()
+        base_type = raw_type.str.split(' - ').str[0]
+        trans_type = base_type.map(REVOLUT_TYPES).fillna('OTHER')
+
+        amount = _to_float(df['Total Amount'].fillna('').astype(str).str.replace(r'[^0-9.\-]', '', regex=True))
+        outflow = trans_type.isin(['BUY', 'WITHDRAWAL', 'FEE', 'TAX'])
+        amount = amount.abs().where(~outflow, -amount.abs())
+
+        ticker = df['Ticker'].fillna('').astype(str).str.strip()
+        currency = df.get('Currency', pd.Series('USD', index=df.index)).fillna('USD').astype(str).str.strip().str.upper()
+        symbol = ticker.where((ticker == '') | (currency != 'USD'), ticker + '.US')
+
+        quantity = _to_float(df.get('Quantity', pd.Series(np.nan, index=df.index))).fillna(0.0)
+        price = _to_float(df.get('Price per share', pd.Series('', index=df.index)).fillna('').astype(str)
+                          .str.replace(r'[^0-9.\-]', '', regex=True))
+
+        # Klucz z kwoty z pliku (przed przeliczeniem) - ID nie zmienia się razem z kursem
+        key = (df['Date'].astype(str) + '|' + raw_type + '|' + ticker + '|' + quantity.astype(str)
+               + '|' + amount.astype(str))
+        # Kolejne identyczne wiersze dostają numer wystąpienia; pierwszy zostaje bez sufiksu (zgodność ID)
+        occurrence = key.groupby(key).cumcount()
+        key = key.where(occurrence == 0, key + '#' + occurrence.astype(str))
+        xtb_id = 'REV-' + key.map(lambda k: hashlib.sha1(k.encode('utf-8')).hexdigest()[:20])
+
+        return pd.DataFrame({
+            'xtb_id': xtb_id, 'date': df['Date'], 'type': trans_type, 'symbol': symbol,
+            'amount': self._amount_in_base(amount, currency, df['Date']),
+            'quantity': quantity.where(trans_type.isin(['BUY', 'SELL']), 0.0),
+            'price': price, 'comment': raw_type, 'amount_currency': BASE_CURRENCY,
+        })
+
+    def _amount_in_base(self, amount, currency, raw_dates):
+        """Kwoty w PLN po kursie z dnia operacji (historia kursów uzupełniana przed przeliczeniem)."""
+        days = pd.to_datetime(raw_dates, errors='coerce', format='mixed', utc=True).dt.tz_localize(None).dt.normalize()
+        # Wiersze bez daty i tak odpadną w normalize_standard_frame - tu tylko, żeby nie psuły przeliczenia
+        days = days.fillna(pd.Timestamp(date.today()))
+        foreign = sorted(set(currency) - {BASE_CURRENCY})
+        if foreign:
+            ensure_fx_history(foreign, days.min().date())
+        return pd.Series(fx_convert(amount.fillna(0.0).to_numpy(), currency.to_numpy(), days.to_numpy()),
+                         index=amount.index).round(2)
+
+
+def _is_archive(head):
+    """ZIP, który nie jest skoroszytem Excela (xlsx to też ZIP, ale z xl/workbook.xml)."""
+    return head.is_zip and not head.sheet_names
+
+
+def expand_uploads(files):
+    """
+    Rozpakowuje archiwa ZIP do listy plików (BytesIO z .name). Zwykłe pliki przechodzą bez zmian.
+    Pomijamy katalogi i śmieci systemowe (__MACOSX, pliki ukryte).
+    """
+    expanded = []
+    for f in files:
+        name = getattr(f, 'name', '')
+        if not _is_archive(FileHead(f, name)):
+            expanded.append(f)
+            continue
+        f.seek(0)
+        with zipfile.ZipFile(f) as zf:
+            for info in zf.infolist():
+                base = os.path.basename(info.filename)
+                if info.is_dir() or not base or base.startswith('.') or info.filename.startswith('__MACOSX'):
+                    continue
+                member = io.BytesIO(zf.read(info))
+                member.name = base
+                expanded.append(member)
+    return expanded
+
+
+def process_import_batch(files, portfolio_obj, overwrite_manual=False, dry_run=False, recompute=True):
+    """
+    Importuje wiele plików (także archiwa ZIP) jako jedną operację:
+    każdy plik jest normalizowany osobno, potem jedna deduplikacja, jeden zapis
+    i jedno przeliczenie danych pochodnych portfela - zamiast N przeliczeń.
+    Zwraca statystyki (lub podgląd przy dry_run) z listą rozpoznanych plików w stats['files'].
+    """
+    started = time.perf_counter()
+    members = expand_uploads(files)
+    if not members:
+        raise ValueError("No files to import.")
+
+    frames, recognized = [], []
+    for member in members:
+        name = getattr(member, 'name', '')
+        try:
+            importer_cls, head = detect_importer(member)
+        except ValueError as e:
+            raise ValueError(f"{name}: {e}")
+        frames.append(importer_cls(member, portfolio_obj, head=head).build_frame())
+        recognized.append({'name': name, 'format': importer_cls.__name__})
+
+    result = ImportWriter(portfolio_obj).apply(frames, dry_run=dry_run, overwrite_manual=overwrite_manual,
+                                               recompute=recompute)
+    stats = result['stats'] if dry_run else result
+    stats['files'] = recognized
+
+    if not dry_run:
+        rows = sum(len(frame) for frame in frames)
+        elapsed = time.perf_counter() - started
+        inc('ike_import_rows_total', rows)
+        if rows and elapsed > 0:
+            observe('ike_import_rows_per_second', rows / elapsed, buckets=THROUGHPUT_BUCKETS)
+        maybe_flush()
+    return result
+
+
+def process_xtb_file(uploaded_file, portfolio_obj, overwrite_manual=False, dry_run=False, recompute=True):
+    """
+    Importuje plik (XTB lub inny zarejestrowany format) do portfela.
+    Format wybiera detect_importer() na podstawie podglądu pliku, nie rozszerzenia.
+    dry_run=True: nic nie zapisuje, zwraca podgląd różnic {'stats', 'added', 'changed', 'removed'}.
+    """
+    return process_import_batch([uploaded_file], portfolio_obj, overwrite_manual=overwrite_manual,
+                                dry_run=dry_run, recompute=recompute)
+
+
+# --- PODGLĄD IMPORTU (DRY-RUN) ---
+# Plik z podglądu odkładamy na dysk (wspólny dla workerów gunicorna), żeby zatwierdzenie nie wymagało ponownego uploadu.
+
+STASH_PREFIX = 'ike_import_'
+
+# Po tylu sekundach niezatwierdzony podgląd wygasa, a plik jest usuwany z katalogu tymczasowego
+STASH_TTL = 3600
+
+
+def _stash_path(token, user_id):
+    """Ścieżka odłożonego pliku albo None dla tokenu spoza formatu (bez wychodzenia poza katalog)."""
+    if not re.fullmatch(r'[0-9a-f]{32}\.(csv|xlsx|zip)', token or ''):
+        return None
+    return os.path.join(tempfile.gettempdir(), f"{STASH_PREFIX}{user_id}_{token}")
+
+
+def _stash_extension(uploaded_file):
+    """
+    Rozszerzenie odłożonego pliku z jego treści, nie z nazwy od klienta (brak rozszerzenia, '.xlsx.1'
+    dawałyby token, którego nie da się zatwierdzić ani anulować). Format i tak rozpoznaje sniff().
+    """
+    head = FileHead(uploaded_file, getattr(uploaded_file, 'name', ''))
+    if head.sheet_names:
+        return '.xlsx'
+    return '.zip' if head.is_zip else '.csv'
+
+
+def purge_stale_stashes(max_age=STASH_TTL):
+    """Usuwa porzucone podglądy (wyciągi brokera) starsze niż max_age. Zwraca liczbę usuniętych plików."""
+    cutoff = time.time() - max_age
+    removed = 0
+    directory = tempfile.gettempdir()
+    for name in os.listdir(directory):
+        if not name.startswith(STASH_PREFIX):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass  # Usunięty równolegle przez inny proces
+    if removed:
+        logger.info(f"IMPORT: usunięto {removed} porzuconych podglądów importu")
+    return removed
+
+
+def stash_upload(uploaded_file, user_id):
+    """
+    Zapisuje przesłany plik w katalogu tymczasowym (tylko dla właściciela procesu). Zwraca token do
+    zatwierdzenia importu. Przy okazji sprząta porzucone podglądy starsze niż STASH_TTL.
+    """
+    purge_stale_stashes()
+    token = f"{secrets.token_hex(16)}{_stash_extension(uploaded_file)}"
+    path = _stash_path(token, user_id)
+    if path is None:
+        raise ValueError("Unsupported file type.")
+    uploaded_file.seek(0)
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'wb') as fh:
+        for chunk in uploaded_file.chunks():
+            fh.write(chunk)
+    uploaded_file.seek(0)
+    return token
+
+
+def load_stashed_upload(token, user_id):
+    """
+    Zwraca odłożony plik jako obiekt z atrybutem .name (jak UploadedFile) lub None, jeśli wygasł.
+    Plik zostaje na dysku - usuwa go discard_stashed_upload() dopiero po udanym imporcie całej paczki.
+    """
+    path = _stash_path(token, user_id)
+    if not path or not os.path.exists(path):
+        return None
+    if os.path.getmtime(path) < time.time() - STASH_TTL:
+        discard_stashed_upload(token, user_id)
+        return None
+    with open(path, 'rb') as fh:
+        data = io.BytesIO(fh.read())
+    data.name = token
+    return data
+
+
+def discard_stashed_upload(token, user_id):
+    """Usuwa odłożony plik (anulowany podgląd). Brak pliku to nie błąd."""
+    path = _stash_path(token, user_id)
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,162 @@
+# core/services/instrumentation.py
+
+import functools
+import time
+from contextvars import ContextVar
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.template.backends.django import DjangoTemplates
+from .metrics import record_cache_get
+
+# Pomiary bieżącego requestu (ustawiane przez ServerTimingMiddleware). None = brak pomiaru:
+# timed() i backendy sprowadzają się wtedy do jednego ContextVar.get().
+_request_stats = ContextVar('request_stats', default=None)
+
+_MISSING = object()
+
+
+class RequestStats:
+    """Etapy (łączny czas, liczba wywołań) i liczniki jednego requestu."""
+    __slots__ = ('stages', 'counters', 'started')
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.started = time.perf_counter()
+
+    def add_stage(self, name, seconds):
+        total, calls = self.stages.get(name, (0.0, 0))
+        self.stages[name] = (total + seconds, calls + 1)
+
+    def incr(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        """Słownik do logu / metryk: czasy etapów w ms, liczba wywołań i liczniki."""
+        return {
+            'total_ms': round(self.elapsed() * 1000, 1),
+            'stages': {name: {'ms': round(total * 1000, 1), 'calls': calls}
+                       for name, (total, calls) in self.stages.items()},
+            'counters': dict(self.counters),
+        }
+
+
+def start_request():
+    """Włącza pomiar w bieżącym kontekście. Zwraca (stats, token) - token do end_request()."""
+    stats = RequestStats()
+    return stats, _request_stats.set(stats)
+
+
+def end_request(token):
+    _request_stats.reset(token)
+
+
+def current_stats():
+    return _request_stats.get()
+
+
+class timed:
+    """
+    Czas etapu w bieżącym requeście - jako context manager (with timed('yahoo'): ...) albo dekorator
+    (@timed('history')). Wątki w tle i polecenia zarządzania nie mają pomiaru - wtedy to no-op.
+    """
+    __slots__ = ('stage', '_stats', '_start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self._stats = _request_stats.get()
+        if self._stats is not None:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self._stats is not None:
+            self._stats.add_stage(self.stage, time.perf_counter() - self._start)
+        return False
+
+    def __call__(self, func):
+        stage = self.stage
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            stats = _request_stats.get()
+            if stats is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.add_stage(stage, time.perf_counter() - start)
+        return wrapper
+
+
+def sql_timer(stats):
+    """execute_wrapper dla połączenia z bazą: czas i liczba zapytań requestu."""
+    def wrapper(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            stats.add_stage('sql', time.perf_counter() - start)
+    return wrapper
+
+
+def server_timing_header(stats):
+    """Nagłówek Server-Timing: total, etapy (dur + liczba wywołań) i trafienia cache."""
+    parts = [f"total;dur={stats.elapsed() * 1000:.1f}"]
+    for name, (total, calls) in sorted(stats.stages.items(), key=lambda x: -x[1][0]):
+        parts.append(f'{name};dur={total * 1000:.1f};desc="{calls}x"')
+    hits, misses = stats.counters.get('cache_hit', 0), stats.counters.get('cache_miss', 0)
+    if hits or misses:
+        parts.append(f'cache;desc="hit {hits} / miss {misses}"')
+    return ', '.join(parts)
+
+
+# --- BACKENDY Z POMIAREM (settings.CACHES / settings.TEMPLATES) ---
+
+class _InstrumentedGetMixin:
+    """get() liczący trafienia i chybienia: w bieżącym requeście i w metrykach (per rodzina kluczy)."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        hit = value is not _MISSING
+        record_cache_get(key, hit)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.incr('cache_hit' if hit else 'cache_miss')
+        return value if hit else default
+
+
+class InstrumentedLocMemCache(_InstrumentedGetMixin, LocMemCache):
+    """LocMemCache z licznikiem trafień - osobny w każdym procesie."""
+
+
+class InstrumentedFileBasedCache(_InstrumentedGetMixin, FileBasedCache):
+    """Cache plikowy z licznikiem trafień - wspólny dla wszystkich workerów gunicorna na jednym hoście."""
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Silnik szablonów Django mierzący renderowanie (etap 'render')."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with timed('render'):
+            return self.template.render(context, request)
@@ -0,0 +1,204 @@
+# core/services/lots.py
+
+import hashlib
+import logging
+from collections import defaultdict, deque
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.db import transaction as db_transaction
+from django.db.models import Count, Sum, Max, Value, DecimalField, IntegerField, F, Case, When
+from django.db.models.functions import (ExtractYear, ExtractMonth, ExtractDay, ExtractHour, ExtractMinute,
+                                        ExtractSecond, Coalesce)
+from django.utils import timezone
+from ..models import Transaction, TransactionType, TaxLot, LotAllocation, TaxYearResult
+
+logger = logging.getLogger('core')
+
+ZERO = Decimal('0')
+Q4 = Decimal('0.0001')
+Q2 = Decimal('0.01')
+
+
+class FifoLotMatcher:
+    """
+    Kolejki FIFO lotów zakupowych per klucz (symbol albo asset_id).
+    Wspólna logika dla PortfolioCalculator (holdings) i księgi podatkowej (TaxLot / LotAllocation).
+    Lot to słownik {'ref', 'qty', 'cost'} - pozostała ilość i pozostały koszt (Decimal).
+    """
+
+    def __init__(self):
+        self.queues = defaultdict(deque)
+
+    def add_lot(self, key, qty, cost, ref=None):
+        """Nowy lot: qty sztuk za łączny koszt cost. ref - dowolny obiekt powiązany z lotem (np. TaxLot)."""
+        if qty <= 0:
+            return None
+        lot = {'ref': ref, 'qty': qty, 'cost': cost}
+        self.queues[key].append(lot)
+        return lot
+
+    def consume(self, key, qty):
+        """
+        Zdejmuje qty sztuk z najstarszych lotów.
+        Zwraca (łączny koszt, [(ref, ilość, koszt), ...]). Sprzedaż bez pokrycia w lotach - reszta bez kosztu.
+        """
+        queue = self.queues[key]
+        total_cost = ZERO
+        taken = []
+        while qty > 0 and queue:
+            lot = queue[0]
+            if lot['qty'] <= qty:
+                take_qty, take_cost = lot['qty'], lot['cost']
+                queue.popleft()
+            else:
+                take_qty = qty
+                take_cost = lot['cost'] * qty / lot['qty']
+                lot['qty'] -= take_qty
+                lot['cost'] -= take_cost
+            qty -= take_qty
+            total_cost += take_cost
+            taken.append((lot['ref'], take_qty, take_cost))
+        return total_cost, taken
+
+    def remaining(self):
+        """{id(ref): pozostała ilość} dla lotów, które jeszcze są w kolejkach."""
+        return {id(lot['ref']): lot['qty'] for queue in self.queues.values() for lot in queue}
+
+
+# =========================================================
+# KSIĘGA PODATKOWA (PERSISTED)
+# =========================================================
+
+def _year_fingerprints(portfolio):
+    """
+    Jedno zapytanie GROUP BY rok: liczba, sumy, ostatnie id i data transakcji oraz sumy kontrolne
+    pól wiersza ważone jego id (typ, aktywo, dzień i godzina w roku, kwota, ilość).
+    Wsteczna transakcja, usunięcie albo edycja dowolnego z tych pól (także zamiana typów czy kwot
+    między wierszami) zmienia odcisk swojego roku.
+    """
+    type_code = Case(*[When(type=t, then=Value(i)) for i, t in enumerate(TransactionType.values, start=1)],
+                     default=Value(0), output_field=IntegerField())
+    day_of_year = ExtractMonth('date') * 32 + ExtractDay('date')
+    time_of_day = ExtractHour('date') * 3600 + ExtractMinute('date') * 60 + ExtractSecond('date')
+
+    rows = (Transaction.objects.filter(portfolio=portfolio)
+            .annotate(year=ExtractYear('date')).values('year')
+            .annotate(n=Count('id'), total_amount=Sum('amount'), total_qty=Sum('quantity'),
+                      last_id=Max('id'), last_date=Max('date'),
+                      sum_type=Sum(F('id') * type_code),
+                      sum_asset=Sum(F('id') * Coalesce('asset_id', 0)),
+                      sum_day=Sum(F('id') * day_of_year),
+                      sum_time=Sum(F('id') * time_of_day),
+                      sum_amount=Sum(F('id') * F('amount')),
+                      sum_qty=Sum(F('id') * F('quantity')))
+            .order_by('year'))
+    fields = ('n', 'total_amount', 'total_qty', 'last_id', 'last_date', 'sum_type', 'sum_asset', 'sum_day', 'sum_time',
+              'sum_amount', 'sum_qty')
+    # Skrót zamiast surowych sum - długość odcisku stała (TaxYearResult.fingerprint ma 200 znaków)
+    return {
+        r['year']: hashlib.sha1('|'.join(str(r[f]) for f in fields).encode()).hexdigest()
+        for r in rows
+    }
+
+
+def sync_tax_ledger(portfolio):
+    """
+    Synchronizuje księgę lotów (TaxLot / LotAllocation) i wyniki roczne (TaxYearResult) z transakcjami.
+    Przeliczamy tylko lata od pierwszego roku ze zmienionym odciskiem - zamknięte lata bez wstecznych
+    transakcji zostają zamrożone. Zwraca listę TaxYearResult rosnąco po roku.
+    """
+    current_year = timezone.now().year
+    fingerprints = _year_fingerprints(portfolio)
+    stored = {r.year: r for r in TaxYearResult.objects.filter(portfolio=portfolio)}
+
+    dirty = [y for y, fp in fingerprints.items() if y not in stored or stored[y].fingerprint != fp]
+    dirty += [y for y in stored if y not in fingerprints]
+
+    if not dirty:
+        # Nowy rok kalendarzowy zamyka poprzedni - sam odcisk się nie zmienił
+        to_freeze = [r for r in stored.values() if r.year < current_year and not r.is_frozen]
+        if to_freeze:
+            TaxYearResult.objects.filter(id__in=[r.id for r in to_freeze]).update(is_frozen=True)
+            for r in to_freeze:
+                r.is_frozen = True
+        return sorted(stored.values(), key=lambda r: r.year)
+
+    start_year = min(dirty)
+    with db_transaction.atomic():
+        fresh = _rebuild_from(portfolio, start_year, fingerprints, current_year)
+
+    logger.info(f"TAX LEDGER: portfel {portfolio.id} przeliczony od {start_year} ({len(fresh)} lat)")
+    kept = [r for y, r in stored.items() if y < start_year]
+    return sorted(kept + fresh, key=lambda r: r.year)
+
+
+def _rebuild_from(portfolio, start_year, fingerprints, current_year):
+    """Odtwarza księgę od 1 stycznia start_year: loty sprzed granicy wchodzą z pozostałą ilością."""
+    boundary = datetime(start_year, 1, 1, tzinfo=dt_timezone.utc)
+
+    LotAllocation.objects.filter(lot__portfolio=portfolio, date__gte=boundary).delete()
+    TaxLot.objects.filter(portfolio=portfolio, date__gte=boundary).delete()
+    TaxYearResult.objects.filter(portfolio=portfolio, year__gte=start_year).delete()
+
+    matcher = FifoLotMatcher()
+    carried = (TaxLot.objects.filter(portfolio=portfolio, date__lt=boundary)
+               .annotate(used=Coalesce(Sum('allocations__quantity'), Value(ZERO),
+                                       output_field=DecimalField(max_digits=15, decimal_places=4)))
+               .order_by('date', 'id'))
+    carried = [lot for lot in carried if lot.used < lot.quantity]
+    for lot in carried:
+        left = lot.quantity - lot.used
+        matcher.add_lot(lot.asset_id, left, lot.cost * left / lot.quantity, ref=lot)
+
+    years = {y: {'revenue': ZERO, 'cost': ZERO, 'income': ZERO, 'div_gross': ZERO, 'div_tax_paid': ZERO}
+             for y in fingerprints if y >= start_year}
+    new_lots, allocations = [], []
+
+    rows = (Transaction.objects.filter(portfolio=portfolio, date__gte=boundary)
+            .order_by('date', 'id').values_list('id', 'asset_id', 'date', 'type', 'amount', 'quantity'))
+    for pk, asset_id, dt, t_type, amount, qty in rows:
+        y = years[dt.year]
+        if t_type == 'DIVIDEND':
+            y['div_gross'] += amount
+        elif t_type == 'TAX':
+            y['div_tax_paid'] += abs(amount)
+        elif t_type == 'CLOSE':
+            y['income'] += amount
+        elif t_type == 'BUY':
+            lot = TaxLot(portfolio=portfolio, asset_id=asset_id, buy_transaction_id=pk, date=dt,
+                         quantity=qty, cost=abs(amount).quantize(Q4), remaining_quantity=qty)
+            if matcher.add_lot(asset_id, qty, abs(amount), ref=lot):
+                new_lots.append(lot)
+        elif t_type == 'SELL':
+            cost, taken = matcher.consume(asset_id, qty)
+            for ref, take_qty, take_cost in taken:
+                allocations.append(LotAllocation(
+                    lot=ref, sell_transaction_id=pk, date=dt, quantity=take_qty.quantize(Q4),
+                    cost_basis=take_cost.quantize(Q4), proceeds=(amount * take_qty / qty).quantize(Q4),
+                ))
+            y['revenue'] += amount
+            y['cost'] += cost
+            y['income'] += amount - cost
+
+    # Pozostałe ilości: loty, które zostały w kolejkach, reszta zdjęta w całości
+    left = matcher.remaining()
+    for lot in new_lots:
+        lot.remaining_quantity = left.get(id(lot), ZERO).quantize(Q4)
+    changed = []
+    for lot in carried:
+        rem = left.get(id(lot), ZERO).quantize(Q4)
+        if rem != lot.remaining_quantity:
+            lot.remaining_quantity = rem
+            changed.append(lot)
+
+    TaxLot.objects.bulk_create(new_lots, batch_size=500)
+    LotAllocation.objects.bulk_create(allocations, batch_size=500)
+    if changed:
+        TaxLot.objects.bulk_update(changed, ['remaining_quantity'], batch_size=500)
+
+    results = [
+        TaxYearResult(portfolio=portfolio, year=year, fingerprint=fingerprints[year],
+                      is_frozen=year < current_year, **{k: v.quantize(Q2) for k, v in d.items()})
+        for year, d in years.items()
+    ]
+    return TaxYearResult.objects.bulk_create(results)
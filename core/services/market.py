@@ -1,19 +1,49 @@
 # core/services/market.py
 
 import math
-import yfinance as yf
+import time
+from contextlib import contextmanager
 import pandas as pd
 from datetime import date, timedelta
 from django.utils import timezone
 from django.conf import settings
+from django.db.models import Min, Max
 import logging
-from ..models import Asset, AssetType, AssetSector
+from ..models import Asset, AssetType, AssetSector, PriceHistory
+from .instrumentation import timed
+from .metrics import observe, inc
+from .providers import get_market_provider
 
 logger = logging.getLogger('core')
 
 
 from django.core.cache import cache
-from core.config import SUMMARY_INDICES, SUMMARY_CURRENCIES, BENCHMARKS
+from core.config import SUMMARY_INDICES, SUMMARY_CURRENCIES, BENCHMARKS, CURRENCY_QUOTE_UNITS
+
+
+@contextmanager
+def yahoo_call(site):
+    """Wywołanie Yahoo: etap 'yahoo' w Server-Timing, histogram czasu i licznik błędów per miejsce wywołania."""
+    start = time.perf_counter()
+    failed = True
+    try:
+        with timed('yahoo'):
+            yield
+        failed = False
+    finally:
+        observe('ike_yahoo_duration_seconds', time.perf_counter() - start, site=site)
+        if failed:
+            inc('ike_yahoo_errors_total', site=site)
+
+
+def yahoo_download(site, *args, **kwargs):
+    """download() bieżącego dostawcy notowań w yahoo_call(site); pusty wynik też liczymy jako błąd."""
+    with yahoo_call(site):
+        data = get_market_provider().download(*args, **kwargs)
+    if data.empty:
+        inc('ike_yahoo_errors_total', site=site)
+    return data
+
 
 def get_market_summary():
     """
@@ -23,7 +53,7 @@ def get_market_summary():
       2. 'summary': Lista słowników do karuzeli [{'symbol', 'display', 'price', 'change_pct'}]
     """
     # Cache na 15 minut, żeby nie katować API przy każdym odświeżeniu
-    cached = cache.get('market_summary_v2')
+    cached = cache.get('market_summary_v3')
     if cached:
         return cached
 
@@ -38,7 +68,7 @@ def get_market_summary():
     try:
         # Pobieramy 5 dni żeby mieć pewność że mamy "wczoraj" i "dziś" (weekendy)
         # threads=False rozwiązuje problemy z sqlite w dev serverze Django
-        data = yf.download(tickers, period="1mo", group_by='ticker', progress=False, threads=False)
+        data = yahoo_download('market_summary', tickers, period="1mo", group_by='ticker', progress=False, threads=False)
         
         # Helper do wyciągania danych
         def process_ticker(ticker_sym, display_name, is_currency=False):
@@ -52,12 +82,6 @@ def get_market_summary():
                 
                 change_pct = ((price_now - price_prev) / price_prev) * 100
                 
-                # Jeśli waluta (np. JPY), to czasem trzeba skalować, ale tu trzymamy raw
-                if is_currency and "JPY" in ticker_sym: 
-                    # JPY w Yahoo to często ~2-3 (za 100 JPY?), ale standardowo dla usera chcemy kurs 1 JPY lub 100 JPY.
-                    # Wcześniejszy kod mnożył przez 100. Utrzymajmy spójność.
-                    price_now *= 100
-                
                 return {
                     'symbol': display_name,
                     'price': price_now,
@@ -76,8 +100,8 @@ def get_market_summary():
                 # Fallback: Jeśli history nie dało danych (np. 1 wiersz), spróbujmy wyciągnąć z .info
                 if not res:
                     try:
-                        t_obj = yf.Ticker(tick)
-                        info = t_obj.info
+                        with yahoo_call('market_summary_quote'):
+                            info = get_market_provider().ticker(tick).info
                         # Szukamy ceny i prev_close
                         price_now = info.get('regularMarketPrice') or info.get('currentPrice')
                         price_prev = info.get('regularMarketPreviousClose')
@@ -105,14 +129,18 @@ def get_market_summary():
             code = curr_map.get(tick)
             item = process_ticker(tick, code, is_currency=True)
             if item:
+                # rates zawsze za 1 jednostkę (jak magazyn FxRate); skala tylko w karuzeli (np. 100 JPY)
+                rates[code] = round(item['price'], 6)
+                units = CURRENCY_QUOTE_UNITS.get(code, 1)
+                if units != 1:
+                    item.update(symbol=f"{units} {code}", price=item['price'] * units)
                 summary_list.append(item)
-                rates[code] = round(item['price'], 4 if code == 'JPY' else 4) # Precyzja
 
     except Exception as e:
         logger.error(f"Market Summary Error: {e}")
 
     result = {'rates': rates, 'summary': summary_list}
-    cache.set('market_summary_v2', result, 900) # 15 min
+    cache.set('market_summary_v3', result, 900) # 15 min
     return result
 
 def get_current_currency_rates():
@@ -151,10 +179,10 @@ def update_prices_bulk(assets_list):
 
     try:
         # 2. Jedno duże zapytanie
-        data = yf.download(tickers, period="5d", group_by='ticker', progress=False, threads=False)
-        
-        updated_count = 0
+        data = yahoo_download('prices_bulk', tickers, period="5d", group_by='ticker', progress=False, threads=False)
         
+        updated = []
+
         # 3. Parsowanie wyników
         for asset in stale_assets:
             try:
@@ -190,15 +218,16 @@ def update_prices_bulk(assets_list):
                     asset.last_price = price
                     asset.previous_close = prev_close
                     asset.last_updated = now
-                    asset.save()
-                    updated_count += 1
-                    
+                    updated.append(asset)
+
             except Exception as e:
                 logger.warning(f"Bulk update error for {asset.symbol}: {e}")
                 continue
                 
-        logger.info(f"BULK UPDATE: Success for {updated_count}/{len(tickers)} assets.")
-        return updated_count
+        # 4. Jeden zapis dla wszystkich zaktualizowanych (zamiast save() per aktywo)
+        Asset.objects.bulk_update(updated, ['last_price', 'previous_close', 'last_updated'], batch_size=500)
+        logger.info(f"BULK UPDATE: Success for {len(updated)}/{len(tickers)} assets.")
+        return len(updated)
 
     except Exception as e:
         logger.error(f"BULK UPDATE FATAL: {e}")
@@ -218,12 +247,13 @@ def get_cached_price(asset: Asset):
             return float(asset.last_price), float(asset.previous_close)
 
     try:
-        ticker = yf.Ticker(asset.yahoo_ticker)
+        ticker = get_market_provider().ticker(asset.yahoo_ticker)
         price = 0.0
         prev_close = 0.0
 
         # 1. Próba z historią
-        data = ticker.history(period='5d')
+        with yahoo_call('quote'):
+            data = ticker.history(period='5d')
         if not data.empty and 'Close' in data.columns:
             valid = data['Close'].dropna()
             if not valid.empty:
@@ -232,7 +262,8 @@ def get_cached_price(asset: Asset):
 
         # 2. Fallback: Jeśli historia pusta, bierzemy aktualną wycenę (Quote)
         if price <= 0:
-            info = ticker.info
+            with yahoo_call('quote_info'):
+                info = ticker.info
             # Różne pola, w których Yahoo może ukryć cenę
             price = info.get('currentPrice') or info.get('regularMarketPrice') or info.get('price') or 0.0
             prev_close = info.get('regularMarketPreviousClose') or price
@@ -241,7 +272,7 @@ def get_cached_price(asset: Asset):
             asset.last_price = price
             asset.previous_close = prev_close
             asset.last_updated = now
-            asset.save()
+            asset.save(update_fields=['last_price', 'previous_close', 'last_updated'])
             return price, prev_close
 
     except Exception as e:
@@ -269,7 +300,8 @@ def fetch_historical_data_for_timeline(assets_tickers: list, start_date: date) -
     def process_download(tickers_list):
         if not tickers_list: return pd.DataFrame()
         try:
-            df = yf.download(
+            df = yahoo_download(
+                'timeline',
                 tickers_list,
                 start=safe_download_start,
                 end=end_date + timedelta(days=1),
@@ -309,7 +341,7 @@ def fetch_historical_data_for_timeline(assets_tickers: list, start_date: date) -
     for b in benchmarks:
         if b not in existing_tickers:
             try:
-                single = yf.download(b, start=safe_download_start, end=end_date + timedelta(days=1), progress=False, threads=False)
+                single = yahoo_download('timeline_retry', b, start=safe_download_start, end=end_date + timedelta(days=1), progress=False, threads=False)
                 if not single.empty:
                     # Fix single index columns
                     if not isinstance(single.columns, pd.MultiIndex):
@@ -337,11 +369,80 @@ def fetch_historical_data_for_timeline(assets_tickers: list, start_date: date) -
     return combined_df
 
 
+# Magazyn cen jednego aktywa (strona aktywa): tolerancja braków na końcu (weekendy, święta) i blokada ponowień
+PRICE_STALE_DAYS = 4
+PRICE_RETRY_TTL = 900
+
+
+def ensure_price_history(asset: Asset, start_date: date) -> int:
+    """
+    Uzupełnia PriceHistory aktywa od start_date do wczoraj - jedno pobranie tylko tego tickera,
+    bez benchmarków i walut. Gdy brakuje tylko ogona, dociąga od ostatniej zapisanej daty.
+    Dzisiejsza (niezamknięta) sesja nie trafia do magazynu. Zwraca liczbę zapisanych cen.
+    """
+    ticker = asset.yahoo_ticker
+    if not ticker:
+        return 0
+
+    today = date.today()
+    cov = PriceHistory.objects.filter(asset=asset).aggregate(first=Min('date'), last=Max('date'))
+    head_ok = cov['first'] is not None and cov['first'] <= start_date + timedelta(days=PRICE_STALE_DAYS)
+    if head_ok and cov['last'] >= today - timedelta(days=PRICE_STALE_DAYS):
+        return 0
+    if not cache.add(f"price_sync_attempt_{asset.id}", True, PRICE_RETRY_TTL):
+        return 0
+
+    fetch_from = cov['last'] + timedelta(days=1) if head_ok else start_date
+    try:
+        data = yahoo_download('price_history', ticker, start=fetch_from, end=today, group_by='ticker', progress=False, threads=False)
+    except Exception as e:
+        logger.warning(f"PRICES: pobieranie {ticker} nieudane: {e}")
+        return 0
+    if data.empty:
+        return 0
+
+    data.index = pd.to_datetime(data.index)
+    if data.index.tz is not None:
+        data.index = data.index.tz_localize(None)
+    data.index = data.index.date
+    if not isinstance(data.columns, pd.MultiIndex):
+        data.columns = pd.MultiIndex.from_product([[ticker], data.columns])
+    return save_price_history(data[data.index < today], [asset])
+
+
+def load_price_series(asset: Asset, start_date: date) -> pd.Series:
+    """Ceny zamknięcia aktywa z magazynu od start_date (indeks datetime.date, rosnąco) - jedno zapytanie."""
+    rows = list(PriceHistory.objects.filter(asset=asset, date__gte=start_date)
+                .order_by('date').values_list('date', 'close_price'))
+    if not rows:
+        return pd.Series(dtype=float)
+    dates, closes = zip(*rows)
+    return pd.Series([float(c) for c in closes], index=list(dates), dtype=float)
+
+
+def save_price_history(hist_data: pd.DataFrame, assets) -> int:
+    """
+    Zapisuje ceny zamknięcia z ramki fetch_historical_data_for_timeline() do PriceHistory.
+    Jeden bulk insert; istniejące (asset, date) są pomijane.
+    """
+    if hist_data.empty or not isinstance(hist_data.columns, pd.MultiIndex):
+        return 0
+    available = set(hist_data.columns.get_level_values(0))
+    rows = []
+    for asset in assets:
+        ticker = asset.yahoo_ticker
+        if not ticker or ticker not in available or 'Close' not in hist_data[ticker].columns:
+            continue
+        closes = hist_data[ticker]['Close'].dropna()
+        rows.extend(PriceHistory(asset=asset, date=d, close_price=round(float(v), 4)) for d, v in closes.items())
+    PriceHistory.objects.bulk_create(rows, ignore_conflicts=True, batch_size=1000)
+    return len(rows)
+
+
 def validate_ticker_and_price(symbol, date_obj, price_pln):
     """
     Sprawdza ticker w kolejności: Symbol -> Symbol.WA -> Symbol.US.
     """
-    import yfinance as yf
     from datetime import timedelta
 
     check_date_start = date_obj.date() - timedelta(days=5)
@@ -359,7 +460,7 @@ def validate_ticker_and_price(symbol, date_obj, price_pln):
     # KROK 1: Szukanie danych
     for ticker in candidates:
         try:
-            df = yf.download(ticker, start=check_date_start, end=check_date_end, progress=False)
+            df = yahoo_download('validate_ticker', ticker, start=check_date_start, end=check_date_end, progress=False)
 
             if df.empty: continue
 
@@ -419,8 +520,8 @@ def fetch_asset_metadata(yahoo_ticker):
     Pobiera metadane z Yahoo Finance.
     """
     try:
-        ticker = yf.Ticker(yahoo_ticker)
-        info = ticker.info
+        with yahoo_call('metadata'):
+            info = get_market_provider().ticker(yahoo_ticker).info
 
         q_type = info.get('quoteType', '').upper()
         asset_type = AssetType.OTHER
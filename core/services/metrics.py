@@ -0,0 +1,198 @@
+# core/services/metrics.py
+
+import atexit
+import logging
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from django.conf import settings
+
+logger = logging.getLogger('core')
+
+# Progi histogramów (sekundy) - od szybkiego trafienia w cache do pełnego przeliczenia z Yahoo
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Import: wiersze na sekundę
+THROUGHPUT_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000)
+
+# Opisy metryk (# HELP w formacie Prometheus)
+METRICS_HELP = {
+    'ike_request_duration_seconds': 'Request latency per view',
+    'ike_requests_total': 'Requests per view and status class',
+    'ike_stage_duration_seconds': 'Time spent per request in an instrumented stage (timed)',
+    'ike_yahoo_duration_seconds': 'Yahoo Finance call latency per call site',
+    'ike_yahoo_errors_total': 'Yahoo Finance calls that raised or returned no data, per call site',
+    'ike_cache_requests_total': 'Cache get() per key family and result (hit/miss)',
+    'ike_import_rows_per_second': 'Import throughput (normalized rows per second)',
+    'ike_import_rows_total': 'Imported rows (normalized)',
+}
+
+# Bufor procesu jest zrzucany do wspólnej bazy SQLite co tyle sekund (i przy odczycie /metrics/)
+METRICS_FLUSH_SECONDS = 10
+
+_lock = threading.Lock()
+_counters = {}     # (name, labels) -> float
+_histograms = {}   # (name, labels) -> [buckets (len+1, ostatni = +Inf), sum, count, bounds]
+_last_flush = time.monotonic()
+
+
+def _enabled():
+    return getattr(settings, 'METRICS_ENABLED', True)
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1.0, **labels):
+    """Licznik (counter) z etykietami, np. inc('ike_yahoo_errors_total', site='fx')."""
+    if not _enabled():
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    """Obserwacja histogramu (domyślnie czasy w sekundach)."""
+    if not _enabled():
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0, buckets]
+        hist[0][bisect_left(buckets, value)] += 1
+        hist[1] += value
+        hist[2] += 1
+
+
+# --- RODZINY KLUCZY CACHE ---
+_FAMILY_RE = re.compile(r'^[a-z]+(?:_[a-z]+)*')
+
+
+def cache_key_family(key):
+    """'portfolio_snapshot_3_v5' -> 'portfolio_snapshot', 'asset_news_PKN.PL' -> 'asset_news'."""
+    match = _FAMILY_RE.match(str(key))
+    family = match.group(0) if match else 'other'
+    # Sufiks wersji zrośnięty z nazwą (history_v23_...) nie jest częścią rodziny
+    return re.sub(r'_v$', '', family)[:40] or 'other'
+
+
+def record_cache_get(key, hit):
+    inc('ike_cache_requests_total', family=cache_key_family(key), result='hit' if hit else 'miss')
+
+
+# --- WSPÓLNY MAGAZYN (SQLite, wiele procesów gunicorna) ---
+
+def _connect():
+    conn = sqlite3.connect(str(settings.METRICS_DB), timeout=5)
+    conn.execute("""CREATE TABLE IF NOT EXISTS metric (
+                        name TEXT NOT NULL, labels TEXT NOT NULL, le TEXT NOT NULL, value REAL NOT NULL,
+                        PRIMARY KEY (name, labels, le))""")
+    return conn
+
+
+def _encode_labels(labels):
+    return ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _drain():
+    """Zabiera bufor procesu jako wiersze (name, labels, le, delta)."""
+    with _lock:
+        counters, histograms = dict(_counters), dict(_histograms)
+        _counters.clear()
+        _histograms.clear()
+
+    rows = [(name, _encode_labels(labels), '', value) for (name, labels), value in counters.items()]
+    for (name, labels), (counts, total, count, bounds) in histograms.items():
+        encoded = _encode_labels(labels)
+        les = [repr(float(b)) for b in bounds] + ['+Inf']
+        rows.extend((name, encoded, le, c) for le, c in zip(les, counts) if c)
+        rows.append((name, encoded, 'sum', total))
+        rows.append((name, encoded, 'count', count))
+    return rows
+
+
+def flush():
+    """Dopisuje bufor procesu do wspólnej bazy (UPSERT z sumowaniem) - jedna transakcja."""
+    global _last_flush
+    _last_flush = time.monotonic()
+    rows = _drain()
+    if not rows:
+        return 0
+    try:
+        conn = _connect()
+        with conn:
+            conn.executemany("""INSERT INTO metric (name, labels, le, value) VALUES (?, ?, ?, ?)
+                                ON CONFLICT (name, labels, le) DO UPDATE SET value = value + excluded.value""", rows)
+        conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"METRICS: zapis nieudany ({len(rows)} wierszy): {e}")
+        return 0
+    return len(rows)
+
+
+def maybe_flush():
+    """Zrzut bufora najwyżej raz na METRICS_FLUSH_SECONDS (wołane po requeście / imporcie)."""
+    if _enabled() and time.monotonic() - _last_flush >= METRICS_FLUSH_SECONDS:
+        flush()
+
+
+atexit.register(flush)
+
+
+def render_prometheus():
+    """Wszystkie metryki (wszystkie procesy) w formacie tekstowym Prometheus 0.0.4."""
+    flush()
+    try:
+        conn = _connect()
+        rows = conn.execute("SELECT name, labels, le, value FROM metric ORDER BY name, labels").fetchall()
+        conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"METRICS: odczyt nieudany: {e}")
+        rows = []
+
+    series = {}
+    for name, labels, le, value in rows:
+        series.setdefault(name, {}).setdefault(labels, {})[le] = value
+
+    lines = []
+    for name, by_labels in series.items():
+        is_histogram = any('count' in values for values in by_labels.values())
+        lines.append(f"# HELP {name} {METRICS_HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} {'histogram' if is_histogram else 'counter'}")
+        for labels, values in by_labels.items():
+            if not is_histogram:
+                braces = f"{{{labels}}}" if labels else ''
+                lines.append(f"{name}{braces} {_number(values[''])}")
+                continue
+            prefix = f"{labels}," if labels else ''
+            bounds = sorted((le for le in values if le not in ('sum', 'count', '+Inf')), key=float)
+            cumulative = 0.0
+            for le in bounds:
+                cumulative += values[le]
+                lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {_number(cumulative)}')
+            lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {_number(values.get("count", 0))}')
+            braces = f"{{{labels}}}" if labels else ''
+            lines.append(f"{name}_sum{braces} {values.get('sum', 0.0)}")
+            lines.append(f"{name}_count{braces} {_number(values.get('count', 0))}")
+    return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def reset_metrics():
+    """Czyści bufor i wspólną bazę (testy, nowy pomiar)."""
+    _drain()
+    conn = _connect()
+    with conn:
+        conn.execute("DELETE FROM metric")
+    conn.close()
@@ -2,9 +2,21 @@
 
 import feedparser
 import urllib.parse
-import difflib
-from datetime import date
+import re
+import time
+import unicodedata
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone as dt_timezone
+from pathlib import Path
 import logging
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from ..models import Asset, NewsItem
+from .background import run_in_background
+from .instrumentation import timed
 
 logger = logging.getLogger('core')
 
@@ -19,16 +31,170 @@ AMBIGUOUS_TICKERS = {
     'PAS', 'DOM', 'TOR', 'KOG', 'LEN', 'AUTO', 'DATA', 'TEST', 'O2O', 'VIGO', 'ABC', 'BBT', 'BETA', 'ACT'
 }
 
+SPORT_WORDS = ['mistrzowski', 'waga', 'gala', 'ring', 'ksw', 'ufc', 'autostrada', 'drogowy']
+
+# Cache newsów per symbol: po NEWS_TTL odświeżamy w tle, do tego czasu (i w trakcie) podajemy ostatni wynik
+NEWS_TTL = 1800
+NEWS_CACHE_TTL = 6 * 3600
+NEWS_LIMIT = 8
+NEWS_CANDIDATES = 40
+
+# Prefetch wszystkich trzymanych symboli: ile zapytań RSS naraz
+NEWS_WORKERS = 8
+
+# Deduplikacja tytułów: MinHash na znormalizowanych tokenach, próg podobieństwa Jaccarda
+DEDUP_THRESHOLD = 0.7
+MINHASH_PERMUTATIONS = 64
+_MINHASH_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)
+_MINHASH_A = _rng.integers(1, _MINHASH_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+_MINHASH_B = _rng.integers(0, _MINHASH_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+# --- ŹRÓDŁA FEEDÓW ---
+
+class GoogleNewsFeed:
+    """Domyślne źródło: Google News RSS."""
+
+    def parse(self, symbol, url):
+        return feedparser.parse(url)
+
+
+class LocalFeed:
+    """
+    Pliki RSS z katalogu zamiast sieci (testy offline, benchmarki): <symbol>.xml, w braku default.xml.
+    Brak obu plików = pusty feed.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def parse(self, symbol, url):
+        for path in (self.directory / f"{symbol}.xml", self.directory / 'default.xml'):
+            if path.exists():
+                return feedparser.parse(str(path))
+        return feedparser.FeedParserDict(entries=[])
+
+
+def get_feed_source():
+    """Źródło z ustawień: NEWS_FEED_DIR -> LocalFeed, inaczej Google News."""
+    feed_dir = getattr(settings, 'NEWS_FEED_DIR', None)
+    return LocalFeed(feed_dir) if feed_dir else GoogleNewsFeed()
+
+
+def news_cache_key(symbol):
+    return f"asset_news_{symbol}"
+
 
 def get_asset_news(symbol, name):
-    news_list = []
+    """
+    Newsy z cache (bez zapytania do RSS w trakcie requestu). Brak lub nieaktualny wpis -> odświeżenie
+    w tle. Zwraca {'news': lista | None (jeszcze nie pobrano), 'news_refreshing': bool}.
+    """
+    entry = cache.get(news_cache_key(symbol))
+    if entry is None:
+        entry = load_stored_news(symbol)
+    refreshing = False
+    if entry is None or time.time() - entry['fetched'] > NEWS_TTL:
+        refreshing = run_in_background(f"news_{symbol}", refresh_asset_news, symbol, name) or entry is None
+
+    news = _with_labels(entry['items']) if entry is not None else None
+    return {'news': news, 'news_refreshing': refreshing}
+
+
+def refresh_asset_news(symbol, name):
+    """Pobiera RSS i zapisuje ranking (tabela + cache). Przy błędzie zostaje poprzedni wpis (następna próba po NEWS_TTL)."""
+    try:
+        items = fetch_asset_news(symbol, name)
+    except Exception as e:
+        logger.error(f"News Error: {e}")
+        previous = cache.get(news_cache_key(symbol))
+        items = previous['items'] if previous else []
+        cache.set(news_cache_key(symbol), {'items': items, 'fetched': time.time()}, NEWS_CACHE_TTL)
+        return items
+
+    asset = Asset.objects.filter(symbol=symbol).first()
+    if asset:
+        store_news(asset, items)
+    else:
+        cache.set(news_cache_key(symbol), {'items': items, 'fetched': time.time()}, NEWS_CACHE_TTL)
+    return items
+
+
+def store_news(asset, items, fetched_at=None):
+    """Podmienia ranking newsów aktywa w tabeli (jedna transakcja) i wpis w cache."""
+    fetched_at = fetched_at or datetime.now(dt_timezone.utc)
+    with transaction.atomic():
+        NewsItem.objects.filter(asset=asset).delete()
+        NewsItem.objects.bulk_create([
+            NewsItem(asset=asset, rank=rank, title=item['title'][:500], link=item['link'][:1000],
+                     source=item['source'][:100], published=item['date_obj'], tags=item['tags'],
+                     priority=item['priority'], fetched_at=fetched_at)
+            for rank, item in enumerate(items)
+        ])
+    cache.set(news_cache_key(asset.symbol), {'items': items, 'fetched': fetched_at.timestamp()}, NEWS_CACHE_TTL)
+
+
+def load_stored_news(symbol):
+    """Ranking z tabeli jako wpis cache ({'items', 'fetched'}) lub None, gdy symbolu nigdy nie pobierano."""
+    rows = list(NewsItem.objects.filter(asset__symbol=symbol).order_by('rank'))
+    if not rows:
+        return None
+    entry = {
+        'items': [{'title': n.title, 'link': n.link, 'source': n.source, 'date_obj': n.published,
+                   'tags': n.tags, 'priority': n.priority} for n in rows],
+        'fetched': rows[0].fetched_at.timestamp(),
+    }
+    cache.set(news_cache_key(symbol), entry, NEWS_CACHE_TTL)
+    return entry
+
 
+def prefetch_news(assets, workers=NEWS_WORKERS, source=None, force=False):
+    """
+    Newsy dla wielu aktywów naraz: pobieranie RSS w ograniczonej puli wątków (tylko sieć), zapis rankingów
+    w wątku wywołującym. Aktywa z rankingiem młodszym niż NEWS_TTL pomijamy (chyba że force).
+    """
+    source = source or get_feed_source()
+    assets = list(assets)
+    if not force:
+        cutoff = datetime.fromtimestamp(time.time() - NEWS_TTL, dt_timezone.utc)
+        fresh = set(NewsItem.objects.filter(asset__in=assets, fetched_at__gte=cutoff)
+                    .values_list('asset_id', flat=True).distinct())
+        skipped = sum(1 for a in assets if a.id in fresh)
+        assets = [a for a in assets if a.id not in fresh]
+    else:
+        skipped = 0
+
+    def worker(asset):
+        try:
+            return fetch_asset_news(asset.symbol, asset.name or asset.symbol, source)
+        except Exception as e:
+            logger.warning(f"NEWS: {asset.symbol} nieudane: {e}")
+            return None
+
+    stats = {'assets': len(assets), 'skipped': skipped, 'items': 0, 'failed': 0}
+    if not assets:
+        return stats
+
+    fetched_at = datetime.now(dt_timezone.utc)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(assets))), thread_name_prefix='news') as pool:
+        for asset, items in zip(assets, pool.map(worker, assets)):
+            if items is None:
+                stats['failed'] += 1
+                continue
+            store_news(asset, items, fetched_at)
+            stats['items'] += len(items)
+    return stats
+
+
+def build_news_url(symbol, name):
     # Proste czyszczenie nazwy
     clean_name = name.split(' ')[0].strip()
     # Usuwamy ewentualne kropki z nazwy (np. "Passus S.A." -> "Passus")
     clean_name = clean_name.replace(',', '').replace('.', '')
 
-    query = ""
+    is_ambiguous = False
+    base_url = "https://news.google.com/rss/search"
 
     if symbol.endswith('.PL'):
         ticker_clean = symbol.replace('.PL', '')
@@ -56,103 +222,125 @@ def get_asset_news(symbol, name):
             # Tu możemy pozwolić sobie na szerszy kontekst.
             query = f'"{clean_name}" OR "{ticker_clean}"'
 
-        base_url = "https://news.google.com/rss/search"
         params = {'q': f"({query}) when:30d", 'hl': 'pl', 'gl': 'PL', 'ceid': 'PL:pl'}
 
     else:
         # Zagraniczne
         query = f'"{clean_name}" stock'
-        base_url = "https://news.google.com/rss/search"
         params = {'q': f"({query}) when:30d", 'hl': 'en-US', 'gl': 'US', 'ceid': 'US:en'}
 
-    encoded_query = urllib.parse.urlencode(params)
-    rss_url = f"{base_url}?{encoded_query}"
+    return f"{base_url}?{urllib.parse.urlencode(params)}", is_ambiguous
 
-    try:
-        feed = feedparser.parse(rss_url)
-        today = date.today()
-        candidates = []
-
-        # Pobieramy 40, żeby po ostrym filtrowaniu coś zostało
-        for entry in feed.entries[:40]:
-            source_name = entry.source.title if hasattr(entry, 'source') else 'Google'
-            source_lower = source_name.lower()
-            title_lower = entry.title.lower()
-
-            # A. Filtracja Źródeł (Dodatkowo blokujemy sportowe)
-            if any(blocked in source_lower for blocked in BLOCKED_SOURCES):
-                continue
 
-            # B. Dodatkowe zabezpieczenie treści dla "PAS"
-            # Jeśli w tytule jest "mistrzowski", "waga", "gala", "ring" -> odrzucamy
-            if is_ambiguous and any(sport_word in title_lower for sport_word in
-                                    ['mistrzowski', 'waga', 'gala', 'ring', 'ksw', 'ufc', 'autostrada', 'drogowy']):
-                continue
+def fetch_asset_news(symbol, name, source=None):
+    """Zapytanie do źródła RSS + filtrowanie, priorytety i deduplikacja. Bez etykiet dat (liczone przy odczycie)."""
+    rss_url, is_ambiguous = build_news_url(symbol, name)
+    with timed('rss'):
+        feed = (source or get_feed_source()).parse(symbol, rss_url)
+    candidates = []
 
-            # C. Priorytetyzacja
-            priority_score = 0
-            if any(pref in source_lower for pref in PREFERRED_SOURCES):
-                priority_score = 10
-
-            # Data
-            dt_obj = date(2000, 1, 1)
-            date_label = "Recent"
-            freshness = 2
-
-            if hasattr(entry, 'published_parsed'):
-                try:
-                    dt_obj = date(entry.published_parsed.tm_year, entry.published_parsed.tm_mon,
-                                  entry.published_parsed.tm_mday)
-                    delta = (today - dt_obj).days
-                    if delta <= 1:
-                        date_label = "TODAY 🔥" if delta == 0 else "YESTERDAY";
-                        freshness = 0
-                    elif delta <= 7:
-                        date_label = dt_obj.strftime("%Y-%m-%d");
-                        freshness = 1
-                    else:
-                        date_label = dt_obj.strftime("%Y-%m-%d");
-                        freshness = 2
-                except:
-                    pass
-
-            tags = []
-            if 'espi' in title_lower or 'ebi' in title_lower: tags.append('OFFICIAL')
-            if 'dywidend' in title_lower: tags.append('MONEY')
-            if 'wyniki' in title_lower and 'finans' in title_lower: tags.append('RESULTS')  # Tylko "wyniki finansowe"
-            if 'rekomendacj' in title_lower: tags.append('RECO')
-
-            candidates.append({
-                'title': entry.title,
-                'link': entry.link,
-                'source': source_name,
-                'date_label': date_label,
-                'date_obj': dt_obj,
-                'freshness': freshness,
-                'tags': tags,
-                'priority': priority_score
-            })
-
-        # D. Sortowanie i Deduplikacja
-        candidates.sort(key=lambda x: x['priority'], reverse=True)
-        unique_news = []
-        seen_titles = []
-
-        for item in candidates:
-            title = item['title']
-            is_duplicate = False
-            for seen in seen_titles:
-                if difflib.SequenceMatcher(None, title, seen).ratio() > 0.85:
-                    is_duplicate = True;
-                    break
-            if not is_duplicate:
-                unique_news.append(item)
-                seen_titles.append(title)
-
-        unique_news.sort(key=lambda x: x['date_obj'], reverse=True)
-        news_list = unique_news[:8]
+    # Pobieramy 40, żeby po ostrym filtrowaniu coś zostało
+    for entry in feed.entries[:NEWS_CANDIDATES]:
+        source_name = entry.source.title if hasattr(entry, 'source') else 'Google'
+        source_lower = source_name.lower()
+        title_lower = entry.title.lower()
 
-    except Exception as e:
-        logger.error(f"News Error: {e}")
+        # A. Filtracja Źródeł (Dodatkowo blokujemy sportowe)
+        if any(blocked in source_lower for blocked in BLOCKED_SOURCES):
+            continue
+
+        # B. Dodatkowe zabezpieczenie treści dla "PAS"
+        # Jeśli w tytule jest "mistrzowski", "waga", "gala", "ring" -> odrzucamy
+        if is_ambiguous and any(sport_word in title_lower for sport_word in SPORT_WORDS):
+            continue
+
+        # C. Priorytetyzacja
+        priority_score = 10 if any(pref in source_lower for pref in PREFERRED_SOURCES) else 0
+
+        dt_obj = None
+        if hasattr(entry, 'published_parsed'):
+            try:
+                dt_obj = date(entry.published_parsed.tm_year, entry.published_parsed.tm_mon,
+                              entry.published_parsed.tm_mday)
+            except (TypeError, ValueError, AttributeError):
+                pass
+
+        tags = []
+        if 'espi' in title_lower or 'ebi' in title_lower: tags.append('OFFICIAL')
+        if 'dywidend' in title_lower: tags.append('MONEY')
+        if 'wyniki' in title_lower and 'finans' in title_lower: tags.append('RESULTS')  # Tylko "wyniki finansowe"
+        if 'rekomendacj' in title_lower: tags.append('RECO')
+
+        candidates.append({
+            'title': entry.title,
+            'link': entry.link,
+            'source': source_name,
+            'date_obj': dt_obj,
+            'tags': tags,
+            'priority': priority_score
+        })
+
+    # D. Sortowanie i Deduplikacja (preferowane źródła wygrywają z duplikatami)
+    candidates.sort(key=lambda x: x['priority'], reverse=True)
+    keep = dedupe_titles([c['title'] for c in candidates])
+    unique_news = [candidates[i] for i in keep]
+
+    unique_news.sort(key=lambda x: x['date_obj'] or date(2000, 1, 1), reverse=True)
+    return unique_news[:NEWS_LIMIT]
+
+
+def _with_labels(items):
+    """Etykiety świeżości liczone przy odczycie - wpis z cache nie "zostaje" na TODAY po północy."""
+    today = date.today()
+    labeled = []
+    for item in items:
+        dt_obj = item['date_obj']
+        date_label, freshness = "Recent", 2
+        if dt_obj:
+            delta = (today - dt_obj).days
+            if delta <= 1:
+                date_label = "TODAY 🔥" if delta == 0 else "YESTERDAY"
+                freshness = 0
+            else:
+                date_label = dt_obj.strftime("%Y-%m-%d")
+                freshness = 1 if delta <= 7 else 2
+        labeled.append(dict(item, date_label=date_label, freshness=freshness))
+    return labeled
+
+
+# --- DEDUPLIKACJA (MinHash) ---
+
+def normalize_title(title):
+    """Tokeny tytułu: bez sufiksu " - Źródło" (Google News), bez ogonków i interpunkcji, małymi literami."""
+    if ' - ' in title:
+        title = title.rsplit(' - ', 1)[0]
+    text = unicodedata.normalize('NFKD', title.lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).replace('ł', 'l')
+    return set(re.findall(r'\w+', text))
+
+
+def minhash_signatures(titles):
+    """Sygnatury MinHash (tytuły x permutacje): min po tokenach z (a * crc32(token) + b) mod p."""
+    signatures = np.full((len(titles), MINHASH_PERMUTATIONS), _MINHASH_PRIME, dtype=np.uint64)
+    for i, title in enumerate(titles):
+        tokens = normalize_title(title) or {title}
+        hashes = np.fromiter((zlib.crc32(t.encode()) % _MINHASH_PRIME for t in tokens), dtype=np.uint64, count=len(tokens))
+        signatures[i] = ((_MINHASH_A[:, None] * hashes[None, :] + _MINHASH_B[:, None]) % _MINHASH_PRIME).min(axis=1)
+    return signatures
+
+
+def dedupe_titles(titles, threshold=DEDUP_THRESHOLD):
+    """
+    Indeksy tytułów do zachowania (kolejność wejścia = priorytet). Podobieństwo Jaccarda szacowane
+    z sygnatur MinHash jednym porównaniem macierzowym zamiast parami SequenceMatcher.
+    """
+    if not titles:
+        return []
+    signatures = minhash_signatures(titles)
+    similarity = (signatures[:, None, :] == signatures[None, :, :]).mean(axis=2)
 
-    return news_list
\ No newline at end of file
+    keep = []
+    for i in range(len(titles)):
+        if not keep or similarity[i, keep].max() < threshold:
+            keep.append(i)
+    return keep
@@ -1,4 +1,5 @@
 from datetime import date, timedelta, datetime
+from .instrumentation import timed
 
 try:
     from pyxirr import xirr
@@ -11,6 +12,7 @@ class PerformanceCalculator:
         self.transactions = sorted(list(transactions), key=lambda x: x.date)
 
     # --- ZMIANA: Dodajemy argument timeline_data ---
+    @timed('performance')
     def calculate_metrics(self, timeline_data=None, start_date=None, end_date=None, current_total_value=None):
         if not end_date: end_date = date.today()
 
@@ -109,6 +111,7 @@ class PerformanceCalculator:
         return 0.0
 
     # ... (calculate_twr, _calculate_xirr_robust, _get_accounting_value_at bez zmian) ...
+    @timed('performance')
     def calculate_twr(self, timeline_data, start_date_filter=None):
         val_user = timeline_data.get('val_user', [])
         dates_str = timeline_data.get('dates', [])
@@ -1,12 +1,19 @@
-from datetime import date
+from datetime import date, timedelta
 from decimal import Decimal
 import colorsys
 import math
+import numpy as np
+from django.core.cache import cache
 from core.config import fmt_2, fmt_4
-from .market import get_market_summary, fetch_historical_data_for_timeline, get_cached_price, get_current_currency_rates
+from ..models import Transaction
+from .market import (get_market_summary, get_cached_price, get_current_currency_rates, ensure_price_history,
+                     load_price_series)
 from .calculator import PortfolioCalculator
 from .selectors import get_transactions, get_asset_by_symbol, get_portfolio_by_id
 from .analytics import analyze_holdings, analyze_history
+from .snapshot import get_portfolio_snapshot, snapshot_cache_key
+from .fx import convert, ensure_fx_history, rate_multipliers
+from .reporting import reporting_currency, reporting_rate, stats_in_currency, timeline_in_currency
 
 # =========================================================
 # KONFIGURACJA KOLORÓW (SOFT UI PALETTE)
@@ -27,6 +34,9 @@ SECTOR_COLORS = {
 
 DEFAULT_COLOR = '#CFD8DC'
 
+# Strona aktywa: wykres obejmuje co najmniej tyle dni wstecz (przyciski 1Y / YTD)
+ASSET_CHART_MIN_DAYS = 366
+
 
 def _adjust_color_lightness(hex_color, factor):
     try:
@@ -55,13 +65,23 @@ def _generate_sector_shades(base_color, count):
 
 def get_dashboard_context(user, portfolio_id=None):
     transactions = get_transactions(user, portfolio_id)
-    if not transactions.exists():
+    portfolio = get_portfolio_by_id(user, portfolio_id) if portfolio_id else None
+    # Jeden portfel: wspólny snapshot (liczony raz na wersję danych, nie per widok); None = brak transakcji
+    snapshot = get_portfolio_snapshot(portfolio) if portfolio else None
+    if snapshot is None and (portfolio or not transactions.exists()):
         return _get_empty_dashboard_context()
 
     market_data = get_market_summary()
     rates = market_data['rates']
-    stats = analyze_holdings(transactions, rates)
-    timeline = analyze_history(transactions, rates)
+    if snapshot:
+        stats, timeline = snapshot['stats'], snapshot['timeline']
+    else:
+        stats = analyze_holdings(transactions, rates)
+        timeline = analyze_history(transactions, rates)
+    # Liczymy w PLN, do waluty raportowej przeliczamy gotowy wynik (bez ponownego liczenia lotów i cen)
+    currency = reporting_currency(portfolio)
+    stats = stats_in_currency(stats, currency, rates)
+    timeline = timeline_in_currency(timeline, currency)
     charts = _prepare_dashboard_charts(stats['assets'], stats['cash'])
     annual_ret = _calculate_annual_return(stats['total_profit'], stats['invested'], stats['first_date'])
     last_transactions = transactions.order_by('-date')[:20]
@@ -114,7 +134,7 @@ def get_dashboard_context(user, portfolio_id=None):
         'timeline_pct_sp500': timeline['pct_sp'], 'timeline_pct_inflation': timeline['pct_inf'],
         'timeline_pct_acwi': timeline.get('pct_acwi', []),
         'last_market_date': timeline['last_market_date'], 'rates': rates,
-        'market_summary': market_data['summary']
+        'market_summary': market_data['summary'], 'currency': currency
     }
     enrich_assets_context(context, stats['assets'], stats['total_value'])
     return context
@@ -254,38 +274,61 @@ def _calculate_annual_return(total_profit, invested, first_date):
     return (total_profit / invested * 100) / (days / 365.25) if days > 365 else (total_profit / invested * 100)
 
 
+def _asset_lot_state(portfolio, asset):
+    """
+    Stan lotów aktywa (qty, koszt, zrealizowany wynik, transakcje): z zapisanego snapshotu portfela,
+    a gdy go nie ma (lub pozycja jest zamknięta) - przeliczenie tylko transakcji tego aktywa.
+    """
+    snapshot = cache.get(snapshot_cache_key(portfolio))
+    if snapshot:
+        for item in snapshot['stats']['assets']:
+            if item['symbol'] == asset.symbol and not item['is_closed']:
+                return {'qty': item['quantity'], 'cost': item['cost_pln'], 'realized': item['realized_pln'],
+                        'trades': item['trades']}
+
+    asset_trans = Transaction.objects.filter(portfolio=portfolio, asset=asset).select_related('asset').order_by('date')
+    holdings = PortfolioCalculator(asset_trans).process().get_holdings()
+    return holdings.get(asset.symbol, {'qty': 0.0, 'cost': 0.0, 'realized': 0.0, 'trades': []})
+
+
 def get_asset_details_context(user, symbol, portfolio_id=None):
     portfolio = get_portfolio_by_id(user, portfolio_id)
     asset = get_asset_by_symbol(symbol)
     if not portfolio or not asset: return {'symbol': symbol, 'error': 'Asset not found.'}
-    all_trans = get_transactions(user, portfolio.id)
-    asset_trans = all_trans.filter(asset=asset).order_by('date')
-    holdings = PortfolioCalculator(asset_trans).process().get_holdings()
-    asset_data = holdings.get(symbol, {'qty': 0.0, 'cost': 0.0, 'realized': 0.0, 'trades': []})
+    asset_data = _asset_lot_state(portfolio, asset)
     rates = get_current_currency_rates()
-    multiplier = rates.get(asset.currency, 1.0) if asset.currency != 'PLN' else 1.0
-    if asset.currency == 'JPY': multiplier /= 100.0
-    first_date = asset_trans.first().date.date() if asset_trans.exists() else date.today()
+    currency = reporting_currency(portfolio)
+    multiplier = float(rate_multipliers(asset.currency, target=currency, rates=rates)[0])
+    today = date.today()
+    first_date = asset_data['trades'][0]['date'].date() if asset_data['trades'] else today
+
+    # Wykres: tylko ten ticker z magazynu cen (dociągany brakujący zakres), okres od zakupu, min. rok dla 1Y/YTD
+    chart_start = min(first_date, today - timedelta(days=ASSET_CHART_MIN_DAYS))
+    ensure_price_history(asset, chart_start)
+    series = load_price_series(asset, chart_start)
+
+    current_price_orig, prev_close = get_cached_price(asset)
+    if current_price_orig <= 0 and not series.empty:
+        current_price_orig = float(series.iloc[-1])
+        prev_close = float(series.iloc[-2]) if len(series) >= 2 else current_price_orig
+    elif current_price_orig > 0 and (series.empty or series.index[-1] < today):
+        # Bieżąca sesja nie jest w magazynie - ostatni punkt wykresu z aktualnej ceny
+        series.loc[today] = current_price_orig
 
-    current_price_orig, prev_close = 0.0, 0.0
     chart_dates, chart_prices = [], []
-    try:
-        hist_df = fetch_historical_data_for_timeline([asset.yahoo_ticker], first_date)
-        if not hist_df.empty and asset.yahoo_ticker in hist_df.columns.levels[0]:
-            series = hist_df[asset.yahoo_ticker]['Close'].dropna()
-            current_price_orig = float(series.iloc[-1])
-            prev_close = float(series.iloc[-2]) if len(series) >= 2 else current_price_orig
-            chart_dates = [d.strftime('%Y-%m-%d') for d in series.index]
-            chart_prices = [float(p) * multiplier for p in series.tolist()]
-        else:
-            current_price_orig, prev_close = get_cached_price(asset)
-    except:
-        current_price_orig, prev_close = get_cached_price(asset)
-
-    qty, cost = asset_data['qty'], asset_data['cost']
+    if not series.empty:
+        chart_dates = [d.strftime('%Y-%m-%d') for d in series.index]
+        # Wykres w walucie raportowej po kursie z dnia notowania
+        ensure_fx_history([asset.currency, currency], chart_start)
+        chart_prices = convert(series.values, asset.currency, np.array(series.index, dtype='datetime64[D]'),
+                               target=currency).tolist()
+
+    # Koszt i zrealizowany wynik są w PLN (waluta rachunku) - do waluty raportowej po bieżącym kursie
+    to_reporting = reporting_rate(currency, rates)
+    qty, cost = asset_data['qty'], asset_data['cost'] * to_reporting
     if current_price_orig <= 0: current_price_orig = (cost / qty) if qty > 0 else 0
     cur_val_pln = qty * current_price_orig * multiplier
-    total_gain = (cur_val_pln - cost) + asset_data['realized']
+    total_gain = (cur_val_pln - cost) + asset_data['realized'] * to_reporting
     day_change_pln = (qty * (current_price_orig - prev_close)) * multiplier
 
     history_table = []
@@ -309,7 +352,7 @@ def get_asset_details_context(user, symbol, portfolio_id=None):
         'gain_percent': fmt_2((total_gain / cost * 100) if cost > 0 else 0),
         'gain_percent_raw': (total_gain / cost * 100) if cost > 0 else 0,
         'total_gain_pln': fmt_2(total_gain), 'total_gain_pln_raw': total_gain,
-        'current_price': fmt_2(current_price_orig * multiplier), 'currency_sym': 'PLN',
+        'current_price': fmt_2(current_price_orig * multiplier), 'currency_sym': currency,
         'day_change_pct': fmt_2(((current_price_orig - prev_close) / prev_close * 100) if prev_close > 0 else 0),
         'day_change_pln': fmt_2(day_change_pln), 'transactions': reversed(history_table),
         'chart_dates': chart_dates, 'chart_prices': chart_prices, 'chart_point_colors': chart_colors,
@@ -328,7 +371,8 @@ def get_assets_view_context(user, portfolio_id=None):
                                           'tile_value_str': "0.00"}
 
     rates = get_current_currency_rates()
-    stats = analyze_holdings(transactions, rates)
+    currency = reporting_currency(get_portfolio_by_id(user, portfolio_id) if portfolio_id else None)
+    stats = stats_in_currency(analyze_holdings(transactions, rates), currency, rates)
     day_pln = stats['day_change_pln']
     prev_val = stats['total_value'] - day_pln
 
@@ -339,7 +383,7 @@ def get_assets_view_context(user, portfolio_id=None):
         'tile_return_pct_raw': (stats['total_profit'] / stats['invested'] * 100) if stats['invested'] > 0 else 0,
         'tile_day_pln_str': fmt_2(day_pln),
         'tile_day_pct_str': fmt_2((day_pln / prev_val * 100) if prev_val > 0.01 else 0),
-        'tile_twr': "0.00", 'tile_mwr': "0.00", 'rates': rates
+        'tile_twr': "0.00", 'tile_mwr': "0.00", 'rates': rates, 'currency': currency
     }
     enrich_assets_context(context, stats['assets'], stats['total_value'])
     return context
\ No newline at end of file
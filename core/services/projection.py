@@ -0,0 +1,182 @@
+# core/services/projection.py
+
+import logging
+from datetime import date, datetime
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Sum, Q, Value, DecimalField
+from django.db.models.functions import Coalesce
+from ..models import Transaction
+from .snapshot import get_portfolio_snapshot
+from .tax_engine import TAX_RATE
+from .instrumentation import timed
+from core.config import DEPOSIT_LIMITS, LIMIT_GROWTH_YEARLY, EXIT_TAX_RATE
+
+logger = logging.getLogger('core')
+
+PROJECTION_TTL = 3600
+
+# Ścieżki liczone paczkami - pamięć rośnie z CHUNK_PATHS, nie z liczbą ścieżek
+CHUNK_PATHS = 2000
+DEFAULT_PATHS = 20000
+DEFAULT_YEARS = 20
+MAX_YEARS = 50
+MAX_PATHS = 50000
+# Budżet ścieżek x lat na jedno żądanie (~0.5 s liczenia w requeście) - domyślna projekcja mieści się w całości,
+# przy dłuższym horyzoncie liczba ścieżek jest proporcjonalnie mniejsza
+MAX_PATH_YEARS = DEFAULT_PATHS * DEFAULT_YEARS
+
+PERCENTILES = [5, 25, 50, 75, 95]
+
+# Minimalna liczba dziennych stóp zwrotu, żeby rozkład historyczny miał sens
+MIN_RETURNS = 60
+
+
+def deposit_limit(portfolio_type, year):
+    """Limit wpłat na dany rok; lata bez ogłoszonego limitu - ekstrapolacja od ostatniego znanego."""
+    limits = DEPOSIT_LIMITS[portfolio_type]
+    if year in limits:
+        return limits[year]
+    last_year = max(limits)
+    if year < min(limits):
+        return limits[min(limits)]
+    return round(limits[last_year] * LIMIT_GROWTH_YEARLY ** (year - last_year), 2)
+
+
+def historical_daily_returns(timeline):
+    """
+    Dzienne stopy zwrotu z osi wyceny (jak TWR: przepływ na początku dnia = przyrost 'val_inv').
+    Zwraca (log-stopy, liczba okresów na rok).
+    """
+    values = np.asarray(timeline.get('val_user', []), dtype=float)
+    invested = np.asarray(timeline.get('val_inv', []), dtype=float)
+    dates = timeline.get('dates', [])
+    if len(values) < 2:
+        return np.array([]), 0.0
+
+    base = values[:-1] + np.diff(invested)
+    valid = base > 1.0
+    returns = values[1:][valid] / base[valid] - 1.0
+    # Dziury w notowaniach potrafią dać absurdalne skoki - obcinamy ogony
+    returns = np.clip(returns, -0.5, 0.5)
+
+    span_days = (datetime.strptime(dates[-1], "%Y-%m-%d") - datetime.strptime(dates[0], "%Y-%m-%d")).days
+    per_year = len(values[1:]) / (span_days / 365.25) if span_days > 0 else 252.0
+    return np.log1p(returns), per_year
+
+
+def _contributions(portfolio, year):
+    """Wpłaty netto (koszt IKE) i wpłaty w bieżącym roku - jedno zapytanie agregujące."""
+    zero = Value(0, output_field=DecimalField(max_digits=15, decimal_places=2))
+    agg = Transaction.objects.filter(portfolio=portfolio).aggregate(
+        deposits=Coalesce(Sum('amount', filter=Q(type='DEPOSIT')), zero),
+        withdrawals=Coalesce(Sum('amount', filter=Q(type='WITHDRAWAL')), zero),
+        ytd=Coalesce(Sum('amount', filter=Q(type='DEPOSIT', date__year=year)), zero),
+    )
+    net = max(0.0, float(agg['deposits']) - abs(float(agg['withdrawals'])))
+    return net, float(agg['ytd'])
+
+
+def simulate_paths(log_returns, per_year, start_value, deposits, first_year_fraction=1.0,
+                   paths=DEFAULT_PATHS, seed=42):
+    """
+    Monte Carlo (bootstrap dziennych stóp zwrotu): wartość portfela na koniec każdego roku.
+    deposits[i] - wpłata na początku roku i. Zwraca macierz paths x lata.
+    Liczone paczkami po CHUNK_PATHS ścieżek, żeby nie trzymać w pamięci wszystkich dni naraz.
+    """
+    rng = np.random.default_rng(seed)
+    steps = max(1, int(round(per_year)))
+    n_years = len(deposits)
+    out = np.empty((paths, n_years))
+
+    for start in range(0, paths, CHUNK_PATHS):
+        n = min(CHUNK_PATHS, paths - start)
+        value = np.full(n, float(start_value))
+        for i in range(n_years):
+            days = max(1, int(round(steps * first_year_fraction))) if i == 0 else steps
+            draws = log_returns[rng.integers(0, len(log_returns), size=(n, days))]
+            value = (value + deposits[i]) * np.exp(draws.sum(axis=1))
+            out[start:start + n, i] = value
+    return out
+
+
+def _bands(matrix):
+    pct = np.percentile(matrix, PERCENTILES, axis=0)
+    return {f"p{p}": np.round(row, 2).tolist() for p, row in zip(PERCENTILES, pct)}
+
+
+def clamp_paths(paths, years):
+    """Liczba ścieżek w granicach MAX_PATHS i budżetu MAX_PATH_YEARS dla danego horyzontu."""
+    return max(1, min(int(paths), MAX_PATHS, MAX_PATH_YEARS // max(int(years), 1)))
+
+
+def projection_cache_key(portfolio, years, yearly_deposit, paths, pit_rate):
+    return f"ike_projection_{portfolio.id}_v{portfolio.data_version}_{years}_{yearly_deposit}_{paths}_{pit_rate}"
+
+
+@timed('projection')
+def get_ike_projection(portfolio, years=DEFAULT_YEARS, yearly_deposit=None, paths=DEFAULT_PATHS, pit_rate=0.12):
+    """
+    Projekcja IKE/IKZE: pasma percentyli wartości, wartości netto po podatku przy wypłacie
+    i zaoszczędzonego podatku na koniec każdego roku.
+    yearly_deposit=None - średnia roczna wpłata z historii. Wpłaty zawsze przycinane do limitu roku.
+    pit_rate - stawka PIT użytkownika (ulga IKZE od wpłat).
+    Cache per wersja portfela i zestaw parametrów.
+    """
+    years = min(max(int(years), 1), MAX_YEARS)
+    paths = clamp_paths(paths, years)
+    key = projection_cache_key(portfolio, years, yearly_deposit, paths, pit_rate)
+    cached = cache.get(key)
+    if cached:
+        return cached
+
+    snapshot = get_portfolio_snapshot(portfolio)
+    if not snapshot:
+        return {'error': 'No transactions found.'}
+
+    log_returns, per_year = historical_daily_returns(snapshot['timeline'])
+    if len(log_returns) < MIN_RETURNS:
+        return {'error': 'Not enough valuation history for a projection.'}
+
+    today = date.today()
+    contributed, ytd = _contributions(portfolio, today.year)
+
+    if yearly_deposit is None:
+        # Średnio tyle, ile dotąd wpłacano rocznie
+        inv = snapshot['timeline']['val_inv']
+        yearly_deposit = max(0.0, inv[-1] / max(len(inv) / per_year, 1.0))
+
+    wrapper = portfolio.portfolio_type if portfolio.portfolio_type in DEPOSIT_LIMITS else 'IKE'
+    calendar = [today.year + i for i in range(years)]
+    deposits = np.array([
+        min(yearly_deposit, max(0.0, deposit_limit(wrapper, y) - (ytd if i == 0 else 0.0)))
+        for i, y in enumerate(calendar)
+    ])
+    first_year_fraction = (date(today.year, 12, 31) - today).days / 365.0
+
+    values = simulate_paths(log_returns, per_year, snapshot['stats']['total_value'], deposits,
+                            first_year_fraction, paths=paths)
+
+    # Kapitał wpłacony (deterministyczny) i podatki - wektorowo dla wszystkich ścieżek
+    contributions = contributed + np.cumsum(deposits)
+    gains = np.maximum(values - contributions, 0.0)
+    exit_tax = values * EXIT_TAX_RATE[wrapper]
+    tax_saved = gains * TAX_RATE - exit_tax
+    if wrapper == 'IKZE':
+        tax_saved = tax_saved + contributions * pit_rate
+
+    result = {
+        'portfolio_type': wrapper,
+        'years': calendar,
+        'paths': paths,
+        'yearly_deposit': round(float(yearly_deposit), 2),
+        'deposits': np.round(deposits, 2).tolist(),
+        'contributions': np.round(contributions, 2).tolist(),
+        'annual_return': round(float(np.expm1(log_returns.mean() * per_year)) * 100, 2),
+        'value': _bands(values),
+        'net_value': _bands(values - exit_tax),
+        'tax_saved': _bands(tax_saved),
+    }
+    cache.set(key, result, PROJECTION_TTL)
+    logger.info(f"PROJECTION: portfel {portfolio.id}, {paths} ścieżek x {years} lat")
+    return result
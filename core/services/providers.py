@@ -0,0 +1,151 @@
+# core/services/providers.py
+
+import re
+import zlib
+from datetime import date, timedelta
+from functools import lru_cache
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from django.conf import settings
+
+# Oś notowań dostawcy offline zaczyna się zawsze tego dnia - ta sama cena dla danego dnia niezależnie od zakresu zapytania
+FIXTURE_EPOCH = date(2000, 1, 3)
+FIXTURE_DAILY_VOL = 0.015
+_PERIOD_RE = re.compile(r'^(\d+)(d|wk|mo|y)$')
+_PERIOD_DAYS = {'d': 1, 'wk': 7, 'mo': 31, 'y': 366}
+
+
+class YahooProvider:
+    """Domyślny dostawca notowań: Yahoo Finance (yfinance)."""
+    name = 'yahoo'
+
+    def download(self, *args, **kwargs):
+        return yf.download(*args, **kwargs)
+
+    def ticker(self, symbol):
+        return yf.Ticker(symbol)
+
+
+class FixtureProvider:
+    """
+    Dostawca offline (profilowanie, benchmarki, testy): notowania z plików <ticker>.csv (kolumny Date, Close,
+    opcjonalnie Open/High/Low/Volume), a w ich braku deterministyczny błądzenie losowe z ziarnem z tickera.
+    Kształt wyniku jak yf.download(group_by='ticker'): kolumny (ticker, pole), indeks dni sesyjnych.
+    """
+    name = 'fixtures'
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory) if directory else None
+        self._series = {}
+
+    # --- API jak yfinance ---
+    def download(self, tickers, start=None, end=None, period=None, actions=False, **kwargs):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        end = pd.Timestamp(end or date.today() + timedelta(days=1))
+        if start is None:
+            start = end - pd.Timedelta(days=self._period_days(period or '1mo'))
+        start = pd.Timestamp(start)
+
+        frames = {}
+        for ticker in tickers:
+            frame = self._frame(ticker)
+            frame = frame[(frame.index >= start) & (frame.index < end)]
+            if actions:
+                frame = frame.assign(**{'Dividends': 0.0, 'Stock Splits': 0.0})
+            frames[ticker] = frame
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1)
+
+    def ticker(self, symbol):
+        return FixtureTicker(self, symbol)
+
+    # --- Notowania ---
+    def _frame(self, ticker):
+        frame = self._series.get(ticker)
+        if frame is None:
+            frame = self._series[ticker] = self._load(ticker)
+        return frame
+
+    def _load(self, ticker):
+        path = self.directory / f"{ticker}.csv" if self.directory else None
+        if path and path.exists():
+            frame = pd.read_csv(path, parse_dates=['Date'], index_col='Date').sort_index()
+            for column in ('Open', 'High', 'Low'):
+                if column not in frame:
+                    frame[column] = frame['Close']
+            if 'Volume' not in frame:
+                frame['Volume'] = 0
+            return frame[['Open', 'High', 'Low', 'Close', 'Volume']]
+
+        days = _fixture_days(date.today())
+        seed = zlib.crc32(ticker.encode())
+        rng = np.random.default_rng(seed)
+        close = self._base_price(ticker, seed) * np.exp(np.cumsum(rng.normal(0.0002, FIXTURE_DAILY_VOL, len(days))))
+        close = close.round(4)
+        return pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close,
+                             'Volume': rng.integers(1_000, 1_000_000, len(days))}, index=days)
+
+    @staticmethod
+    def _base_price(ticker, seed):
+        if ticker.endswith('=X'):
+            # Kurs walutowy: poziom z DEFAULT_CURRENCY_RATES (USDPLN=X -> USD), żeby przeliczenia miały sens
+            return getattr(settings, 'DEFAULT_CURRENCY_RATES', {}).get(ticker[:3], 1.0)
+        return 20.0 + seed % 480
+
+    @staticmethod
+    def _period_days(period):
+        match = _PERIOD_RE.match(period)
+        if not match:
+            return 365 * 30  # 'max'
+        return int(match.group(1)) * _PERIOD_DAYS[match.group(2)]
+
+
+@lru_cache(maxsize=2)
+def _fixture_days(today):
+    """Dni sesyjne od FIXTURE_EPOCH - wspólny indeks wszystkich tickerów (bdate_range jest kosztowny)."""
+    return pd.bdate_range(FIXTURE_EPOCH, today)
+
+
+class FixtureTicker:
+    """Odpowiednik yf.Ticker dla FixtureProvider: history() i info."""
+
+    def __init__(self, provider, symbol):
+        self.provider = provider
+        self.symbol = symbol
+
+    def history(self, period='1mo', **kwargs):
+        data = self.provider.download(self.symbol, period=period)
+        return data[self.symbol] if not data.empty else data
+
+    @property
+    def info(self):
+        closes = self.history(period='5d')['Close']
+        price = float(closes.iloc[-1]) if len(closes) else 0.0
+        prev = float(closes.iloc[-2]) if len(closes) >= 2 else price
+        return {'quoteType': 'EQUITY', 'currentPrice': price, 'regularMarketPrice': price,
+                'regularMarketPreviousClose': prev, 'longName': self.symbol, 'shortName': self.symbol}
+
+
+MARKET_PROVIDERS = {'yahoo': YahooProvider, 'fixtures': FixtureProvider}
+
+_provider = None
+
+
+def get_market_provider():
+    """Bieżący dostawca notowań (settings.MARKET_PROVIDER, domyślnie Yahoo)."""
+    global _provider
+    if _provider is None:
+        name = getattr(settings, 'MARKET_PROVIDER', 'yahoo')
+        _provider = FixtureProvider(getattr(settings, 'MARKET_FIXTURES_DIR', None)) if name == 'fixtures' \
+            else MARKET_PROVIDERS[name]()
+    return _provider
+
+
+def set_market_provider(provider):
+    """Podmiana dostawcy (profilowanie / benchmarki offline). Zwraca poprzedniego."""
+    global _provider
+    previous, _provider = get_market_provider(), provider
+    return previous
@@ -0,0 +1,78 @@
+# core/services/reporting.py
+
+import numpy as np
+from .fx import BASE_CURRENCY, cross_rate_matrix, ensure_fx_history, load_fx_series
+
+# Pola kwotowe (PLN) w wynikach analyze_holdings - przeliczane do waluty raportowej
+STATS_MONEY_FIELDS = ['total_value', 'invested', 'cash', 'total_profit', 'unrealized_profit', 'day_change_pln']
+ASSET_MONEY_FIELDS = ['value_pln', 'cost_pln', 'gain_pln', 'realized_pln', 'avg_price', 'day_change_pln']
+
+# Serie wartości na wykresie historii (procenty zostają bez zmian)
+TIMELINE_MONEY_SERIES = ['val_user', 'val_inv', 'val_sp', 'val_wig', 'val_acwi', 'val_inf']
+
+
+def reporting_currency(portfolio):
+    """Waluta raportowa portfela (Portfolio.currency); brak portfela = PLN."""
+    return (getattr(portfolio, 'currency', None) or BASE_CURRENCY).upper()
+
+
+def reporting_rate(currency, rates=None):
+    """Bieżący kurs PLN -> waluta raportowa (wiersz PLN macierzy kursów krzyżowych)."""
+    if currency == BASE_CURRENCY:
+        return 1.0
+    return float(cross_rate_matrix([BASE_CURRENCY, currency], rates=rates)[0, 1])
+
+
+def reporting_rates(currency, dates):
+    """Kursy PLN -> waluta raportowa na podane daty (as-of, z magazynu FxRate)."""
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    if currency == BASE_CURRENCY or not len(dates):
+        return np.ones(len(dates))
+    ensure_fx_history([currency], dates.min().astype(object))
+    series = load_fx_series([currency])
+    return cross_rate_matrix([BASE_CURRENCY, currency], dates, series=series)[:, 0, 1]
+
+
+def stats_in_currency(stats, currency, rates=None):
+    """
+    Wynik analyze_holdings w walucie raportowej: macierz kwot (aktywa x pola) razy bieżący kurs -
+    jedno mnożenie, bez ponownego liczenia lotów i cen. Zwraca kopię (oryginał bywa w cache).
+    """
+    if currency == BASE_CURRENCY or not stats:
+        return stats
+    rate = reporting_rate(currency, rates)
+    converted = dict(stats, **{f: stats[f] * rate for f in STATS_MONEY_FIELDS if f in stats})
+
+    assets = [dict(a) for a in stats.get('assets', [])]
+    if assets:
+        matrix = np.array([[a.get(f, 0.0) or 0.0 for f in ASSET_MONEY_FIELDS] for a in assets], dtype=float) * rate
+        for a, row in zip(assets, matrix):
+            a.update(zip(ASSET_MONEY_FIELDS, row.tolist()))
+    converted['assets'] = assets
+    return converted
+
+
+def timeline_in_currency(timeline, currency):
+    """
+    Historia wartości w walucie raportowej: serie (serie x dni) razy kurs z każdego dnia - jedno mnożenie
+    z broadcastingiem. Wartość z dnia D wyrażona po kursie z dnia D.
+    """
+    if currency == BASE_CURRENCY or not timeline or not timeline.get('dates'):
+        return timeline
+    series = [s for s in TIMELINE_MONEY_SERIES if len(timeline.get(s) or []) == len(timeline['dates'])]
+    rates = reporting_rates(currency, np.array(timeline['dates'], dtype='datetime64[D]'))
+    values = np.array([timeline[s] for s in series], dtype=float) * rates[None, :]
+
+    converted = dict(timeline)
+    for name, row in zip(series, values.round(2)):
+        converted[name] = row.tolist()
+    return converted
+
+
+def tax_years_in_currency(years, currency, fields):
+    """Wiersze roczne raportu podatkowego w walucie raportowej - po kursie z 31 grudnia danego roku."""
+    if currency == BASE_CURRENCY or not years:
+        return years
+    rates = reporting_rates(currency, np.array([f"{y['year']}-12-31" for y in years], dtype='datetime64[D]'))
+    values = np.array([[float(y[f]) for f in fields] for y in years]) * rates[:, None]
+    return [dict(y, **dict(zip(fields, row.tolist()))) for y, row in zip(years, values)]
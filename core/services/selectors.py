@@ -1,6 +1,6 @@
 # core/selectors.py
 
-from django.db.models import QuerySet
+from django.db.models import QuerySet, Sum, Case, When, F
 from ..models import Portfolio, Transaction, Asset
 
 
@@ -12,18 +12,16 @@ def get_active_portfolio(request):
     user = request.user
     user_portfolios = Portfolio.objects.filter(user=user).order_by('id')
 
-    if not user_portfolios.exists():
-        new_p = Portfolio.objects.create(user=user, name="My IKE", portfolio_type='IKE')
-        request.session['active_portfolio_id'] = new_p.id
-        return new_p
-
+    # Typowa ścieżka (portfel w sesji) to jedno zapytanie - bez osobnego exists()
     active_id = request.session.get('active_portfolio_id')
     if active_id:
         p = user_portfolios.filter(id=active_id).first()
         if p: return p
 
-    # Fallback: pierwszy dostępny
+    # Fallback: pierwszy dostępny, a gdy użytkownik nie ma portfela - nowy domyślny
     first_p = user_portfolios.first()
+    if first_p is None:
+        first_p = Portfolio.objects.create(user=user, name="My IKE", portfolio_type='IKE')
     request.session['active_portfolio_id'] = first_p.id
     return first_p
 
@@ -43,11 +41,11 @@ def get_portfolio_by_id(user, portfolio_id) -> Portfolio:
 def get_transactions(user, portfolio_id=None) -> QuerySet[Transaction]:
     """
     Zwraca transakcje dla konkretnego portfela LUB wszystkich portfeli usera.
-    Posortowane chronologicznie.
+    Posortowane chronologicznie, z aktywem w tym samym zapytaniu (kalkulator i tabele czytają t.asset).
     """
     if portfolio_id:
-        return Transaction.objects.filter(portfolio_id=portfolio_id).order_by('date')
-    return Transaction.objects.filter(portfolio__user=user).order_by('date')
+        return Transaction.objects.filter(portfolio_id=portfolio_id).select_related('asset').order_by('date')
+    return Transaction.objects.filter(portfolio__user=user).select_related('asset').order_by('date')
 
 
 def get_asset_by_symbol(symbol: str) -> Asset:
@@ -56,6 +54,18 @@ def get_asset_by_symbol(symbol: str) -> Asset:
         return Asset.objects.get(symbol=symbol)
     except Asset.DoesNotExist:
         return None
+
+
+def get_held_assets() -> QuerySet[Asset]:
+    """Aktywa z otwartą pozycją (BUY - SELL > 0) w dowolnym portfelu - jeden GROUP BY w bazie."""
+    held_ids = (Transaction.objects.filter(type__in=['BUY', 'SELL'], asset__isnull=False)
+                .values('asset_id')
+                .annotate(qty=Sum(Case(When(type='SELL', then=-F('quantity')), default=F('quantity'))))
+                .filter(qty__gt=0.0001)
+                .values('asset_id'))
+    return Asset.objects.filter(id__in=held_ids).order_by('symbol')
+
+
 def get_all_assets():
     """Zwraca wszystkie aktywa posortowane po symbolu."""
     return Asset.objects.all().order_by('symbol')
\ No newline at end of file
@@ -0,0 +1,74 @@
+# core/services/snapshot.py
+
+import logging
+from django.core.cache import cache
+from django.db.models import F
+from ..models import Portfolio, Transaction
+from .market import get_current_currency_rates
+from .analytics import analyze_holdings, analyze_history
+from .performance import PerformanceCalculator
+
+logger = logging.getLogger('core')
+
+# Ceny w holdings są ważne 15 min (jak cache cen w market.py)
+SNAPSHOT_TTL = 900
+
+
+def bump_portfolio_version(portfolio):
+    """
+    Oznacza dane pochodne portfela jako nieaktualne (inkrementacja data_version).
+    Wołamy RAZ po każdej operacji zapisu (import, ręczna transakcja, usunięcie), nie per wiersz.
+    """
+    Portfolio.objects.filter(id=portfolio.id).update(data_version=F('data_version') + 1)
+    portfolio.refresh_from_db(fields=['data_version'])
+    return portfolio.data_version
+
+
+def snapshot_cache_key(portfolio):
+    return f"portfolio_snapshot_{portfolio.id}_v{portfolio.data_version}"
+
+
+def get_portfolio_snapshot(portfolio, rates=None):
+    """
+    Zwraca wspólne dane pochodne portfela: holdings (analyze_holdings), timeline (analyze_history)
+    i metryki all-time. Wynik jest cache'owany per wersja portfela, więc dashboard, holdings
+    i podatki liczą to raz zamiast każdy osobno.
+    """
+    key = snapshot_cache_key(portfolio)
+    cached = cache.get(key)
+    if cached:
+        return cached
+
+    transactions = Transaction.objects.filter(portfolio=portfolio).select_related('asset').order_by('date')
+    if not transactions.exists():
+        return None
+
+    if rates is None:
+        rates = get_current_currency_rates()
+
+    stats = analyze_holdings(transactions, rates)
+    timeline = analyze_history(transactions, rates)
+
+    perf = PerformanceCalculator(transactions)
+    metrics = perf.calculate_metrics(timeline_data=timeline, current_total_value=stats['total_value'])
+    metrics['twr'] = perf.calculate_twr(timeline)
+
+    snapshot = {'stats': stats, 'timeline': timeline, 'metrics': metrics, 'version': portfolio.data_version}
+    cache.set(key, snapshot, SNAPSHOT_TTL)
+    return snapshot
+
+
+def refresh_portfolio_snapshot(portfolio):
+    """
+    Jedno przeliczenie po zakończonym zapisie: nowa wersja + od razu policzony snapshot,
+    żeby przekierowanie na dashboard trafiło w gotowe dane.
+    Działa między procesami tylko przy wspólnym cache (CACHE_DIR) - z domyślnym LocMemCache snapshot
+    ma tylko bieżący proces, a inny worker gunicorna policzy go przy pierwszym wejściu jeszcze raz.
+    """
+    bump_portfolio_version(portfolio)
+    try:
+        return get_portfolio_snapshot(portfolio)
+    except Exception as e:
+        # Import nie może się wywrócić przez błąd rynku - dashboard policzy snapshot sam
+        logger.warning(f"Snapshot refresh failed for portfolio {portfolio.id}: {e}")
+        return None
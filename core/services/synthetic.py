@@ -0,0 +1,195 @@
+# core/services/synthetic.py
+
+import io
+import random
+import time
+from datetime import date, datetime, timedelta
+import pandas as pd
+from core.config import SUFFIX_MAP
+
+# Kolumny raportu XTB "Cash Operations" (w tej kolejności są w eksporcie)
+XTB_CASH_HEADER = ['ID', 'Type', 'Time', 'Symbol', 'Comment', 'Amount']
+
+# Warianty zapisu CSV spotykane w eksportach: (kodowanie, separator, przecinek dziesiętny)
+CSV_VARIANTS = {
+    'csv-utf16-tab': ('utf-16', '\t', False),
+    'csv-utf8-semicolon': ('utf-8-sig', ';', True),
+    'csv-utf8-comma': ('utf-8', ',', False),
+    'csv-cp1250-semicolon': ('cp1250', ';', True),
+}
+FILE_FORMATS = list(CSV_VARIANTS) + ['xlsx']
+
+# Udział typów operacji (poza wpłatami, które generujemy regularnie)
+OPERATION_WEIGHTS = {'buy': 0.55, 'sell': 0.2, 'dividend': 0.15, 'fee': 0.05, 'withdrawal': 0.05}
+
+# Pierwsze ID operacji - XTB używa długich liczb rosnących w czasie
+FIRST_ID = 500000000
+
+
+def synthetic_symbols(count, suffixes=None, seed=42):
+    """Lista symboli w notacji XTB (np. 'ABC.PL'), z sufiksami giełd z SUFFIX_MAP."""
+    suffixes = suffixes or list(SUFFIX_MAP)
+    rng = random.Random(seed)
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    symbols, seen = [], set()
+    while len(symbols) < count:
+        base = ''.join(rng.choice(letters) for _ in range(rng.randint(3, 4)))
+        sym = f"{base}{suffixes[len(symbols) % len(suffixes)]}"
+        if sym not in seen:
+            seen.add(sym)
+            symbols.append(sym)
+    return symbols
+
+
+def suffixes_for_currencies(currencies):
+    """Po jednym sufiksie giełdy (SUFFIX_MAP) na walutę notowań - np. ['PLN', 'USD'] -> ['.PL', '.US']."""
+    suffixes = {}
+    for suffix, rule in SUFFIX_MAP.items():
+        suffixes.setdefault(rule['default_currency'], suffix)
+    unknown = [c for c in currencies if c.upper() not in suffixes]
+    if unknown:
+        raise ValueError(f"Brak giełdy w SUFFIX_MAP dla walut: {', '.join(unknown)}")
+    return [suffixes[c.upper()] for c in currencies]
+
+
+def generate_xtb_cash_operations(rows=1000, symbols=20, suffixes=None, start=None, end=None, seed=42):
+    """
+    Generuje realistyczną historię Cash Operations jako DataFrame (kolumny XTB_CASH_HEADER).
+    - ceny każdego symbolu to błądzenie losowe, ilości ułamkowe (jak w XTB),
+    - sprzedaż tylko z posiadanych pozycji ('CLOSE BUY x/y @ p'),
+    - gotówka nie spada poniżej zera - brak środków wymusza wpłatę.
+    Wynik jest deterministyczny dla danego seed.
+    """
+    rng = random.Random(seed)
+    end = end or date.today()
+    start = start or end - timedelta(days=5 * 365)
+    symbol_list = synthetic_symbols(symbols, suffixes, seed)
+
+    prices = {s: rng.uniform(10, 500) for s in symbol_list}
+    held = {s: 0.0 for s in symbol_list}
+    cash = 0.0
+
+    # Czas rośnie równomiernie przez zadany okres, z losowym odchyleniem w ramach kroku
+    span = (datetime.combine(end, datetime.min.time()) - datetime.combine(start, datetime.min.time())).total_seconds()
+    step = span / max(rows, 1)
+    t0 = datetime.combine(start, datetime.min.time()) + timedelta(hours=9)
+
+    kinds, weights = list(OPERATION_WEIGHTS), list(OPERATION_WEIGHTS.values())
+    out = []
+
+    def emit(ts, type_name, symbol, comment, amount):
+        out.append([FIRST_ID + len(out), type_name, ts.strftime('%Y-%m-%d %H:%M:%S'), symbol, comment, round(amount, 2)])
+
+    while len(out) < rows:
+        ts = t0 + timedelta(seconds=len(out) * step + rng.uniform(0, step * 0.5))
+        kind = rng.choices(kinds, weights)[0]
+        symbol = rng.choice(symbol_list)
+        prices[symbol] = max(1.0, prices[symbol] * (1 + rng.gauss(0.001, 0.03)))
+        price = round(prices[symbol], 2)
+
+        if kind == 'sell' and held[symbol] <= 0:
+            kind = 'buy'
+        if kind in ('buy', 'fee', 'withdrawal') and cash < price * 2:
+            kind = 'deposit'
+
+        if kind == 'deposit':
+            amount = rng.choice([500, 1000, 2000, 5000])
+            cash += amount
+            emit(ts, 'Deposit', '', 'BLIK deposit', amount)
+        elif kind == 'buy':
+            qty = round(rng.uniform(0.1, min(cash * 0.5 / price, 50)), 4)
+            cost = qty * price
+            cash -= cost
+            held[symbol] += qty
+            emit(ts, 'Stock purchase', symbol, f"OPEN BUY {qty} @ {price}", -cost)
+        elif kind == 'sell':
+            total = held[symbol]
+            qty = round(total if rng.random() < 0.4 else total * rng.uniform(0.1, 0.9), 4)
+            if qty <= 0:
+                continue
+            held[symbol] = max(0.0, total - qty)
+            cash += qty * price
+            emit(ts, 'Stock sale', symbol, f"CLOSE BUY {qty}/{round(total, 4)} @ {price}", qty * price)
+        elif kind == 'dividend':
+            if held[symbol] <= 0:
+                continue
+            gross = held[symbol] * price * rng.uniform(0.005, 0.02)
+            cash += gross * 0.81
+            emit(ts, 'DIVIDENT', symbol, f"{symbol} USD {round(gross / held[symbol], 4)}/ SHR", gross)
+            if len(out) < rows:
+                emit(ts, 'Withholding tax', symbol, f"{symbol} USD WHT 19%", -gross * 0.19)
+        elif kind == 'fee':
+            fee = round(rng.uniform(1, 10), 2)
+            cash -= fee
+            emit(ts, 'SEC fee', symbol, 'Commission', -fee)
+        else:
+            amount = round(cash * rng.uniform(0.1, 0.3), 2)
+            cash -= amount
+            emit(ts, 'Withdrawal', '', 'Transfer out', -amount)
+
+    return pd.DataFrame(out[:rows], columns=XTB_CASH_HEADER)
+
+
+def write_xtb_csv(df, variant='csv-utf16-tab', preamble=True):
+    """Serializuje ramkę do bajtów CSV w wybranym wariancie (CSV_VARIANTS)."""
+    encoding, sep, decimal_comma = CSV_VARIANTS[variant]
+    body = df.to_csv(sep=sep, index=False, decimal=',' if decimal_comma else '.', lineterminator='\n')
+    if preamble:
+        # Eksporty XTB zaczynają się od kilku wierszy opisu rachunku
+        body = f"Account{sep}12345678\nCurrency{sep}PLN\n\n" + body
+    return body.encode(encoding)
+
+
+def write_xtb_xlsx(df):
+    """Skoroszyt jak w raporcie XTB: arkusz 'CASH OPERATION HISTORY' z nagłówkiem pod wierszami opisu."""
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf) as writer:
+        pd.DataFrame([['Account', 12345678], ['Currency', 'PLN']]).to_excel(
+            writer, sheet_name='CASH OPERATION HISTORY', header=False, index=False)
+        df.to_excel(writer, sheet_name='CASH OPERATION HISTORY', index=False, startrow=3)
+    return buf.getvalue()
+
+
+def synthetic_xtb_file(df, file_format='csv-utf16-tab'):
+    """Plik w pamięci (BytesIO z .name) gotowy dla process_xtb_file()."""
+    if file_format == 'xlsx':
+        data, name = write_xtb_xlsx(df), 'synthetic_cash_operations.xlsx'
+    else:
+        data, name = write_xtb_csv(df, file_format), 'synthetic_cash_operations.csv'
+    f = io.BytesIO(data)
+    f.name = name
+    return f
+
+
+def synthetic_assets(symbols):
+    """Słowniki pól Asset dla symboli syntetycznych (żeby import nie pytał Yahoo o metadane)."""
+    assets = []
+    for sym in symbols:
+        suffix = next((s for s in SUFFIX_MAP if sym.endswith(s)), None)
+        rule = SUFFIX_MAP.get(suffix, {'yahoo_suffix': '', 'default_currency': 'PLN'})
+        base = sym[:-len(suffix)] if suffix else sym
+        assets.append({
+            'symbol': sym, 'yahoo_ticker': f"{base}{rule['yahoo_suffix'] or ''}",
+            'currency': rule['default_currency'], 'name': sym,
+        })
+    return assets
+
+
+def seed_synthetic_portfolio(user, trades, tickers=20, years=5, suffixes=None, seed=42, portfolio_type='STANDARD'):
+    """
+    Portfel z syntetyczną historią XTB (aktywa zakładane z góry - import nie pyta Yahoo o metadane).
+    Zwraca (portfolio, czas importu w s). Dla benchmarków i budżetu zapytań; wołać w transakcji z rollbackiem.
+    """
+    from core.models import Asset, Portfolio
+    from .importer import process_xtb_file
+
+    symbols = synthetic_symbols(tickers, suffixes, seed=seed)
+    known = set(Asset.objects.filter(symbol__in=symbols).values_list('symbol', flat=True))
+    Asset.objects.bulk_create([Asset(**a) for a in synthetic_assets(symbols) if a['symbol'] not in known])
+
+    portfolio = Portfolio.objects.create(user=user, name=f"Synthetic {trades}", portfolio_type=portfolio_type)
+    df = generate_xtb_cash_operations(rows=trades, symbols=tickers, suffixes=suffixes, seed=seed,
+                                      start=date.today() - timedelta(days=365 * years))
+    start = time.perf_counter()
+    process_xtb_file(synthetic_xtb_file(df), portfolio, recompute=False)
+    return portfolio, time.perf_counter() - start
@@ -0,0 +1,178 @@
+# core/services/tax_engine.py
+
+import csv
+import json
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+from .lots import sync_tax_ledger
+from .instrumentation import timed
+
+# Stawka podatku od zysków kapitałowych i dywidend (PIT-38)
+TAX_RATE = 0.19
+
+# Strata może być odliczana przez 5 kolejnych lat, maks. 50% straty pierwotnej w jednym roku
+LOSS_CARRY_YEARS = 5
+LOSS_YEARLY_LIMIT = 0.5
+
+TAX_REPORT_TTL = 3600
+
+# Pola wejściowe z TaxYearResult (wynik roku przed odliczeniem strat)
+INPUT_FIELDS = ['revenue', 'cost', 'income', 'div_gross', 'div_tax_paid']
+
+# Kolumny eksportu PIT-38 (CSV/JSON), w tej kolejności
+PIT38_COLUMNS = [
+    'portfolio_id', 'portfolio', 'user', 'year',
+    'revenue', 'cost', 'income', 'loss_deducted', 'tax_base', 'stock_tax',
+    'div_gross', 'div_tax_due', 'div_tax_paid', 'div_tax_topup', 'total_tax_due', 'is_frozen',
+]
+
+
+def carry_forward_losses(income):
+    """
+    Odliczenia strat z lat ubiegłych dla macierzy dochodów P x Y (wiersze = portfele,
+    kolumny = kolejne lata kalendarzowe bez luk). Rok po roku (strata zależy od wcześniejszych
+    odliczeń), ale każdy krok jest wektorowy po wszystkich portfelach naraz.
+    Limit: 50% straty PIERWOTNEJ rocznie, nie więcej niż zostało i niż dochód danego roku.
+    """
+    income = np.asarray(income, dtype=float)
+    original = np.where(income < 0, -income, 0.0)
+    available = original.copy()
+    deducted = np.zeros_like(income)
+
+    for j in range(income.shape[1]):
+        need = np.maximum(income[:, j], 0.0)
+        for k in range(max(0, j - LOSS_CARRY_YEARS), j):
+            take = np.maximum(np.minimum(np.minimum(original[:, k] * LOSS_YEARLY_LIMIT, available[:, k]), need), 0.0)
+            available[:, k] -= take
+            need -= take
+            deducted[:, j] += take
+    return deducted
+
+
+def compute_pit38(arrays):
+    """
+    Wszystkie kwoty PIT-38 dla macierzy P x Y naraz.
+    arrays: {pole z INPUT_FIELDS: macierz P x Y}. Zwraca słownik macierzy (wejście + wyliczone pola).
+    """
+    out = {k: np.asarray(v, dtype=float) for k, v in arrays.items()}
+    out['loss_deducted'] = carry_forward_losses(out['income'])
+    out['tax_base'] = np.maximum(out['income'] - out['loss_deducted'], 0.0)
+    out['stock_tax'] = np.round(out['tax_base'] * TAX_RATE, 2)
+    out['div_tax_due'] = np.round(out['div_gross'] * TAX_RATE, 2)
+    out['div_tax_topup'] = np.maximum(out['div_tax_due'] - out['div_tax_paid'], 0.0)
+    out['total_tax_due'] = out['stock_tax'] + out['div_tax_topup']
+    return out
+
+
+def loss_capacity(report, year):
+    """
+    Ile strat z lat ubiegłych da się odliczyć w roku `year` przy dowolnie wysokim dochodzie
+    (suma limitów 50% z 5 lat minus to, co już odliczono wcześniej). Ten sam algorytm co raport,
+    rok `year` dostaje nieskończony dochód.
+    """
+    incomes = {r['year']: r['income'] for r in report['years'] if r['year'] < year}
+    if not incomes:
+        return 0.0
+    axis = range(min(incomes), year + 1)
+    row = np.array([[incomes.get(y, 0.0) if y < year else np.inf for y in axis]])
+    return float(carry_forward_losses(row)[0, -1])
+
+
+def _year_axis(results_per_portfolio):
+    years = {r.year for results in results_per_portfolio for r in results}
+    if not years:
+        return []
+    return list(range(min(years), max(years) + 1))
+
+
+def build_tax_reports(portfolios, combine=False):
+    """
+    Raporty PIT-38 dla wielu portfeli jednym przebiegiem silnika.
+    Księga lotów jest synchronizowana przyrostowo (zamrożone lata nie są przeliczane).
+    combine=True: jeden raport z sumy portfeli (np. wszystkie portfele użytkownika).
+    Zwraca listę raportów {'portfolio_id', 'years': [wiersz roczny, ...]} w kolejności portfeli.
+    """
+    results = [sync_tax_ledger(p) for p in portfolios]
+    years = _year_axis(results)
+    if not years:
+        return [{'portfolio_id': p.id, 'years': []} for p in portfolios]
+
+    col = {y: j for j, y in enumerate(years)}
+    shape = (len(portfolios), len(years))
+    arrays = {f: np.zeros(shape) for f in INPUT_FIELDS}
+    present = np.zeros(shape, dtype=bool)
+    frozen = np.zeros(shape, dtype=bool)
+    for i, rows in enumerate(results):
+        for r in rows:
+            j = col[r.year]
+            for f in INPUT_FIELDS:
+                arrays[f][i, j] = float(getattr(r, f))
+            present[i, j] = True
+            frozen[i, j] = r.is_frozen
+
+    if combine:
+        arrays = {f: a.sum(axis=0, keepdims=True) for f, a in arrays.items()}
+        present = present.any(axis=0, keepdims=True)
+        frozen = frozen.any(axis=0, keepdims=True)
+        owners = [None]
+    else:
+        owners = [p.id for p in portfolios]
+
+    out = compute_pit38(arrays)
+    fields = INPUT_FIELDS + ['loss_deducted', 'tax_base', 'stock_tax', 'div_tax_due', 'div_tax_topup', 'total_tax_due']
+
+    reports = []
+    for i, owner in enumerate(owners):
+        rows = [
+            dict({f: round(float(out[f][i, j]), 2) for f in fields}, year=y, is_frozen=bool(frozen[i, j]))
+            for j, y in enumerate(years) if present[i, j]
+        ]
+        reports.append({'portfolio_id': owner, 'years': rows})
+    return reports
+
+
+def tax_report_cache_key(portfolios):
+    # Rok bieżący w kluczu - po Nowym Roku poprzedni rok staje się zamrożony
+    versions = '_'.join(f"{p.id}v{p.data_version}" for p in portfolios)
+    return f"tax_report_{versions}_{timezone.now().year}"
+
+
+@timed('taxes')
+def get_tax_report(portfolios):
+    """
+    Strukturalny raport PIT-38 (suma podanych portfeli), cache'owany per wersja danych portfeli.
+    Wiersze roczne rosnąco, kwoty jako float - formatowanie zostaje po stronie widoku.
+    """
+    key = tax_report_cache_key(portfolios)
+    report = cache.get(key)
+    if report is None:
+        report = build_tax_reports(portfolios, combine=True)[0]
+        cache.set(key, report, TAX_REPORT_TTL)
+    return report
+
+
+# =========================================================
+# EKSPORT (CSV / JSON)
+# =========================================================
+
+def pit38_rows(portfolios, reports, year=None):
+    """Płaskie wiersze eksportu (PIT38_COLUMNS) dla listy portfeli i ich raportów."""
+    rows = []
+    for portfolio, report in zip(portfolios, reports):
+        for r in report['years']:
+            if year is not None and r['year'] != year:
+                continue
+            row = dict(r, portfolio_id=portfolio.id, portfolio=portfolio.name, user=portfolio.user.username)
+            rows.append({c: row[c] for c in PIT38_COLUMNS})
+    return rows
+
+
+def write_pit38(fh, rows, fmt='csv'):
+    """Zapisuje wiersze eksportu do otwartego pliku / HttpResponse."""
+    if fmt == 'json':
+        json.dump(rows, fh, indent=2, ensure_ascii=False)
+        return
+    writer = csv.DictWriter(fh, fieldnames=PIT38_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(rows)
@@ -1,34 +1,53 @@
 # core/services/taxes.py
 
-from .selectors import get_transactions
+from django.db.models import Sum, Value, DecimalField
+from django.db.models.functions import Coalesce
+from ..models import Transaction
+from .selectors import get_transactions, get_portfolio_by_id, get_user_portfolios
 from .analytics import analyze_holdings
 from .market import get_current_currency_rates
+from .snapshot import get_portfolio_snapshot
+from .tax_engine import get_tax_report
+from .fx import BASE_CURRENCY
+from .reporting import reporting_currency, reporting_rate, reporting_rates, tax_years_in_currency
 from core.config import fmt_2
 
+# Ile ostatnich sprzedaży pokazujemy w tabeli zdarzeń podatkowych
+TAX_EVENTS_LIMIT = 100
+
+# Kwoty w wierszach rocznych raportu - przeliczane do waluty raportowej
+TAX_MONEY_FIELDS = ['revenue', 'cost', 'income', 'loss_deducted', 'tax_base', 'stock_tax', 'div_gross',
+                    'div_tax_due', 'div_tax_paid', 'div_tax_topup', 'total_tax_due']
+
 
 def get_taxes_context(user, portfolio_id=None):
     transactions = get_transactions(user, portfolio_id)
-    if not transactions.exists():
+    first_tx = transactions.select_related('portfolio').first()
+    if first_tx is None:
         return {'error': 'No transactions found.'}
 
-    portfolio = transactions.first().portfolio
+    portfolio = get_portfolio_by_id(user, portfolio_id) if portfolio_id else first_tx.portfolio
     portfolio_type = portfolio.portfolio_type
-
-    rates = get_current_currency_rates()
-
-    # FIX: Przekazujemy cały słownik 'rates', zamiast rozbitych floatów.
-    # Wcześniej było: analyze_holdings(transactions, rates.get('EUR'), rates.get('USD')) -> To trafiało do start_date i powodowało błąd.
-    stats = analyze_holdings(transactions, rates)
-
-    current_value = stats['total_value']
+    # Podatek liczymy w PLN (PIT-38), stronę pokazujemy w walucie raportowej portfela
+    currency = reporting_currency(portfolio)
 
     if portfolio_type in ['IKE', 'IKZE']:
-        return _calculate_ike_tax_shield(transactions, current_value)
+        # Wartość bieżąca potrzebna tylko tarczy IKE - portfel STANDARD nie pyta rynku o ceny
+        if portfolio_id:
+            current_value = get_portfolio_snapshot(portfolio)['stats']['total_value']
+        else:
+            current_value = analyze_holdings(transactions, get_current_currency_rates())['total_value']
+        context = _calculate_ike_tax_shield(transactions.select_related('asset'), current_value,
+                                            rate=reporting_rate(currency))
     else:
-        return _calculate_standard_tax_report(transactions)
+        portfolios = [portfolio] if portfolio_id else list(get_user_portfolios(user))
+        context = _calculate_standard_tax_report(portfolios, currency)
+    context['currency'] = currency
+    return context
 
 
-def _calculate_ike_tax_shield(transactions, current_value):
+def _calculate_ike_tax_shield(transactions, current_value, rate=1.0):
+    """rate - bieżący kurs PLN -> waluta raportowa (podatek proporcjonalny, więc skalujemy wejścia)."""
     total_deposits = 0.0
     total_withdrawals = 0.0
     dividend_tax_saved = 0.0
@@ -43,6 +62,10 @@ def _calculate_ike_tax_shield(transactions, current_value):
             # Zakładamy 19% podatku Belki zaoszczędzonego na polskich dywidendach
             dividend_tax_saved += round(amt * 0.19, 2)
 
+    current_value *= rate
+    total_deposits, total_withdrawals, dividend_tax_saved = (
+        total_deposits * rate, total_withdrawals * rate, dividend_tax_saved * rate)
+
     # Koszt uzyskania przychodu (tylko wpłaty netto)
     cost_basis = max(0.0, total_deposits - total_withdrawals)
     total_gain = current_value - cost_basis
@@ -71,134 +94,57 @@ def _calculate_ike_tax_shield(transactions, current_value):
     }
 
 
-def _calculate_standard_tax_report(transactions):
-    # --- PASS 1: Calculate Raw Income/Loss per Year (FIFO) ---
-    years_db = {}
-    buy_queue = {}  # {symbol: [{'qty': 10, 'price': 100}, ...]}
-
-    # Sortujemy rosnąco, żeby zachować FIFO
-    sorted_trans = sorted(list(transactions), key=lambda x: x.date)
-
-    for t in sorted_trans:
-        year = t.date.year
-        if year not in years_db:
-            years_db[year] = {
-                'revenue': 0.0, 'cost': 0.0, 'income': 0.0,
-                'div_gross': 0.0, 'div_tax_paid': 0.0,
-                'loss_deducted': 0.0
-            }
+def _calculate_standard_tax_report(portfolios, currency=BASE_CURRENCY):
+    # Kwoty PIT-38 (FIFO, odliczanie strat, dopłata do dywidend) liczy silnik podatkowy,
+    # tutaj tylko przeliczenie do waluty raportowej (kurs z 31.12) i formatowanie - najnowszy rok na górze.
+    # Eksport PIT-38 zostaje w PLN.
+    report = get_tax_report(portfolios)
+    years = tax_years_in_currency(report['years'], currency, TAX_MONEY_FIELDS)
 
-        amt = float(t.amount)
-        qty = float(t.quantity)
-        sym = t.asset.symbol if t.asset else 'CASH'
-
-        if t.type == 'DIVIDEND':
-            years_db[year]['div_gross'] += amt
-        elif t.type == 'TAX':
-            years_db[year]['div_tax_paid'] += abs(amt)
-        elif t.type == 'CLOSE':
-            years_db[year]['income'] += amt
-        elif t.type == 'BUY':
-            if sym not in buy_queue: buy_queue[sym] = []
-            price_per_unit = abs(amt) / qty if qty > 0 else 0
-            buy_queue[sym].append({'qty': qty, 'price': price_per_unit})
-        elif t.type == 'SELL':
-            revenue = amt
-            cost_of_sold = 0.0
-            shares_needed = qty
-            if sym in buy_queue:
-                while shares_needed > 0 and buy_queue[sym]:
-                    batch = buy_queue[sym][0]
-                    if batch['qty'] > shares_needed:
-                        cost_of_sold += shares_needed * batch['price']
-                        batch['qty'] -= shares_needed
-                        shares_needed = 0
-                    else:
-                        cost_of_sold += batch['qty'] * batch['price']
-                        shares_needed -= batch['qty']
-                        buy_queue[sym].pop(0)
-
-            years_db[year]['revenue'] += revenue
-            years_db[year]['cost'] += cost_of_sold
-            years_db[year]['income'] += (revenue - cost_of_sold)
-
-    # --- PASS 2: Loss Carryforward Logic (AGRESYWNE ODLICZANIE) ---
-    # Zasada: Stratę można odliczyć w ciągu 5 kolejnych lat.
-    # Limit roczny: 50% STRATY PIERWOTNEJ (a nie pozostałej).
-
-    sorted_years = sorted(years_db.keys())
-
-    # Słownik dostępnych strat: {year: remaining_amount}
-    available_losses = {}
-    # Słownik strat pierwotnych (do limitu 50%): {year: original_amount}
-    original_losses = {}
-
-    for y in sorted_years:
-        raw_income = years_db[y]['income']
-
-        if raw_income < 0:
-            # Rejestrujemy nową stratę
-            loss_val = abs(raw_income)
-            available_losses[y] = loss_val
-            original_losses[y] = loss_val
-
-        elif raw_income > 0:
-            # Mamy zysk - szukamy strat z 5 poprzednich lat
-            deduction_limit = raw_income  # Tyle potrzebujemy odliczyć, żeby wyzerować podatek
-            total_deducted_now = 0.0
-
-            # Sprawdzamy lata wstecz (y-5 do y-1)
-            for past_year in range(y - 5, y):
-                if past_year in available_losses and available_losses[past_year] > 0:
-
-                    # LOGIKA AGRESYWNA:
-                    # Limit to 50% straty PIERWOTNEJ
-                    max_limit_for_year = original_losses[past_year] * 0.5
-
-                    # Ale nie możemy wziąć więcej, niż fizycznie zostało w worku
-                    actual_available = available_losses[past_year]
-
-                    # Ile bierzemy? Minimum z:
-                    # 1. Limitu ustawowego (50% pierwotnej)
-                    # 2. Tego co zostało (żeby nie zejść poniżej zera)
-                    # 3. Tego co potrzebujemy (żeby nie zrobić sztucznej straty w roku bieżącym)
-                    to_take = min(max_limit_for_year, actual_available, deduction_limit)
-
-                    if to_take > 0:
-                        available_losses[past_year] -= to_take
-                        total_deducted_now += to_take
-                        deduction_limit -= to_take
-
-                    if deduction_limit <= 0:
-                        break
-
-            years_db[y]['loss_deducted'] = total_deducted_now
-
-    # --- PASS 3: Final Report Generation ---
     report_list = []
-    for y in sorted(years_db.keys(), reverse=True):
-        d = years_db[y]
-
-        tax_base = max(0.0, d['income'] - d['loss_deducted'])
-
-        stock_tax = round(tax_base * 0.19, 2)
-        div_tax_total_due = round(d['div_gross'] * 0.19, 2)
-        div_tax_surcharge = max(0.0, div_tax_total_due - d['div_tax_paid'])
-
+    for d in reversed(years):
         report_list.append({
-            'year': y,
+            'year': d['year'],
             'stock_result': fmt_2(d['income']),
             'loss_deducted': fmt_2(d['loss_deducted']),
-            'tax_base': fmt_2(tax_base),
-            'stock_tax': fmt_2(stock_tax),
+            'tax_base': fmt_2(d['tax_base']),
+            'stock_tax': fmt_2(d['stock_tax']),
             'div_gross': fmt_2(d['div_gross']),
             'div_tax_paid': fmt_2(d['div_tax_paid']),
-            'div_tax_topup': fmt_2(div_tax_surcharge),
-            'total_tax_due': fmt_2(stock_tax + div_tax_surcharge)
+            'div_tax_topup': fmt_2(d['div_tax_topup']),
+            'total_tax_due': fmt_2(d['total_tax_due']),
+            'is_frozen': d['is_frozen']
         })
 
     return {
         'is_ike': False,
         'portfolio_type': 'STANDARD',
-        'report': report_list
-    }
\ No newline at end of file
+        'report': report_list,
+        'tax_rows': _taxable_events(portfolios, currency)
+    }
+
+
+def _taxable_events(portfolios, currency=BASE_CURRENCY):
+    """Ostatnie sprzedaże z kosztem wg FIFO - koszt z alokacji lotów, bez ponownego dopasowywania."""
+    sells = (Transaction.objects.filter(portfolio__in=portfolios, type='SELL')
+             .select_related('asset')
+             .annotate(cost=Coalesce(Sum('lot_allocations__cost_basis'), Value(0),
+                                     output_field=DecimalField(max_digits=15, decimal_places=4)))
+             .order_by('-date')[:TAX_EVENTS_LIMIT])
+    sells = list(sells)
+    # Kurs PLN -> waluta raportowa z dnia sprzedaży, dla wszystkich wierszy naraz
+    rates = reporting_rates(currency, [t.date.date() for t in sells])
+    rows = []
+    for t, rate in zip(sells, rates):
+        revenue, cost = float(t.amount) * rate, float(t.cost) * rate
+        profit = revenue - cost
+        rows.append({
+            'date': t.date.strftime('%Y-%m-%d'),
+            'symbol': t.asset.symbol if t.asset else 'CASH',
+            'revenue': fmt_2(revenue),
+            'cost': fmt_2(cost),
+            'profit': profit,
+            'profit_fmt': fmt_2(profit),
+            'tax': fmt_2(max(0.0, profit) * 0.19),
+        })
+    return rows
\ No newline at end of file
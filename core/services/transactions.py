@@ -0,0 +1,130 @@
+# core/services/transactions.py
+
+import base64
+import logging
+from datetime import date, datetime, time, timedelta
+from django.db.models import Q
+from django.utils import timezone
+from ..models import Asset, Transaction, TransactionType
+
+logger = logging.getLogger('core')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+FILTER_KEYS = ('type', 'symbol', 'date_from', 'date_to', 'q')
+
+
+def encode_cursor(tx):
+    """Kursor strony = klucz (date, id) ostatniego wiersza, nieprzezroczysty dla klienta."""
+    raw = f"{tx.date.isoformat()}|{tx.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(date, id) z kursora; ValueError przy zmienionym / uciętym kursorze."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        raw_date, raw_id = raw.split('|')
+        tx_date, tx_id = datetime.fromisoformat(raw_date), int(raw_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid page cursor.")
+    if timezone.is_naive(tx_date):
+        raise ValueError("Invalid page cursor.")
+    return tx_date, tx_id
+
+
+def _parse_day(value, label):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid {label} date (expected YYYY-MM-DD).")
+
+
+def parse_transaction_filters(params):
+    """
+    Filtry przeglądarki z query stringu: type, symbol, date_from / date_to (YYYY-MM-DD, włącznie), q (komentarz).
+    Puste pola są pomijane; ValueError przy nieznanym typie lub złej dacie.
+    """
+    filters = {key: params.get(key, '').strip() for key in FILTER_KEYS}
+    filters = {key: value for key, value in filters.items() if value}
+
+    if 'type' in filters:
+        filters['type'] = filters['type'].upper()
+        if filters['type'] not in TransactionType.values:
+            raise ValueError(f"Unknown transaction type: {filters['type']}.")
+    for key, label in (('date_from', 'from'), ('date_to', 'to')):
+        if key in filters:
+            filters[key] = _parse_day(filters[key], label)
+    if 'date_from' in filters and 'date_to' in filters and filters['date_from'] > filters['date_to']:
+        raise ValueError("Date 'from' is after date 'to'.")
+    return filters
+
+
+def filter_transactions(portfolio, filters):
+    """
+    Transakcje portfela po filtrach - każdy wariant ma indeks zaczynający się od portfela:
+    typ -> (portfolio, type, date), aktywo -> (portfolio, asset, date), reszta -> (portfolio, date).
+    Komentarz (icontains) nie ma indeksu - jest sprawdzany w trakcie przejścia po indeksie daty.
+    """
+    qs = Transaction.objects.filter(portfolio=portfolio)
+    if 'type' in filters:
+        qs = qs.filter(type=filters['type'])
+    if 'symbol' in filters:
+        # Id aktywa osobnym zapytaniem - JOIN po symbolu pozwoliłby planiście zacząć od tabeli aktywów
+        asset_id = Asset.objects.filter(symbol__iexact=filters['symbol']).values_list('id', flat=True).first()
+        if asset_id is None:
+            return qs.none()
+        qs = qs.filter(asset_id=asset_id)
+    if 'date_from' in filters:
+        qs = qs.filter(date__gte=timezone.make_aware(datetime.combine(filters['date_from'], time.min)))
+    if 'date_to' in filters:
+        qs = qs.filter(date__lt=timezone.make_aware(datetime.combine(filters['date_to'] + timedelta(days=1), time.min)))
+    if 'q' in filters:
+        qs = qs.filter(comment__icontains=filters['q'])
+    return qs
+
+
+def _row(tx):
+    asset = tx.asset
+    return {
+        'id': tx.id,
+        'date': timezone.localtime(tx.date).strftime('%Y-%m-%d %H:%M'),
+        'type': tx.type,
+        'symbol': asset.symbol if asset else None,
+        'asset': asset.display_name if asset else None,
+        'quantity': float(tx.quantity) if tx.quantity else None,
+        'price': float(tx.price) if tx.price is not None else None,
+        'amount': float(tx.amount),
+        'comment': tx.comment or '',
+        'xtb_id': tx.xtb_id,
+    }
+
+
+def browse_transactions(portfolio, filters=None, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Strona przeglądarki transakcji, od najnowszych. Stronicowanie kluczem (date, id) zamiast OFFSET:
+    kolejna strona zaczyna się za ostatnim wierszem poprzedniej, więc baza czyta zakres indeksu
+    o długości strony - strona 500 kosztuje tyle co pierwsza. Bez COUNT(*) z tego samego powodu.
+    """
+    try:
+        page_size = min(max(int(page_size), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid page size.")
+    qs = filter_transactions(portfolio, filters or {})
+
+    if cursor:
+        last_date, last_id = decode_cursor(cursor)
+        # date__lte daje planiście granicę zakresu indeksu; OR rozstrzyga remisy dat po id
+        qs = qs.filter(Q(date__lt=last_date) | Q(date=last_date, id__lt=last_id), date__lte=last_date)
+
+    # Jeden wiersz ponad stronę - czy jest następna, bez osobnego zapytania
+    page = list(qs.select_related('asset').order_by('-date', '-id')[:page_size + 1])
+    has_more = len(page) > page_size
+    page = page[:page_size]
+
+    return {
+        'rows': [_row(tx) for tx in page],
+        'has_more': has_more,
+        'next_cursor': encode_cursor(page[-1]) if has_more else None,
+        'page_size': page_size,
+    }
@@ -7,6 +7,9 @@ document.addEventListener('DOMContentLoaded', function() {
             catch (e) { console.error('JSON Error:', id); return []; }
         }
 
+        // Waluta raportowa portfela (kwoty na wykresach są już przeliczone)
+        const CURRENCY = document.getElementById('t-currency') ? gd('t-currency') : 'PLN';
+
         // --- CONFIGURATION ---
         const ChartDefaults = {
             font: {
@@ -97,7 +100,7 @@ document.addEventListener('DOMContentLoaded', function() {
                                     label: function(context) {
                                         let label = context.label || '';
                                         let value = context.raw;
-                                        return ` ${label}: ${value.toFixed(2)} PLN`;
+                                        return ` ${label}: ${value.toFixed(2)} ${CURRENCY}`;
                                     }
                                 }
                             }
@@ -156,7 +159,7 @@ document.addEventListener('DOMContentLoaded', function() {
         let mainChartInstance = null;
         const chartData = {
             dates: gd('t-dates'),
-            value: { label: 'PLN', user: gd('t-user'), inv: gd('t-inv'), points: gd('t-points'), wig: gd('t-wig'), sp500: gd('t-sp500'), acwi: gd('t-acwi') },
+            value: { label: CURRENCY, user: gd('t-user'), inv: gd('t-inv'), points: gd('t-points'), wig: gd('t-wig'), sp500: gd('t-sp500'), acwi: gd('t-acwi') },
             percent: { label: '%', user: gd('p-user'), wig: gd('p-wig'), sp500: gd('p-sp500'), acwi: gd('p-acwi'), inf: gd('p-inf') }
         };
 
@@ -205,7 +208,7 @@ document.addEventListener('DOMContentLoaded', function() {
                                     let label = context.dataset.label || '';
                                     let value = context.parsed.y;
                                     if (mode === 'value') {
-                                        return label + ': ' + value.toFixed(2) + ' PLN';
+                                        return label + ': ' + value.toFixed(2) + ' ' + CURRENCY;
                                     } else {
                                         return label + ': ' + value.toFixed(2) + '%';
                                     }
@@ -9,6 +9,7 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     const masterDates = getData('c-dates');
+    const currency = document.getElementById('c-currency') ? getData('c-currency') : 'PLN';
     const masterPrices = getData('c-prices');
     const masterColors = getData('c-colors');
     const masterRadius = getData('c-radius');
@@ -138,7 +139,7 @@ document.addEventListener('DOMContentLoaded', function() {
             data: {
                 labels: masterDates.slice(chartStartIndex),
                 datasets: [{
-                    label: 'Price (PLN)',
+                    label: `Price (${currency})`,
                     data: masterPrices.slice(chartStartIndex),
                     borderColor: '#00ff7f',
                     backgroundColor: gradient,
@@ -197,4 +198,24 @@ document.addEventListener('DOMContentLoaded', function() {
     };
 
     initChart();
-});
\ No newline at end of file
+});
+// NEWSY - ładowane osobno, strona nie czeka na RSS. 202 = pierwsze pobranie w tle, ponawiamy.
+document.addEventListener('DOMContentLoaded', function() {
+    const list = document.getElementById('newsList');
+    if (!list) return;
+
+    const MAX_ATTEMPTS = 6;
+    function load(attempt) {
+        fetch(list.dataset.url)
+            .then(r => r.text().then(html => ({ status: r.status, html: html })))
+            .then(res => {
+                if (res.status === 202 && attempt < MAX_ATTEMPTS) {
+                    setTimeout(() => load(attempt + 1), 1500 * attempt);
+                    return;
+                }
+                list.innerHTML = res.html;
+            })
+            .catch(() => { list.innerHTML = '<div class="text-center py-5 text-muted">News unavailable.</div>'; });
+    }
+    load(1);
+});
@@ -77,4 +77,32 @@ document.addEventListener('DOMContentLoaded', function() {
             });
         }
     }
+
+    // 3. PROGNOZA 12M (Bar)
+    const ctxForecast = document.getElementById('forecastChart');
+    if (ctxForecast) {
+        new Chart(ctxForecast, {
+            type: 'bar',
+            data: {
+                labels: getData('d-fc-lbl'),
+                datasets: [{
+                    label: 'Expected (gross)',
+                    data: getData('d-fc-val'),
+                    backgroundColor: 'rgba(0, 255, 127, 0.5)',
+                    borderColor: NEON_GREEN,
+                    borderWidth: 1,
+                    borderRadius: 4,
+                    barPercentage: 0.6
+                }]
+            },
+            options: {
+                responsive: true, maintainAspectRatio: false,
+                scales: {
+                    x: { grid: { display: false }, ticks: { color: '#888' } },
+                    y: { grid: { color: '#333', borderDash: [4, 4] }, ticks: { color: '#888' } }
+                },
+                plugins: { legend: { display: false } }
+            }
+        });
+    }
 });
\ No newline at end of file
@@ -0,0 +1,69 @@
+document.addEventListener('DOMContentLoaded', function() {
+    function getData(id) {
+        try { return JSON.parse(document.getElementById(id).textContent); }
+        catch (e) { return []; }
+    }
+
+    const SOFT_BLUE = '#42a5f5';
+    const NEON_GREEN = '#00ff7f';
+    const PALETTE = ['#00ff7f', '#42a5f5', '#ffca28', '#ab47bc', '#ef5350', '#26c6da', '#8d6e63'];
+
+    // 1. WARTOŚĆ WSZYSTKICH PORTFELI vs WPŁATY (Line)
+    const ctxValue = document.getElementById('householdChart');
+    if (ctxValue) {
+        new Chart(ctxValue, {
+            type: 'line',
+            data: {
+                labels: getData('h-dates'),
+                datasets: [{
+                    label: 'Total Value',
+                    data: getData('h-value'),
+                    borderColor: NEON_GREEN,
+                    backgroundColor: 'rgba(0, 255, 127, 0.08)',
+                    borderWidth: 2,
+                    fill: true,
+                    tension: 0.2,
+                    pointRadius: 0
+                }, {
+                    label: 'Invested',
+                    data: getData('h-invested'),
+                    borderColor: SOFT_BLUE,
+                    borderDash: [5, 5],
+                    borderWidth: 1.5,
+                    fill: false,
+                    stepped: true,
+                    pointRadius: 0
+                }]
+            },
+            options: {
+                responsive: true, maintainAspectRatio: false,
+                interaction: { mode: 'index', intersect: false },
+                scales: {
+                    x: { grid: { display: false }, ticks: { color: '#888', maxTicksLimit: 8 } },
+                    y: { grid: { color: '#333', borderDash: [4, 4] }, ticks: { color: '#888' } }
+                },
+                plugins: { legend: { labels: { color: '#ccc' } } }
+            }
+        });
+    }
+
+    // 2. UDZIAŁ PORTFELI (Doughnut)
+    const ctxAcc = document.getElementById('accountsChart');
+    if (ctxAcc) {
+        new Chart(ctxAcc, {
+            type: 'doughnut',
+            data: {
+                labels: getData('h-acc-lbl'),
+                datasets: [{
+                    data: getData('h-acc-val'),
+                    backgroundColor: PALETTE,
+                    borderWidth: 0
+                }]
+            },
+            options: {
+                responsive: true, maintainAspectRatio: false, cutout: '65%',
+                plugins: { legend: { position: 'bottom', labels: { color: '#ccc' } } }
+            }
+        });
+    }
+});
@@ -0,0 +1,69 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const ctx = document.getElementById('projectionChart');
+    const form = document.getElementById('projectionForm');
+    if (!ctx || !form) return;
+
+    const status = document.getElementById('projectionStatus');
+    const summary = document.getElementById('projectionSummary');
+    const MAIN_COLOR = '#00ff7f';
+    const BAND_COLOR = 'rgba(0, 255, 127, 0.12)';
+    const fmt = v => Math.round(v).toLocaleString('pl-PL');
+    let projectionChart = null;
+
+    function render(d) {
+        if (projectionChart) projectionChart.destroy();
+        const band = (data, label, fill) => ({
+            label: label, data: data, borderWidth: 0, pointRadius: 0,
+            backgroundColor: BAND_COLOR, fill: fill
+        });
+
+        projectionChart = new Chart(ctx, {
+            type: 'line',
+            data: {
+                labels: d.years,
+                datasets: [
+                    band(d.value.p95, 'P95', false),
+                    band(d.value.p5, 'P5', '-1'),
+                    band(d.value.p75, 'P75', false),
+                    band(d.value.p25, 'P25', '-1'),
+                    { label: 'Median', data: d.value.p50, borderColor: MAIN_COLOR, borderWidth: 2, pointRadius: 0, fill: false },
+                    { label: 'Contributions', data: d.contributions, borderColor: '#888', borderDash: [5, 5], borderWidth: 1, pointRadius: 0, fill: false }
+                ]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                interaction: { mode: 'index', intersect: false },
+                plugins: {
+                    legend: { labels: { color: '#e0e0e0', filter: item => !item.text.startsWith('P') } },
+                    tooltip: { callbacks: { label: c => `${c.dataset.label}: ${fmt(c.raw)} PLN` } }
+                },
+                scales: {
+                    x: { ticks: { color: '#e0e0e0' }, grid: { color: '#333' } },
+                    y: { ticks: { color: '#e0e0e0', callback: v => fmt(v) }, grid: { color: '#333' } }
+                }
+            }
+        });
+
+        const last = d.years.length - 1;
+        summary.innerHTML = `
+            <div class="col"><div class="text-muted">Median value ${d.years[last]}</div><div class="text-white fw-bold">${fmt(d.value.p50[last])} PLN</div></div>
+            <div class="col"><div class="text-muted">Range P5 - P95</div><div class="text-white fw-bold">${fmt(d.value.p5[last])} - ${fmt(d.value.p95[last])}</div></div>
+            <div class="col"><div class="text-muted">Median tax saved</div><div class="text-success fw-bold">${fmt(d.tax_saved.p50[last])} PLN</div></div>
+            <div class="col"><div class="text-muted">Yearly deposit</div><div class="text-white fw-bold">${fmt(d.yearly_deposit)} PLN</div></div>`;
+        status.textContent = `${d.paths.toLocaleString('pl-PL')} paths, historical annual return ${d.annual_return}%`;
+    }
+
+    function run() {
+        const params = new URLSearchParams(new FormData(form));
+        if (!params.get('deposit')) params.delete('deposit');
+        status.textContent = 'Running simulation...';
+        fetch(`${form.dataset.url}?${params}`)
+            .then(r => r.json())
+            .then(d => d.error ? (status.textContent = d.error) : render(d))
+            .catch(() => { status.textContent = 'Projection unavailable.'; });
+    }
+
+    form.addEventListener('submit', e => { e.preventDefault(); run(); });
+    run();
+});
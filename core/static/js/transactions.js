@@ -0,0 +1,79 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const table = document.getElementById('txTable');
+    const island = document.getElementById('tx-page');
+    if (!table || !island) return;
+
+    const tbody = table.querySelector('tbody');
+    const more = document.getElementById('txMore');
+    const status = document.getElementById('txStatus');
+    const fmt = v => v.toLocaleString('pl-PL', { minimumFractionDigits: 2, maximumFractionDigits: 2 });
+    const BADGES = {
+        DEPOSIT: ['DEP', 'bg-success bg-opacity-25 text-success'],
+        WITHDRAWAL: ['WITH', 'bg-secondary'],
+        BUY: ['BUY', 'bg-info bg-opacity-25 text-info'],
+        SELL: ['SELL', 'bg-warning bg-opacity-25 text-warning'],
+        CLOSE: ['CLOSE', 'bg-success bg-opacity-25 text-success'],
+        DIVIDEND: ['DIV', 'bg-primary bg-opacity-25 text-primary'],
+        TAX: ['TAX', 'bg-danger bg-opacity-25 text-danger']
+    };
+    let cursor = null;
+    let shown = 0;
+
+    // Komórki przez textContent - komentarze pochodzą z pliku brokera
+    function cell(text, className) {
+        const td = document.createElement('td');
+        td.className = className || '';
+        td.textContent = text;
+        return td;
+    }
+
+    function appendRows(rows) {
+        rows.forEach(r => {
+            const tr = document.createElement('tr');
+            const [label, badgeClass] = BADGES[r.type] || [r.type, 'bg-secondary'];
+            const badge = document.createElement('span');
+            badge.className = `badge ${badgeClass}`;
+            badge.textContent = label;
+            const typeCell = cell('');
+            typeCell.appendChild(badge);
+
+            tr.append(
+                cell(r.date, 'ps-4 text-white-50 text-nowrap'),
+                typeCell,
+                cell(r.asset || '--', r.asset ? 'text-white small' : 'text-muted small'),
+                cell(r.quantity !== null ? r.quantity.toLocaleString('pl-PL') : '', 'text-end'),
+                cell(r.price !== null ? fmt(r.price) : '', 'text-end'),
+                cell(fmt(r.amount), `text-end fw-bold ${r.amount > 0 ? 'text-success' : 'text-danger'}`),
+                cell(r.comment, 'pe-4 small text-muted')
+            );
+            tbody.appendChild(tr);
+        });
+    }
+
+    function render(page) {
+        appendRows(page.rows);
+        shown += page.rows.length;
+        cursor = page.next_cursor;
+        more.classList.toggle('d-none', !page.has_more);
+        if (!shown) {
+            tbody.innerHTML = '<tr><td colspan="7" class="text-center text-muted py-5">No transactions.</td></tr>';
+        }
+        status.textContent = shown ? `${shown} shown${page.has_more ? '' : ' (all)'}` : '';
+    }
+
+    function loadMore() {
+        // Te same filtry co strona, następna strona po kursorze
+        const params = new URLSearchParams(window.location.search);
+        params.set('cursor', cursor);
+        params.set('format', 'json');
+        more.disabled = true;
+        fetch(`${table.dataset.url}?${params}`)
+            .then(r => r.json())
+            .then(d => d.error ? (status.textContent = d.error) : render(d))
+            .catch(() => { status.textContent = 'Transactions unavailable.'; })
+            .finally(() => { more.disabled = false; });
+    }
+
+    more.addEventListener('click', loadMore);
+    render(JSON.parse(island.textContent));
+});
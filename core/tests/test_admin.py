@@ -0,0 +1,60 @@
+# core/tests/test_admin.py
+
+from datetime import date, datetime
+from decimal import Decimal
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+from core.models import Asset, CorporateAction, CorporateActionType, Portfolio, Transaction
+
+
+class AdminInvalidationTests(TestCase):
+    """Zapisy z admina podbijają data_version portfela - inaczej widoki serwują dane z cache do końca TTL."""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user(username='admin_invalidation')
+        cls.staff = User.objects.create_superuser(username='admin_staff', password='x')
+        cls.asset = Asset.objects.create(symbol='TSLA.US', yahoo_ticker='TSLA', name='Tesla', currency='USD')
+        cls.portfolio = Portfolio.objects.create(user=owner, name='A', portfolio_type='STANDARD')
+        cls.other = Portfolio.objects.create(user=owner, name='B', portfolio_type='STANDARD')
+        cls.buy = Transaction.objects.create(portfolio=cls.portfolio, asset=cls.asset, type='BUY', amount=-900,
+                                             quantity=3, price=300, date=timezone.make_aware(datetime(2022, 1, 3, 12)))
+
+    def setUp(self):
+        self.request = RequestFactory().post('/admin/')
+        self.request.user = self.staff
+
+    def _versions(self):
+        return dict(Portfolio.objects.values_list('name', 'data_version'))
+
+    def test_transaction_edit_and_delete_bump_version(self):
+        tx_admin = site._registry[Transaction]
+
+        self.buy.amount = Decimal('-950')
+        tx_admin.save_model(self.request, self.buy, None, True)
+        self.assertEqual(self._versions(), {'A': 1, 'B': 0})
+
+        # Przeniesienie do innego portfela - nieaktualne są oba
+        self.buy.portfolio = self.other
+        tx_admin.save_model(self.request, self.buy, None, True)
+        self.assertEqual(self._versions(), {'A': 2, 'B': 1})
+
+        tx_admin.delete_queryset(self.request, Transaction.objects.filter(pk=self.buy.pk))
+        self.assertEqual(self._versions(), {'A': 2, 'B': 2})
+
+    def test_split_from_admin_applied_to_transactions(self):
+        action_admin = site._registry[CorporateAction]
+        split = CorporateAction(asset=self.asset, action_type=CorporateActionType.SPLIT, date=date(2022, 8, 25), value=3)
+
+        action_admin.save_model(self.request, split, None, False)
+        self.buy.refresh_from_db()
+        self.assertEqual((self.buy.quantity, self.buy.split_factor), (Decimal(9), Decimal(3)))
+        self.assertEqual(self._versions()['A'], 1)
+
+        # Usunięty split zdejmowany z transakcji
+        action_admin.delete_model(self.request, split)
+        self.buy.refresh_from_db()
+        self.assertEqual((self.buy.quantity, self.buy.split_factor), (Decimal(3), Decimal(1)))
+        self.assertEqual(self._versions()['A'], 2)
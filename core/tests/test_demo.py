@@ -0,0 +1,47 @@
+# core/tests/test_demo.py
+
+from datetime import date, datetime
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from core.models import Asset, CorporateAction, CorporateActionType, Portfolio, Transaction
+from core.services.corporate_actions import apply_splits_to_transactions
+from core.services.demo import clone_demo_portfolio
+from core.services.providers import FixtureProvider, set_market_provider
+
+
+@override_settings(BACKGROUND_TASKS_ENABLED=False)
+class DemoCloneSplitTests(TestCase):
+    """Klon wzorca po splicie: wartości po splicie razem z split_factor - split nie może zadziałać dwa razy."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._previous_provider = set_market_provider(FixtureProvider())
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        set_market_provider(cls._previous_provider)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.asset = Asset.objects.create(symbol='NVDA.US', yahoo_ticker='NVDA', name='NVIDIA', currency='USD')
+        owner = User.objects.create_user(username='demo_template_test')
+        cls.template = Portfolio.objects.create(user=owner, name='IKE Demo', portfolio_type='IKE')
+        Transaction.objects.create(portfolio=cls.template, asset=cls.asset, type='BUY', amount=-1000,
+                                   quantity=10, price=100, date=timezone.make_aware(datetime(2024, 1, 10, 12)))
+        CorporateAction.objects.create(asset=cls.asset, action_type=CorporateActionType.SPLIT,
+                                       date=date(2024, 6, 10), value=10)
+        apply_splits_to_transactions([cls.asset.id])
+        cls.visitor = User.objects.create_user(username='demo_visitor_test')
+
+    def test_clone_keeps_split_factor(self):
+        clone = clone_demo_portfolio(self.visitor, self.template)
+        apply_splits_to_transactions([self.asset.id])
+
+        buy = Transaction.objects.get(portfolio=clone)
+        self.assertEqual(buy.split_factor, Decimal(10))
+        self.assertEqual(buy.quantity, Decimal(100))
+        self.assertEqual(buy.price, Decimal(10))
@@ -0,0 +1,87 @@
+# core/tests/test_dividends.py
+
+from datetime import date, datetime, timedelta
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from core.config import fmt_2
+from core.models import Asset, FxRate, Portfolio, Transaction
+from core.services.dividends import get_dividend_context
+from core.services.importer import process_xtb_file
+from core.services.providers import FixtureProvider, set_market_provider
+
+# Stały kurs USD/PLN od pierwszej operacji do dziś - ensure_fx_history nie ma czego pobierać
+USD_PLN = 4.0
+FX_START = date(2024, 3, 1)
+
+REVOLUT_CSV = """Date,Ticker,Type,Quantity,Price per share,Total Amount,Currency,FX Rate
+2024-03-04T14:30:00.000Z,,CASH TOP-UP,,,"USD 1,000",USD,1
+2024-03-05T15:00:00.000Z,AAPL,BUY - MARKET,2,USD 170,USD 340,USD,1
+2024-03-10T15:00:00.000Z,AAPL,DIVIDEND,,,USD 0.48,USD,1
+2024-03-10T15:00:01.000Z,AAPL,DIVIDEND TAX (CORRECTION),,,USD -0.07,USD,1
+"""
+
+
+@override_settings(BACKGROUND_TASKS_ENABLED=False)
+class RevolutDividendTests(TestCase):
+    """Dywidendy z Revoluta są w PLN od importu - raport nie może ich przeliczać drugi raz z waluty aktywa."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._previous_provider = set_market_provider(FixtureProvider())
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        set_market_provider(cls._previous_provider)
+
+    @classmethod
+    def setUpTestData(cls):
+        days = (date.today() - FX_START).days + 1
+        FxRate.objects.bulk_create([FxRate(currency='USD', date=FX_START + timedelta(days=i), rate=USD_PLN)
+                                    for i in range(days)])
+        # Aktywo jak z metadanych Yahoo dla AAPL (fixture nie podaje waluty notowania)
+        Asset.objects.create(symbol='AAPL.US', yahoo_ticker='AAPL', name='Apple', currency='USD')
+        cls.user = User.objects.create_user(username='revolut_dividends')
+        cls.portfolio = Portfolio.objects.create(user=cls.user, name='Revolut', portfolio_type='STANDARD')
+
+    def setUp(self):
+        cache.clear()
+
+    def _import(self):
+        upload = SimpleUploadedFile('revolut.csv', REVOLUT_CSV.encode('utf-8'))
+        return process_xtb_file(upload, self.portfolio, recompute=False)
+
+    def test_revolut_amounts_stored_in_pln(self):
+        self._import()
+        dividend = Transaction.objects.get(portfolio=self.portfolio, type='DIVIDEND')
+        self.assertEqual(dividend.asset.currency, 'USD')
+        self.assertEqual(dividend.amount_currency, 'PLN')
+        self.assertAlmostEqual(float(dividend.amount), 0.48 * USD_PLN, places=2)
+
+    def test_dividend_totals_converted_once(self):
+        self._import()
+        context = get_dividend_context(self.user, self.portfolio.id)
+
+        self.assertEqual(context['total_gross'], fmt_2(0.48 * USD_PLN))
+        self.assertEqual(context['total_tax'], fmt_2(0.07 * USD_PLN))
+        self.assertEqual(context['total_net'], fmt_2(0.41 * USD_PLN))
+
+    def test_asset_currency_rows_still_converted(self):
+        """Wiersz bez amount_currency (konwencja XTB): kwota w walucie aktywa, przeliczana w raporcie."""
+        self._import()
+        asset = Asset.objects.get(symbol='AAPL.US')
+        Transaction.objects.create(portfolio=self.portfolio, asset=asset, type='DIVIDEND', amount=1,
+                                   date=timezone.make_aware(datetime(2024, 6, 10, 12)))
+        context = get_dividend_context(self.user, self.portfolio.id)
+
+        self.assertEqual(context['total_gross'], fmt_2((0.48 + 1) * USD_PLN))
+
+    def test_reimport_skips_unchanged_rows(self):
+        self._import()
+        stats = self._import()
+        self.assertEqual((stats['added'], stats['updated']), (0, 0))
+        self.assertEqual(stats['skipped'], 4)
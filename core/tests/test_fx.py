@@ -0,0 +1,44 @@
+# core/tests/test_fx.py
+
+from datetime import date
+import numpy as np
+from django.test import TestCase
+from core.models import FxRate
+from core.services.fx import convert
+
+# Piątek i poniedziałek - weekend bez notowań
+FRIDAY, MONDAY = date(2024, 3, 1), date(2024, 3, 4)
+
+
+class FxConvertTests(TestCase):
+    """fx.convert: kurs as-of (ostatni notowany dzień <= data), przed pierwszym notowaniem - pierwszy kurs."""
+
+    @classmethod
+    def setUpTestData(cls):
+        FxRate.objects.bulk_create([
+            FxRate(currency='USD', date=FRIDAY, rate=4.0), FxRate(currency='USD', date=MONDAY, rate=4.1),
+            FxRate(currency='EUR', date=FRIDAY, rate=4.3), FxRate(currency='EUR', date=MONDAY, rate=4.35),
+        ])
+
+    def _days(self, *days):
+        return np.array(days, dtype='datetime64[D]')
+
+    def test_weekend_uses_last_quoted_day(self):
+        days = self._days('2024-03-01', '2024-03-02', '2024-03-03', '2024-03-04', '2024-03-05')
+        np.testing.assert_allclose(convert(np.ones(5), 'USD', days), [4.0, 4.0, 4.0, 4.1, 4.1])
+
+    def test_before_first_quote_uses_first_rate(self):
+        np.testing.assert_allclose(convert([10.0], 'USD', self._days('2024-02-20')), [40.0])
+
+    def test_mixed_currencies_in_one_call(self):
+        out = convert([100.0, 100.0, 100.0], ['USD', 'EUR', 'PLN'], self._days('2024-03-03', '2024-03-04', '2024-03-03'))
+        np.testing.assert_allclose(out, [400.0, 435.0, 100.0])
+
+    def test_cross_rate_to_reporting_currency(self):
+        # USD -> EUR przez PLN, oba kursy z tego samego (weekendowego) dnia
+        out = convert([100.0], 'USD', self._days('2024-03-02'), target='EUR')
+        np.testing.assert_allclose(out, [100.0 * 4.0 / 4.3])
+
+    def test_currency_without_history_uses_current_rate(self):
+        out = convert([10.0], 'CHF', self._days('2024-03-02'), rates={'CHF': 4.5})
+        np.testing.assert_allclose(out, [45.0])
@@ -0,0 +1,88 @@
+# core/tests/test_import_preview.py
+
+import glob
+import os
+import tempfile
+import time
+from datetime import date
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from core.models import Portfolio, Transaction
+from core.services.importer import STASH_PREFIX, STASH_TTL, stash_upload
+from core.services.providers import FixtureProvider, set_market_provider
+from core.services.synthetic import generate_xtb_cash_operations, suffixes_for_currencies, synthetic_xtb_file
+
+
+@override_settings(BACKGROUND_TASKS_ENABLED=False, METRICS_ENABLED=False)
+class ImportPreviewTests(TestCase):
+    """Podgląd importu: plik odłożony na dysk, zatwierdzany lub anulowany tokenem."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._previous_provider = set_market_provider(FixtureProvider())
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        set_market_provider(cls._previous_provider)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='import_preview')
+        cls.portfolio = Portfolio.objects.create(user=cls.user, name='Preview', portfolio_type='STANDARD')
+        suffixes = suffixes_for_currencies(['PLN'])
+        cls.reports = [
+            synthetic_xtb_file(generate_xtb_cash_operations(rows=20, symbols=2, suffixes=suffixes, seed=seed,
+                                                            start=date(2023 + seed, 1, 1))).read()
+            for seed in (0, 1)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['active_portfolio_id'] = self.portfolio.id
+        session.save()
+
+    def tearDown(self):
+        for path in self._stashed():
+            os.remove(path)
+
+    def _stashed(self):
+        return glob.glob(os.path.join(tempfile.gettempdir(), f"{STASH_PREFIX}{self.user.id}_*"))
+
+    def _stash(self, content, name):
+        return stash_upload(SimpleUploadedFile(name, content), self.user.id)
+
+    def test_token_extension_from_content(self):
+        """Nazwa bez rozszerzenia albo z dziwnym sufiksem nie może dać tokenu, którego nie da się zatwierdzić."""
+        tokens = [self._stash(self.reports[0], name) for name in ('report', 'report.xlsx.1')]
+        self.assertTrue(all(t.endswith('.csv') for t in tokens))
+
+        response = self.client.post(reverse('upload'), {'confirm_token': tokens[0]})
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        self.assertTrue(Transaction.objects.filter(portfolio=self.portfolio).exists())
+
+        self.client.post(reverse('upload'), {'cancel_token': tokens[1]})
+        self.assertEqual(self._stashed(), [])
+
+    def test_expired_token_keeps_other_files(self):
+        fresh, expired = (self._stash(content, 'report.csv') for content in self.reports)
+        expired_path = next(p for p in self._stashed() if p.endswith(expired))
+        old = time.time() - STASH_TTL - 60
+        os.utime(expired_path, (old, old))
+
+        response = self.client.post(reverse('upload'), {'confirm_token': [fresh, expired]})
+        self.assertRedirects(response, reverse('upload'), fetch_redirect_response=False)
+        self.assertFalse(Transaction.objects.filter(portfolio=self.portfolio).exists())
+        self.assertEqual([os.path.basename(p) for p in self._stashed()], [f"{STASH_PREFIX}{self.user.id}_{fresh}"])
+
+    def test_confirm_removes_files_after_import(self):
+        tokens = [self._stash(content, 'report.csv') for content in self.reports]
+
+        self.client.post(reverse('upload'), {'confirm_token': tokens})
+        self.assertTrue(Transaction.objects.filter(portfolio=self.portfolio).exists())
+        self.assertEqual(self._stashed(), [])
@@ -0,0 +1,98 @@
+# core/tests/test_importers.py
+
+import io
+from datetime import date, timedelta
+import pandas as pd
+from django.test import TestCase
+from core.models import FxRate
+from core.services.importer import (RevolutCsvImporter, XtbClosedPositionsImporter, XtbCsvImporter,
+                                    XtbExcelImporter, detect_importer)
+from core.services.synthetic import XTB_CASH_HEADER, write_xtb_csv, write_xtb_xlsx
+
+XTB_CASH_ROWS = [
+    (1001, 'Deposit', '2024-01-02 10:00:00', '', 'Deposit', 5000),
+    (1002, 'Stock purchase', '2024-01-03 10:00:00', 'CDR.PL', 'OPEN BUY 10 @ 120.5', -1205),
+    (1003, 'Stock sale', '2024-02-01 10:00:00', 'CDR.PL', 'CLOSE BUY 4/10 @ 130', 520),
+    (1004, 'DIVIDENT', '2024-03-01 10:00:00', 'CDR.PL', 'CDR.PL PLN 0.6/ SHR', 3.6),
+    (1005, 'Withholding tax', '2024-03-01 10:00:00', 'CDR.PL', 'CDR.PL PLN WHT 19%', -0.68),
+]
+
+XTB_CLOSED_CSV = """Position;Symbol;Type;Volume;Open time;Open price;Close time;Close price;Purchase value;Gross P/L
+77;AAPL.US;BUY;5;2024-01-10 15:30:00;200;2024-04-10 16:00:00;240;1000;200
+"""
+
+REVOLUT_CSV = """Date,Ticker,Type,Quantity,Price per share,Total Amount,Currency,FX Rate
+2024-03-04T14:30:00.000Z,,CASH TOP-UP,,,"USD 1,000",USD,1
+2024-03-05T15:00:00.000Z,AAPL,BUY - MARKET,2,USD 170,USD 340,USD,1
+2024-03-05T15:00:00.000Z,AAPL,BUY - MARKET,2,USD 170,USD 340,USD,1
+2024-03-10T15:00:00.000Z,AAPL,DIVIDEND,,,USD 0.48,USD,1
+"""
+
+
+def _file(data, name):
+    f = io.BytesIO(data)
+    f.name = name
+    return f
+
+
+class ImporterDetectionTests(TestCase):
+    """Jeden przykładowy plik na importer: rozpoznanie formatu i ramka po wspólnej normalizacji."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Stały kurs USD/PLN (Revolut przelicza kwoty przy imporcie) - bez pobierania kursów
+        days = (date.today() - date(2024, 3, 1)).days + 1
+        FxRate.objects.bulk_create([FxRate(currency='USD', date=date(2024, 3, 1) + timedelta(days=i), rate=4.0)
+                                    for i in range(days)])
+
+    def _frame(self, f, expected_cls):
+        importer_cls, head = detect_importer(f)
+        self.assertIs(importer_cls, expected_cls)
+        return importer_cls(f, None, head=head).build_frame()
+
+    def _check_xtb_cash(self, frame):
+        self.assertEqual(frame['xtb_id'].tolist(), ['1001', '1002', '1003', '1004', '1005'])
+        self.assertEqual(frame['type'].tolist(), ['DEPOSIT', 'BUY', 'SELL', 'DIVIDEND', 'TAX'])
+        self.assertEqual(frame['quantity'].tolist(), [0.0, 10.0, 4.0, 0.0, 0.0])
+        self.assertEqual(frame['price'].tolist(), [None, 120.5, 130.0, None, None])
+        self.assertEqual(frame['amount'].tolist(), [5000.0, -1205.0, 520.0, 3.6, -0.68])
+        self.assertEqual(frame['symbol'].tolist(), ['', 'CDR.PL', 'CDR.PL', 'CDR.PL', 'CDR.PL'])
+        self.assertIsNotNone(frame['date'].dt.tz)
+        self.assertTrue(frame['amount_currency'].isna().all())
+
+    def test_xtb_cash_operations_csv(self):
+        df = pd.DataFrame(XTB_CASH_ROWS, columns=XTB_CASH_HEADER)
+        for variant in ('csv-utf16-tab', 'csv-utf8-semicolon', 'csv-cp1250-semicolon'):
+            with self.subTest(variant=variant):
+                self._check_xtb_cash(self._frame(_file(write_xtb_csv(df, variant), 'cash.csv'), XtbCsvImporter))
+
+    def test_xtb_cash_operations_xlsx(self):
+        df = pd.DataFrame(XTB_CASH_ROWS, columns=XTB_CASH_HEADER)
+        self._check_xtb_cash(self._frame(_file(write_xtb_xlsx(df), 'cash.xlsx'), XtbExcelImporter))
+
+    def test_xtb_closed_positions(self):
+        frame = self._frame(_file(XTB_CLOSED_CSV.encode('utf-8'), 'closed.csv'), XtbClosedPositionsImporter)
+
+        # Pozycja -> otwarcie (koszt), zamknięcie (zwrot kosztu) i zysk
+        rows = frame.set_index('xtb_id')
+        self.assertEqual(rows['type'].to_dict(), {'POS-77-B': 'BUY', 'POS-77-S': 'SELL', 'POS-77-P': 'CLOSE'})
+        self.assertEqual(rows['amount'].to_dict(), {'POS-77-B': -1000.0, 'POS-77-S': 1000.0, 'POS-77-P': 200.0})
+        self.assertEqual(rows.loc['POS-77-S', 'quantity'], 5.0)
+        self.assertEqual(rows.loc['POS-77-S', 'price'], 240.0)
+
+    def test_revolut(self):
+        frame = self._frame(_file(REVOLUT_CSV.encode('utf-8'), 'revolut.csv'), RevolutCsvImporter)
+
+        self.assertEqual(frame['type'].tolist(), ['DEPOSIT', 'BUY', 'BUY', 'DIVIDEND'])
+        self.assertEqual(frame['symbol'].tolist(), ['', 'AAPL.US', 'AAPL.US', 'AAPL.US'])
+        # Kwoty w PLN po kursie z dnia, cena za akcję w walucie notowania
+        self.assertEqual(frame['amount'].tolist(), [4000.0, -1360.0, -1360.0, 1.92])
+        self.assertEqual(frame['price'].tolist(), [None, 170.0, 170.0, None])
+        self.assertEqual(set(frame['amount_currency']), {'PLN'})
+        # Identyczne transakcje tego samego dnia - dwa różne ID
+        self.assertEqual(frame['xtb_id'].nunique(), 4)
+        self.assertTrue(frame['xtb_id'].str.startswith('REV-').all())
+
+    def test_unknown_format_rejected(self):
+        with self.assertRaises(ValueError):
+            detect_importer(_file(b"foo,bar\n1,2\n", 'other.csv'))
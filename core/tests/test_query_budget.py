@@ -0,0 +1,136 @@
+# core/tests/test_query_budget.py
+
+import re
+from collections import Counter
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core.models import Transaction
+from core.services.providers import FixtureProvider, set_market_provider
+from core.services.synthetic import seed_synthetic_portfolio, suffixes_for_currencies
+
+# Wielkości portfeli - liczba zapytań nie może zależeć od liczby transakcji (N+1)
+PORTFOLIO_SIZES = (200, 2000)
+
+# Górny limit zapytań SQL per widok - stały, niezależny od liczby transakcji.
+# 'warm': typowe wejście (snapshot i ceny w cache), 'cold': pierwsze wejście po imporcie (liczenie i zapis cen/kursów,
+# z zapasem 2 zapytań na różnice między bazami, np. savepointy).
+# Sesja i użytkownik to 2 zapytania w każdym widoku.
+QUERY_BUDGETS = {
+    'dashboard': {'warm': 6, 'cold': 14},
+    'dashboard?range=1y': {'warm': 7, 'cold': 14},
+    'assets_list': {'warm': 5, 'cold': 12},
+    'assets_list?range=1y': {'warm': 8, 'cold': 15},
+    'dividends': {'warm': 8, 'cold': 14},
+    'taxes': {'warm': 7, 'cold': 18},
+    'asset_details': {'warm': 11, 'cold': 13},
+    'household': {'warm': 5, 'cold': 13},
+}
+
+_LITERALS = re.compile(r"'[^']*'|\b\d+(\.\d+)?\b")
+
+# Paczka bulk_create: jeden INSERT z wieloma krotkami VALUES (...), (...)
+_BULK_INSERT = re.compile(r"^INSERT .* VALUES \(.*\), \(", re.DOTALL)
+
+
+def normalize_sql(sql):
+    """Zapytanie bez literałów - te same kształty zapytań (np. N+1 po id) zliczają się razem."""
+    return _LITERALS.sub('?', sql)
+
+
+def counted_queries(captured):
+    """
+    Zapytania requestu bez paczek bulk_create - ich liczba rośnie z wierszami z definicji (batch_size).
+    Pojedyncze INSERT-y (create() / save() w pętli) i UPDATE-y są liczone.
+    """
+    return [q['sql'] for q in captured if not _BULK_INSERT.match(q['sql'])]
+
+
+@override_settings(BACKGROUND_TASKS_ENABLED=False, METRICS_ENABLED=False)
+class QueryBudgetTests(TestCase):
+    """
+    Budżet zapytań SQL widoków na syntetycznych portfelach rosnącej wielkości (offline, FixtureProvider).
+    Każdy widok na zimnym i ciepłym cache: przekroczenie limitu albo liczba zapytań rosnąca z liczbą
+    transakcji kończy test błędem z listą zapytań pogrupowanych po kształcie.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._previous_provider = set_market_provider(FixtureProvider())
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        set_market_provider(cls._previous_provider)
+
+    @classmethod
+    def setUpTestData(cls):
+        suffixes = suffixes_for_currencies(['PLN', 'USD', 'EUR'])
+        cls.portfolios = {}
+        for trades in PORTFOLIO_SIZES:
+            user = User.objects.create_user(username=f"query_budget_{trades}")
+            portfolio, _ = seed_synthetic_portfolio(user, trades, tickers=12, suffixes=suffixes, seed=7)
+            cls.portfolios[trades] = (user, portfolio)
+
+        # Aktywo w obcej walucie (najdroższa ścieżka - kursy FX), to samo dla każdej wielkości portfela
+        _, portfolio = cls.portfolios[PORTFOLIO_SIZES[0]]
+        cls.held = (Transaction.objects.filter(portfolio=portfolio, type='BUY', asset__isnull=False)
+                    .exclude(asset__currency='PLN').order_by('asset__symbol')
+                    .values_list('asset__symbol', flat=True).first())
+
+    def test_views_within_budget(self):
+        counts = {}  # (view, trades) -> (cold, warm)
+        for trades, (user, portfolio) in self.portfolios.items():
+            # Zapisy z zimnych requestów (kursy, ceny, loty) wycofywane - każda wielkość startuje od zera
+            with transaction.atomic():
+                client = self._client(user, portfolio)
+                for view in QUERY_BUDGETS:
+                    counts[(view, trades)] = self._check_view(client, view, trades)
+                transaction.set_rollback(True)
+
+        for view in QUERY_BUDGETS:
+            for kind, idx in (('cold', 0), ('warm', 1)):
+                per_size = {t: len(counts[(view, t)][idx]) for t in PORTFOLIO_SIZES}
+                with self.subTest(view=view, kind=kind):
+                    self.assertEqual(len(set(per_size.values())), 1,
+                                     f"{view}: zapytania ({kind}) rosną z liczbą transakcji {per_size}\n"
+                                     + self._grouped(counts[(view, PORTFOLIO_SIZES[-1])][idx]))
+
+    def _check_view(self, client, view, trades):
+        name, _, query = view.partition('?')
+        url = reverse(name, args=[self.held] if name == 'asset_details' else None) + (f"?{query}" if query else '')
+        cache.clear()
+        cold = self._request(client, url)
+        warm = self._request(client, url)
+
+        budget = QUERY_BUDGETS[view]
+        for kind, captured in (('cold', cold), ('warm', warm)):
+            with self.subTest(view=view, trades=trades, kind=kind):
+                self.assertLessEqual(len(captured), budget[kind],
+                                     f"{view} @ {trades}: {len(captured)} zapytań ({kind}) > limit {budget[kind]}\n"
+                                     + self._grouped(captured))
+        return cold, warm
+
+    def _client(self, user, portfolio):
+        """Klient zalogowany jako user, z portfelem aktywnym w sesji (jak po przełączeniu w UI)."""
+        client = Client()
+        client.force_login(user)
+        session = client.session
+        session['active_portfolio_id'] = portfolio.id
+        session.save()
+        return client
+
+    def _request(self, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return counted_queries(queries.captured_queries)
+
+    def _grouped(self, captured):
+        """Zapytania pogrupowane po kształcie - powtórzone N razy to zwykle pętla po wierszach."""
+        return "\n".join(f"  {n:>3}x {sql[:160]}"
+                         for sql, n in Counter(normalize_sql(q) for q in captured).most_common())
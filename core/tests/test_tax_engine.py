@@ -0,0 +1,39 @@
+# core/tests/test_tax_engine.py
+
+import numpy as np
+from django.test import SimpleTestCase
+from core.services.tax_engine import carry_forward_losses, compute_pit38, loss_capacity
+
+
+class CarryForwardLossTests(SimpleTestCase):
+    """Odliczanie strat (PIT-38): 5 kolejnych lat, maks. 50% straty pierwotnej w jednym roku."""
+
+    def test_yearly_limit_of_original_loss(self):
+        # Strata 1000: rocznie najwyżej 500, nie więcej niż dochód i niż zostało
+        deducted = carry_forward_losses([[-1000, 300, 800, 800, 0]])
+        np.testing.assert_allclose(deducted, [[0, 300, 500, 200, 0]])
+
+    def test_loss_expires_after_five_years(self):
+        np.testing.assert_allclose(carry_forward_losses([[-1000, 0, 0, 0, 0, 400]]), [[0, 0, 0, 0, 0, 400]])
+        np.testing.assert_allclose(carry_forward_losses([[-1000, 0, 0, 0, 0, 0, 400]]), [[0] * 7])
+
+    def test_losses_from_several_years_stack(self):
+        # Każda strata ma własny limit 50%: 200 z pierwszej + 300 z drugiej
+        np.testing.assert_allclose(carry_forward_losses([[-400, -600, 1000]]), [[0, 0, 500]])
+
+    def test_portfolios_independent(self):
+        deducted = carry_forward_losses([[-1000, 800], [500, 800]])
+        np.testing.assert_allclose(deducted, [[0, 500], [0, 0]])
+
+    def test_pit38_tax_base_after_deduction(self):
+        zeros = np.zeros((1, 3))
+        out = compute_pit38({'revenue': zeros, 'cost': zeros, 'income': np.array([[-1000, 300, 800]]),
+                             'div_gross': zeros, 'div_tax_paid': zeros})
+        np.testing.assert_allclose(out['tax_base'], [[0, 0, 300]])
+        np.testing.assert_allclose(out['stock_tax'], [[0, 0, 57]])
+
+    def test_loss_capacity_counts_earlier_deductions(self):
+        report = {'years': [{'year': 2020, 'income': -1000.0}, {'year': 2021, 'income': 700.0}]}
+        # 2021 odliczyło 500, w 2022 zostaje 500 (limit roczny też 500)
+        self.assertAlmostEqual(loss_capacity(report, 2022), 500.0)
+        self.assertAlmostEqual(loss_capacity(report, 2026), 0.0)
@@ -0,0 +1,80 @@
+# core/tests/test_tax_ledger.py
+
+from datetime import datetime
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from core.models import Asset, Portfolio, TaxLot, TaxYearResult, Transaction
+from core.services.lots import _year_fingerprints, sync_tax_ledger
+
+
+def _at(year, month, day):
+    return timezone.make_aware(datetime(year, month, day, 12))
+
+
+class TaxLedgerTests(TestCase):
+    """
+    Księga FIFO: 2021 kupno 10 szt. po 100, 2022 kupno 10 po 200 i sprzedaż 5, 2023 sprzedaż 10.
+    Wsteczna edycja przelicza lata od edytowanego roku, wcześniejsze zostają nietknięte.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='tax_ledger')
+        cls.portfolio = Portfolio.objects.create(user=user, name='Ledger', portfolio_type='STANDARD')
+        asset = Asset.objects.create(symbol='CDR.PL', yahoo_ticker='CDR.WA', name='CD Projekt', currency='PLN')
+        rows = [
+            (_at(2021, 3, 1), 'BUY', -1000, 10),
+            (_at(2022, 6, 1), 'BUY', -2000, 10),
+            (_at(2022, 9, 1), 'SELL', 1500, 5),
+            (_at(2023, 5, 1), 'SELL', 2500, 10),
+        ]
+        cls.txs = [Transaction.objects.create(portfolio=cls.portfolio, asset=asset, date=d, type=t, amount=a, quantity=q)
+                   for d, t, a, q in rows]
+
+    def _income(self, results):
+        return {r.year: r.income for r in results}
+
+    def test_fifo_income_per_year(self):
+        results = sync_tax_ledger(self.portfolio)
+
+        # 2022: 5 szt. z lotu 2021 (koszt 500); 2023: 5 z lotu 2021 + 5 z lotu 2022 (500 + 1000)
+        self.assertEqual(self._income(results), {2021: Decimal('0'), 2022: Decimal('1000'), 2023: Decimal('1000')})
+        remaining = dict(TaxLot.objects.filter(portfolio=self.portfolio).values_list('date__year', 'remaining_quantity'))
+        self.assertEqual(remaining, {2021: Decimal('0'), 2022: Decimal('5')})
+
+    def test_unchanged_ledger_not_rebuilt(self):
+        first = {r.year: r.id for r in sync_tax_ledger(self.portfolio)}
+        second = {r.year: r.id for r in sync_tax_ledger(self.portfolio)}
+        self.assertEqual(first, second)
+
+    def test_retroactive_edit_rebuilds_from_edited_year(self):
+        before = {r.year: r.id for r in sync_tax_ledger(self.portfolio)}
+
+        # Droższe kupno z 2022 - rok 2021 bez zmian, 2022 i 2023 liczone od nowa
+        Transaction.objects.filter(id=self.txs[1].id).update(amount=-2400)
+        results = sync_tax_ledger(self.portfolio)
+
+        after = {r.year: r.id for r in results}
+        self.assertEqual(after[2021], before[2021])
+        self.assertNotEqual(after[2022], before[2022])
+        # 2023: 5 szt. po 100 + 5 szt. po 240
+        self.assertEqual(self._income(results), {2021: Decimal('0'), 2022: Decimal('1000'), 2023: Decimal('800')})
+
+    def test_edit_of_earliest_year_reaches_later_sales(self):
+        sync_tax_ledger(self.portfolio)
+
+        Transaction.objects.filter(id=self.txs[0].id).update(amount=-1500)
+        results = sync_tax_ledger(self.portfolio)
+
+        # Koszt lotu 2021 rośnie do 150/szt. - zmienia się dochód obu lat sprzedaży
+        self.assertEqual(self._income(results), {2021: Decimal('0'), 2022: Decimal('750'), 2023: Decimal('750')})
+        self.assertEqual(TaxYearResult.objects.filter(portfolio=self.portfolio).count(), 3)
+
+    def test_fingerprint_changes_only_for_edited_year(self):
+        before = _year_fingerprints(self.portfolio)
+        Transaction.objects.filter(id=self.txs[3].id).update(date=_at(2023, 5, 2))
+        after = _year_fingerprints(self.portfolio)
+
+        self.assertEqual({y for y in before if before[y] != after[y]}, {2023})
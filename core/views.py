@@ -1,16 +1,19 @@
 # core/views.py
 
+import hmac
+import math
 from datetime import datetime
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import HttpResponse, JsonResponse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login
 from django.utils import timezone
 from django.contrib.auth import login, authenticate
-from django.core.management import call_command
 from django.contrib.auth.models import User
 # --- MODELE I FORMY ---
-from .models import Portfolio, Transaction, Asset, AssetSector, AssetType
+from .models import Portfolio, Transaction, TransactionType, Asset, AssetSector, AssetType
 from .forms import UploadFileForm, CustomUserCreationForm, PortfolioSettingsForm
 
 # --- WARSTWA USŁUG (SERVICES & SELECTORS) ---
@@ -23,6 +26,16 @@ from .services import (
 # Importujemy nowe akcje bulkowe
 from .services.actions import update_assets_bulk, sync_all_assets_metadata
 from .services.dashboard import get_dashboard_stats_context, get_holdings_view_context
+from .services.importer import stash_upload, load_stashed_upload, discard_stashed_upload, process_import_batch
+from .services.snapshot import bump_portfolio_version
+from .services.demo import prepare_demo_user
+from .services.tax_engine import get_tax_report, pit38_rows, write_pit38
+from .services.harvest import simulate_sell
+from .services.dividends import get_dividend_forecast
+from .services.household import get_household_context
+from .services.metrics import render_prometheus
+from .services.projection import get_ike_projection, clamp_paths, DEFAULT_YEARS, DEFAULT_PATHS, MAX_YEARS
+from .services.transactions import parse_transaction_filters, browse_transactions, DEFAULT_PAGE_SIZE
 
 
 # --- WIDOKI ---
@@ -68,11 +81,21 @@ def assets_list_view(request):
 def dividends_view(request):
     active_portfolio = get_active_portfolio(request)
     context = get_dividend_context(request.user, portfolio_id=active_portfolio.id)
+    context.update(get_dividend_forecast(request.user, portfolio_id=active_portfolio.id))
     context['all_portfolios'] = get_user_portfolios(request.user)
     context['active_portfolio'] = active_portfolio
     return render(request, 'dividends.html', context)
 
 
+@login_required
+def household_view(request):
+    """Widok zbiorczy wszystkich portfeli użytkownika (wartości w PLN)."""
+    context = get_household_context(request.user)
+    context['all_portfolios'] = get_user_portfolios(request.user)
+    context['active_portfolio'] = get_active_portfolio(request)
+    return render(request, 'household.html', context)
+
+
 @login_required
 def asset_details_view(request, symbol):
     active_portfolio = get_active_portfolio(request)
@@ -84,27 +107,67 @@ def asset_details_view(request, symbol):
                        'all_portfolios': get_user_portfolios(request.user),
                        'active_portfolio': active_portfolio})
 
-    asset_name = context.get('asset_name', '')
-    context['news'] = get_asset_news(symbol, asset_name)
     context['all_portfolios'] = get_user_portfolios(request.user)
     context['active_portfolio'] = active_portfolio
 
     return render(request, 'asset_details.html', context)
 
 
+@login_required
+def asset_news_view(request, symbol):
+    """Blok newsów strony aktywa (fragment HTML ładowany osobno). 202 = pierwsze pobranie trwa w tle."""
+    asset = get_object_or_404(Asset, symbol=symbol)
+    context = get_asset_news(symbol, asset.name or symbol)
+    status = 202 if context['news'] is None else 200
+    return render(request, 'includes/news_list.html', context, status=status)
+
+
 @login_required
 def upload_view(request):
     active_portfolio = get_active_portfolio(request)
+    preview = None
     if request.method == 'POST':
+        overwrite = request.POST.get('overwrite_manual') == 'on'
+
+        # Anulowanie podglądu - odłożone pliki usuwane od razu, nie dopiero po STASH_TTL
+        if 'cancel_token' in request.POST:
+            for token in request.POST.getlist('cancel_token'):
+                discard_stashed_upload(token, request.user.id)
+            messages.info(request, "Import cancelled.")
+            return redirect('upload')
+
+        # Zatwierdzenie wcześniej podejrzanych plików (bez ponownego uploadu)
+        if 'confirm_token' in request.POST:
+            form = UploadFileForm()
+            tokens = request.POST.getlist('confirm_token')
+            # Odczyt bez usuwania - jeden wygasły plik nie może skasować pozostałych z paczki
+            stashed = [load_stashed_upload(t, request.user.id) for t in tokens]
+            if not stashed or None in stashed:
+                messages.error(request, "Preview expired. Please upload the file again.")
+                return redirect('upload')
+            try:
+                stats = process_import_batch(stashed, active_portfolio, overwrite_manual=overwrite)
+                for token in tokens:
+                    discard_stashed_upload(token, request.user.id)
+                messages.success(request, _import_message(stats, overwrite))
+                return redirect('dashboard')
+            except Exception as e:
+                messages.error(request, f"Error: {e}")
+                return redirect('upload')
+
         form = UploadFileForm(request.POST, request.FILES)
         if form.is_valid():
+            files = form.cleaned_data['file']
             try:
-                overwrite = request.POST.get('overwrite_manual') == 'on'
-                stats = process_xtb_file(request.FILES['file'], active_portfolio, overwrite_manual=overwrite)
-                msg = f"Success! Added: {stats['added']} transactions."
-                if overwrite: msg += " (Cleaned manual entries)."
-                messages.success(request, msg)
-                return redirect('dashboard')
+                if request.POST.get('dry_run') == 'on':
+                    preview = process_import_batch(files, active_portfolio,
+                                                   overwrite_manual=overwrite, dry_run=True)
+                    preview['tokens'] = [stash_upload(f, request.user.id) for f in files]
+                    preview['overwrite_manual'] = overwrite
+                else:
+                    stats = process_import_batch(files, active_portfolio, overwrite_manual=overwrite)
+                    messages.success(request, _import_message(stats, overwrite))
+                    return redirect('dashboard')
             except Exception as e:
                 messages.error(request, f"Error: {e}")
     else:
@@ -112,11 +175,19 @@ def upload_view(request):
 
     return render(request, 'upload.html', {
         'form': form,
+        'preview': preview,
         'all_portfolios': get_user_portfolios(request.user),
         'active_portfolio': active_portfolio
     })
 
 
+def _import_message(stats, overwrite):
+    msg = f"Success! Added: {stats['added']}, updated: {stats['updated']}, unchanged: {stats['skipped']} transactions."
+    if len(stats.get('files', [])) > 1: msg += f" Files: {len(stats['files'])}."
+    if overwrite: msg += " (Cleaned manual entries)."
+    return msg
+
+
 @login_required
 def switch_portfolio_view(request, portfolio_id):
     portfolio = get_object_or_404(Portfolio, id=portfolio_id, user=request.user)
@@ -164,14 +235,118 @@ def taxes_view(request):
     return render(request, 'taxes.html', context)
 
 
+@login_required
+def taxes_export_view(request):
+    """Eksport PIT-38 aktywnego portfela STANDARD: ?format=csv|json&year=RRRR"""
+    active_portfolio = get_active_portfolio(request)
+    if active_portfolio.portfolio_type != 'STANDARD':
+        messages.error(request, "PIT-38 export is available for STANDARD portfolios only.")
+        return redirect('taxes')
+
+    fmt = 'json' if request.GET.get('format') == 'json' else 'csv'
+    year = request.GET.get('year')
+    report = get_tax_report([active_portfolio])
+    rows = pit38_rows([active_portfolio], [report], year=int(year) if year and year.isdigit() else None)
+
+    response = HttpResponse(content_type='application/json' if fmt == 'json' else 'text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="pit38_{active_portfolio.id}.{fmt}"'
+    write_pit38(response, rows, fmt)
+    return response
+
+
+@login_required
+def taxes_simulate_view(request):
+    """What-if sprzedaży (JSON dla suwaka): ?symbol=X&qty=N&price=P - bez symbolu tylko ranking okazji."""
+    active_portfolio = get_active_portfolio(request)
+    if active_portfolio.portfolio_type != 'STANDARD':
+        return JsonResponse({'error': 'Simulation is available for STANDARD portfolios only.'}, status=400)
+
+    try:
+        quantity = float(request.GET['qty']) if request.GET.get('qty') else None
+        price = float(request.GET['price']) if request.GET.get('price') else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid qty or price.'}, status=400)
+    # nan / inf dałyby niepoprawny JSON, zero i wartości ujemne - bezsensowny koszt FIFO
+    if any(v is not None and (not math.isfinite(v) or v <= 0) for v in (quantity, price)):
+        return JsonResponse({'error': 'Invalid qty or price.'}, status=400)
+
+    return JsonResponse(simulate_sell(active_portfolio, request.GET.get('symbol'), quantity, price))
+
+
+@login_required
+def taxes_projection_view(request):
+    """Projekcja IKE/IKZE (JSON dla wykresu): ?years=20&deposit=10000&paths=20000&pit=0.12"""
+    active_portfolio = get_active_portfolio(request)
+    if active_portfolio.portfolio_type not in ['IKE', 'IKZE']:
+        return JsonResponse({'error': 'Projection is available for IKE/IKZE portfolios only.'}, status=400)
+
+    try:
+        years = min(max(int(request.GET.get('years', DEFAULT_YEARS)), 1), MAX_YEARS)
+        paths = clamp_paths(max(int(request.GET.get('paths', DEFAULT_PATHS)), 1000), years)
+        deposit = float(request.GET['deposit']) if request.GET.get('deposit') else None
+        pit_rate = float(request.GET.get('pit', 0.12))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid projection parameters.'}, status=400)
+    # nan / inf dałyby niepoprawny JSON (NaN, Infinity), ujemna wpłata - symulację wypłat
+    if not math.isfinite(pit_rate) or (deposit is not None and (not math.isfinite(deposit) or deposit < 0)):
+        return JsonResponse({'error': 'Invalid projection parameters.'}, status=400)
+    pit_rate = min(max(pit_rate, 0.0), 1.0)
+
+    return JsonResponse(get_ike_projection(active_portfolio, years, deposit, paths, pit_rate))
+
+
+def metrics_view(request):
+    """Metryki wszystkich procesów w formacie Prometheus. Dostęp: Bearer METRICS_TOKEN albo zalogowany staff."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if token and hmac.compare_digest(request.headers.get('Authorization', '').encode(), f"Bearer {token}".encode()):
+        authorized = True
+    if not authorized:
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @login_required
 def delete_transaction_view(request, transaction_id):
     transaction = get_object_or_404(Transaction, id=transaction_id, portfolio__user=request.user)
     transaction.delete()
+    bump_portfolio_version(transaction.portfolio)
     messages.success(request, "Transaction deleted successfully.")
     return redirect('portfolio_settings')
 
 
+@login_required
+def transactions_view(request):
+    """
+    Przeglądarka transakcji aktywnego portfela: filtry ?type=&symbol=&date_from=&date_to=&q=,
+    kolejne strony po ?cursor= (klucz date, id). ?format=json - strona dla tabeli (przycisk "Load more").
+    """
+    active_portfolio = get_active_portfolio(request)
+    as_json = request.GET.get('format') == 'json'
+
+    try:
+        filters = parse_transaction_filters(request.GET)
+        page = browse_transactions(active_portfolio, filters, request.GET.get('cursor'),
+                                   request.GET.get('limit') or DEFAULT_PAGE_SIZE)
+    except ValueError as e:
+        if as_json:
+            return JsonResponse({'error': str(e)}, status=400)
+        messages.error(request, str(e))
+        return redirect('transactions')
+
+    if as_json:
+        return JsonResponse(page)
+
+    context = {
+        'page': page,
+        'filters': {key: str(value) for key, value in filters.items()},
+        'transaction_types': TransactionType.choices,
+        'active_portfolio': active_portfolio,
+        'all_portfolios': get_user_portfolios(request.user),
+    }
+    return render(request, 'transactions.html', context)
+
+
 @login_required
 def portfolio_settings_view(request):
     active_portfolio = get_active_portfolio(request)
@@ -212,6 +387,7 @@ def portfolio_settings_view(request):
 
         elif 'clear_transactions' in request.POST:
             count, _ = Transaction.objects.filter(portfolio=active_portfolio).delete()
+            bump_portfolio_version(active_portfolio)
             messages.warning(request, f"Cleared {count} transactions.")
             return redirect('dashboard')
         elif 'delete_portfolio' in request.POST:
@@ -278,25 +454,16 @@ def manage_assets_view(request):
 
 def demo_login_view(request):
     """
-    Loguje użytkownika 'demo_user' bez hasła, uprzednio resetując jego dane.
+    Loguje użytkownika 'demo_user' bez hasła, z portfelem w stanie wzorcowym.
+    Dane demo są klonowane z gotowego wzorca (bulk insert + gotowy snapshot), nie ładowane od nowa.
     """
-    username = 'demo_user'
-
-    # 1. Reset danych (Clean Slate)
+    # 1. Portfel demo w stanie wzorcowym (klon tylko, jeśli ktoś go zmienił)
     # To zapewnia, że każdy rekruter widzi świeże dane
-    call_command('reset_demo')
-
-    # 2. Pobranie użytkownika (stworzonego przez komendę wyżej)
-    try:
-        user = User.objects.get(username=username)
-
-        # 3. Wymuszone logowanie (obejście hasła)
-        # Backend 'ModelBackend' jest standardem w Django
-        login(request, user, backend='django.contrib.auth.backends.ModelBackend')
+    user = prepare_demo_user()
 
-        messages.success(request, "Zalogowano do trybu DEMO. Dane zostały przywrócone do stanu wzorcowego.")
-        return redirect('dashboard')
+    # 2. Wymuszone logowanie (obejście hasła)
+    # Backend 'ModelBackend' jest standardem w Django
+    login(request, user, backend='django.contrib.auth.backends.ModelBackend')
 
-    except User.DoesNotExist:
-        messages.error(request, "Błąd konfiguracji Demo. Użytkownik nie istnieje.")
-        return redirect('login')
\ No newline at end of file
+    messages.success(request, "Zalogowano do trybu DEMO. Dane zostały przywrócone do stanu wzorcowego.")
+    return redirect('dashboard')
\ No newline at end of file
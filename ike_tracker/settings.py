@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # <--- WAŻNE: Obsługa plików statycznych na produkcji
+    'core.middleware.ServerTimingMiddleware',  # Server-Timing + linia logu na request (INSTRUMENTATION_ENABLED)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -55,7 +56,8 @@ ROOT_URLCONF = 'ike_tracker.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates z pomiarem czasu renderowania (etap 'render' w Server-Timing)
+        'BACKEND': 'core.services.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -70,6 +72,35 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'ike_tracker.wsgi.application'
 
+# --- CACHE ---
+# LocMemCache z licznikiem trafień/chybień requestu (Server-Timing). LocMem jest osobny w każdym procesie:
+# pod gunicornem snapshot portfela policzony przy imporcie ma tylko worker, który importował - pozostałe
+# liczą go ponownie. CACHE_DIR = wspólny cache plikowy dla wszystkich workerów na hoście.
+CACHES = {
+    'default': {
+        'BACKEND': 'core.services.instrumentation.InstrumentedLocMemCache',
+    }
+}
+CACHE_DIR = os.environ.get('CACHE_DIR')
+if CACHE_DIR:
+    CACHES['default'] = {
+        'BACKEND': 'core.services.instrumentation.InstrumentedFileBasedCache',
+        'LOCATION': CACHE_DIR,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+
+# --- INSTRUMENTATION ---
+# Server-Timing i linia logu na request; False = bez pomiaru etapów (timed() w services to no-op),
+# czas requestów per widok w /metrics/ zostaje, dopóki METRICS_ENABLED=True
+INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', 'True') == 'True'
+
+# --- METRICS (/metrics/, format Prometheus) ---
+# Procesy gunicorna zrzucają swoje liczniki do wspólnej bazy SQLite (bez zewnętrznego kolektora)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True') == 'True'
+METRICS_DB = os.environ.get('METRICS_DB', os.path.join(BASE_DIR, 'metrics.sqlite3'))
+# Scraper: nagłówek "Authorization: Bearer <token>"; bez tokenu dostęp tylko dla zalogowanego staffu
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 
 # --- DATABASE CONFIGURATION ---
 # Hybryda: Domyślnie SQLite, ale jeśli Render poda DATABASE_URL, przełączamy na PostgreSQL
@@ -152,7 +183,8 @@ LOGGING = {
     },
     'handlers': {
         'console': {
-            'level': 'INFO',
+            # Poziom ustalają loggery niżej ('core.requests' może zejść na DEBUG)
+            'level': 'DEBUG',
             'class': 'logging.StreamHandler',
             'formatter': 'simple',
         },
@@ -170,6 +202,12 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        # Linia JSON na każdy request (ServerTimingMiddleware) - logowana na DEBUG, domyślnie wyciszona
+        'core.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
     },
 }
 
@@ -178,9 +216,21 @@ DEFAULT_CURRENCY_RATES = {
     'EUR': 4.30,
     'USD': 4.00,
     'GBP': 5.20,
-    'JPY': 2.60,
+    'JPY': 0.026,
     'AUD': 2.60
 }
 
+# --- MARKET DATA ---
+# 'yahoo' (domyślnie) albo 'fixtures' - notowania offline (pliki <ticker>.csv z MARKET_FIXTURES_DIR lub syntetyczne)
+MARKET_PROVIDER = os.environ.get('MARKET_PROVIDER', 'yahoo')
+MARKET_FIXTURES_DIR = os.environ.get('MARKET_FIXTURES_DIR') or None
+
+# Zadania w tle (services/background.py); False - np. przy profilowaniu, żeby nic nie pisało obok pomiaru
+BACKGROUND_TASKS_ENABLED = True
+
+# --- NEWS ---
+# Katalog z plikami RSS (<symbol>.xml / default.xml) zamiast Google News - testy offline i benchmarki
+NEWS_FEED_DIR = os.environ.get('NEWS_FEED_DIR') or None
+
 # Fix dla Rendera (CSRF) - pozwala na przesyłanie formularzy z domeny onrender.com
 CSRF_TRUSTED_ORIGINS = ['https://*.onrender.com']
\ No newline at end of file
@@ -17,14 +17,22 @@ urlpatterns = [
 
     path('upload/', views.upload_view, name='upload'),
     path('dividends/', views.dividends_view, name='dividends'),
+    path('household/', views.household_view, name='household'),
     path('asset/<str:symbol>/', views.asset_details_view, name='asset_details'),
+    path('asset/<str:symbol>/news/', views.asset_news_view, name='asset_news'),
     path('taxes/', views.taxes_view, name='taxes'),
+    path('taxes/export/', views.taxes_export_view, name='taxes_export'),
+    path('taxes/simulate/', views.taxes_simulate_view, name='taxes_simulate'),
+    path('taxes/projection/', views.taxes_projection_view, name='taxes_projection'),
 
     # --- PORTFEL ---
     path('portfolio/switch/<int:portfolio_id>/', views.switch_portfolio_view, name='switch_portfolio'),
     path('portfolio/create/', views.create_portfolio_view, name='create_portfolio'),
     path('portfolio/settings/', views.portfolio_settings_view, name='portfolio_settings'),
+    path('portfolio/transactions/', views.transactions_view, name='transactions'),
     path('settings/delete-transaction/<int:transaction_id>/', views.delete_transaction_view, name='delete_transaction'),
+    # --- METRYKI ---
+    path('metrics/', views.metrics_view, name='metrics'),
     # --- AUTORYZACJA ---
     path('register/', views.register_view, name='register'),
     path('login/', auth_views.LoginView.as_view(template_name='login.html'), name='login'),